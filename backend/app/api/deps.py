@@ -0,0 +1,12 @@
+from fastapi import Depends, Request
+
+from app.rag.pipeline import RAGPipeline
+from app.services.chroma_service import ChromaService
+
+
+def get_pipeline(request: Request) -> RAGPipeline:
+    return request.app.state.pipeline
+
+
+def get_chroma_service(pipeline: RAGPipeline = Depends(get_pipeline)) -> ChromaService:
+    return pipeline.chroma
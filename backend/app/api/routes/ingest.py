@@ -1,80 +1,131 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form
 from loguru import logger
-import tempfile, os
+from typing import List, Optional
+import asyncio, os, uuid, hashlib
 
+from app.api.deps import get_chroma_service, get_pipeline
+from app.rag.pipeline import RAGPipeline
 from app.services.chroma_service import ChromaService
 from app.core.config import settings
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 router = APIRouter()
 
-@router.post("/ingest")
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def save_upload(file: UploadFile) -> tuple:
+    """
+    Stream an upload to disk in 1 MiB chunks instead of reading it whole; returns (path, sha256).
+
+    The file is written as `<path>.part` and renamed once complete. A
+    failed, oversized (`INGEST_MAX_UPLOAD_MB`) or cancelled upload leaves
+    nothing behind.
+    """
+    os.makedirs(settings.INGEST_UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(settings.INGEST_UPLOAD_DIR, f"{uuid.uuid4().hex}{os.path.splitext(file.filename)[1]}")
+    part = f"{path}.part"
+    limit = settings.INGEST_MAX_UPLOAD_MB * 1024 * 1024
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(part, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPException(status_code=413,
+                                        detail=f"{file.filename} is over {settings.INGEST_MAX_UPLOAD_MB} MB")
+                out.write(chunk)
+                digest.update(chunk)
+        os.replace(part, path)
+    except BaseException:
+        # Includes the CancelledError of a client that disconnected mid-upload
+        if os.path.exists(part):
+            os.unlink(part)
+        raise
+    return path, digest.hexdigest()
+
+
+def discard(saved: List[dict]):
+    for f in saved:
+        if os.path.exists(f["path"]):
+            os.unlink(f["path"])
+
+
+def per_file(values: List[str], count: int, field: str) -> List[str]:
+    if len(values) == 1:
+        return values * count
+    if len(values) != count:
+        raise HTTPException(status_code=400, detail=f"Give one {field} or one per file")
+    return values
+
+
+@router.post("/ingest", status_code=202)
 async def ingest_law_document(
-    file: UploadFile = File(...),
-    law_name: str = Form(...),
-    law_number: str = Form(...),
-    year: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    files: Optional[List[UploadFile]] = File(None),
+    law_name: List[str] = Form(...),
+    law_number: List[str] = Form(...),
+    year: List[str] = Form(...),
+    pipeline: RAGPipeline = Depends(get_pipeline),
 ):
-    chroma = ChromaService()
     """
-    Ingest a Pakistan law document (PDF or TXT) into ChromaDB vector store.
+    Queue Pakistan law documents (PDF or TXT) for ingestion into ChromaDB.
+
+    Upload one `file` or several `files`; `law_name`, `law_number` and `year`
+    are given once for all files or once per file. Returns a job id whose
+    progress is reported by `GET /api/ingest/{job_id}`.
     """
-    if not file.filename.endswith((".pdf", ".txt")):
+    uploads = ([file] if file else []) + (files or [])
+    if not uploads:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+    if not all(u.filename.endswith((".pdf", ".txt")) for u in uploads):
         raise HTTPException(status_code=400, detail="Only PDF and TXT files supported")
 
+    names = per_file(law_name, len(uploads), "law_name")
+    numbers = per_file(law_number, len(uploads), "law_number")
+    years = per_file(year, len(uploads), "year")
+
+    saved = []
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp:
-            content = await file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
-
-        # Load document
-        if file.filename.endswith(".pdf"):
-            loader = PyPDFLoader(tmp_path)
-        else:
-            loader = TextLoader(tmp_path)
-
-        documents = loader.load()
-
-        # Chunk documents
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=settings.CHUNK_SIZE,
-            chunk_overlap=settings.CHUNK_OVERLAP,
-            separators=["\n\n", "\n", "Section", "Article", ". ", " "],
-        )
-        chunks = splitter.split_documents(documents)
-
-        # Add metadata to each chunk
-        for i, chunk in enumerate(chunks):
-            chunk.metadata.update({
-                "law_name": law_name,
-                "law_number": law_number,
-                "year": year,
-                "chunk_index": i,
-                "source_file": file.filename,
+        for upload, name, number, yr in zip(uploads, names, numbers, years):
+            path, digest = await save_upload(upload)
+            saved.append({
+                "filename": upload.filename,
+                "path": path,
+                "digest": digest,
+                "law_name": name,
+                "law_number": number,
+                "year": yr,
             })
+        job = await pipeline.ingest_jobs.submit(saved)
+    except (HTTPException, asyncio.CancelledError):
+        discard(saved)
+        raise
+    except Exception as e:
+        discard(saved)
+        logger.error(f"❌ Upload failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Store in ChromaDB
-        count = await chroma.add_documents(chunks)
-        os.unlink(tmp_path)
+    logger.info(f"📥 Ingest job {job.id} queued for {len(saved)} file(s)")
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "files": len(saved),
+        "status_url": f"/api/ingest/{job.id}",
+    }
 
-        logger.info(f"✅ Ingested {count} chunks from {file.filename}")
-        return {
-            "status": "success",
-            "chunks_ingested": count,
-            "law_name": law_name,
-            "law_number": law_number,
-        }
 
-    except Exception as e:
-        logger.error(f"❌ Ingestion failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+@router.get("/ingest/{job_id}")
+async def get_ingest_job(job_id: str, pipeline: RAGPipeline = Depends(get_pipeline)):
+    """Progress of a background ingestion job: pages parsed, chunks embedded/stored, ETA."""
+    job = await asyncio.to_thread(pipeline.ingest_jobs.status, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown ingest job")
+    return job
 
 
 @router.get("/collection/stats")
-async def get_collection_stats():
+async def get_collection_stats(chroma: ChromaService = Depends(get_chroma_service)):
     """Get ChromaDB collection statistics."""
-    chroma = ChromaService()
     stats = await chroma.get_stats()
     return stats
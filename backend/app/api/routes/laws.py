@@ -0,0 +1,38 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.api.deps import get_pipeline
+from app.rag.chain import format_sources
+from app.rag.pipeline import RAGPipeline
+
+router = APIRouter()
+
+
+@router.get("/laws/{law}/sections/{section}")
+async def get_law_section(
+    law: str,
+    section: str,
+    limit: int = Query(5, ge=1, le=20),
+    pipeline: RAGPipeline = Depends(get_pipeline),
+):
+    """
+    Statute text of one section/article, e.g. `/api/laws/ppc/sections/302` or
+    `/api/laws/constitution/sections/199`, straight from the citation index.
+    """
+    if pipeline.keyword_index is None:
+        raise HTTPException(status_code=503, detail="Citation index disabled (HYBRID_SEARCH_ENABLED=false)")
+
+    docs = await asyncio.to_thread(pipeline.keyword_index.lookup_citation, law, section, limit)
+    if not docs:
+        raise HTTPException(status_code=404, detail=f"No text found for section {section} of '{law}'")
+
+    return {
+        "law": docs[0].metadata.get("law_name", law),
+        "section": section.upper(),
+        "text": "\n\n".join(doc.page_content for doc in docs),
+        "chunks": [
+            {**source, "chunk_id": doc.metadata.get("chunk_id"), "text": doc.page_content}
+            for source, doc in zip(format_sources(docs), docs)
+        ],
+    }
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
 from loguru import logger
+import asyncio
+import hashlib
 import json
 
-from app.rag.chain import query_laws
+from app.api.deps import get_pipeline
+from app.core import metrics
+from app.core.admission import AdmissionRejected
+from app.core.config import settings
+from app.rag.chain import answer_batch, flight_key, query_laws, stream_laws
+from app.rag.pipeline import RAGPipeline
 
 router = APIRouter()
 
@@ -14,28 +22,209 @@ class QueryRequest(BaseModel):
     stream: bool = False
 
 
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    # Send each distinct source once as a `source` line and refer to it by id
+    dedupe_sources: bool = True
+    # Generations in flight for this batch (capped at BATCH_CONCURRENCY)
+    concurrency: Optional[int] = None
+
+
 class QueryResponse(BaseModel):
     answer: str
     sources: list
     total_sources: int
+    cached: bool = False
+    tokens: Optional[dict] = None
+    timings: Optional[dict] = None
+    # normal, reduced, minimal or sources_only (no generation); see GET /api/load
+    load_stage: str = "normal"
+
+
+def _invalid(question: str) -> Optional[str]:
+    if not question.strip():
+        return "Question cannot be empty"
+    if len(question) > 5000:
+        return "Question too long (max 5000 chars)"
+    return None
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _sse_stream(question: str, pipeline: RAGPipeline, stage):
+    key = flight_key(question, stage)
+    try:
+        with metrics.track("query_stream") as timer:
+            async for event in pipeline.flights.stream(key, lambda: stream_laws(question, pipeline, stage)):
+                if event["event"] == "done":
+                    event = {**event, "data": {**event["data"], "timings": timer.breakdown()}}
+                yield _sse(event["event"], event["data"])
+        logger.info(f"✅ Streamed query answer ({timer.server_timing()})")
+    except asyncio.CancelledError:
+        logger.info("🔌 Client disconnected, upstream generation cancelled")
+        raise
+    except AdmissionRejected as e:
+        logger.warning(f"⏳ Streaming query rejected: {e.reason}")
+        yield _sse("error", {"detail": e.reason, "retry_after": e.retry_after})
+    except Exception as e:
+        logger.error(f"❌ Streaming query failed: {str(e)}")
+        yield _sse("error", {"detail": f"Query processing failed: {str(e)}"})
 
 
 @router.post("/query", response_model=QueryResponse)
-async def query_legal_database(request: QueryRequest):
+async def query_legal_database(
+    request: QueryRequest,
+    response: Response,
+    pipeline: RAGPipeline = Depends(get_pipeline),
+):
     """
     Submit a legal case scenario and receive relevant Pakistan laws + legal opinion.
-    """
-    if not request.question.strip():
-        raise HTTPException(status_code=400, detail="Question cannot be empty")
 
-    if len(request.question) > 5000:
-        raise HTTPException(status_code=400, detail="Question too long (max 5000 chars)")
+    With `stream: true` the response is a Server-Sent Events stream: one
+    `sources` event, then `token` events, then `done` (or `error`).
+    The per-stage latency breakdown is returned as `timings` (ms) and as a
+    `Server-Timing` header; streams carry it in the `done` event.
+    `load_stage` tells whether the answer was shortened under load.
+    """
+    if (invalid := _invalid(request.question)) is not None:
+        raise HTTPException(status_code=400, detail=invalid)
 
     try:
         logger.info(f"📜 Legal query received: {request.question[:100]}...")
-        result = await query_laws(request.question)
-        logger.info(f"✅ Query answered with {result['total_sources']} sources")
-        return result
+        # Identical questions coalesce only when they would be answered at the same load stage
+        stage = pipeline.degradation.select()
+        key = flight_key(request.question, stage)
+        if request.stream:
+            # Joining an in-flight stream, or a sources-only answer, takes no generation slot
+            if not pipeline.flights.streaming(key) and stage.generates:
+                pipeline.admission.check()
+            return StreamingResponse(
+                _sse_stream(request.question, pipeline, stage),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+        with metrics.track("query") as timer:
+            result = await pipeline.flights.run(key, lambda: query_laws(request.question, pipeline, stage))
+        response.headers["Server-Timing"] = timer.server_timing()
+        logger.info(f"✅ Query answered with {result['total_sources']} sources ({timer.server_timing()})")
+        # The result object is shared with the cache and coalesced callers
+        return {**result, "timings": timer.breakdown()}
+    except AdmissionRejected as e:
+        logger.warning(f"⏳ Query rejected: {e.reason}")
+        raise HTTPException(
+            status_code=503,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except Exception as e:
         logger.error(f"❌ Query failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Query processing failed: {str(e)}")
+
+
+def _ndjson(line: dict) -> str:
+    return json.dumps(line) + "\n"
+
+
+def _source_id(source: dict) -> str:
+    return hashlib.sha1(json.dumps(source, sort_keys=True).encode()).hexdigest()[:12]
+
+
+async def _ndjson_batch(request: BatchQueryRequest, pipeline: RAGPipeline, concurrency: int):
+    questions = request.questions
+    valid = []
+    answered = failed = 0
+    seen = set()
+    with metrics.track("query_batch") as timer:
+        for i, question in enumerate(questions):
+            if (invalid := _invalid(question)) is not None:
+                failed += 1
+                metrics.BATCH_QUESTIONS.inc(outcome="invalid")
+                yield _ndjson({"type": "error", "index": i, "detail": invalid})
+            else:
+                valid.append(i)
+
+        try:
+            async for indexes, result in answer_batch([questions[i] for i in valid], pipeline, concurrency):
+                if isinstance(result, Exception):
+                    detail = (result.reason if isinstance(result, AdmissionRejected)
+                              else f"Query processing failed: {str(result)}")
+                    logger.warning(f"⚠️ Batch question failed: {detail}")
+                    for n in indexes:
+                        failed += 1
+                        metrics.BATCH_QUESTIONS.inc(outcome="failed")
+                        yield _ndjson({"type": "error", "index": valid[n], "detail": detail})
+                    continue
+
+                if request.dedupe_sources:
+                    ids = []
+                    for source in result["sources"]:
+                        source_id = _source_id(source)
+                        if source_id not in seen:
+                            seen.add(source_id)
+                            yield _ndjson({"type": "source", "id": source_id, **source})
+                        ids.append(source_id)
+                    result = {k: v for k, v in result.items() if k != "sources"}
+                    result["source_ids"] = ids
+                for n in indexes:
+                    answered += 1
+                    metrics.BATCH_QUESTIONS.inc(outcome="cached" if result.get("cached") else "answered")
+                    yield _ndjson({"type": "result", "index": valid[n], **result})
+        except asyncio.CancelledError:
+            logger.info(f"🔌 Client disconnected, batch cancelled after {answered + failed}/{len(questions)}")
+            raise
+
+        done = {"type": "done", "total": len(questions), "answered": answered, "failed": failed,
+                "timings": timer.breakdown()}
+        if request.dedupe_sources:
+            done["unique_sources"] = len(seen)
+        yield _ndjson(done)
+    logger.info(f"✅ Batch of {len(questions)} answered ({answered} ok, {failed} failed, {timer.server_timing()})")
+
+
+@router.post("/query/batch")
+async def query_batch(request: BatchQueryRequest, pipeline: RAGPipeline = Depends(get_pipeline)):
+    """
+    Answer many questions in one request, streamed back as NDJSON.
+
+    All questions are embedded in one call, their vector searches run
+    concurrently and at most `concurrency` generations run at a time, each
+    taking an admission slot like a single query. Every line is a JSON
+    object with a `type`: `result` (with the question's `index`, in
+    completion order) or `error` per question, and a final `done` summary.
+    With `dedupe_sources` (default), each distinct source is sent once as a
+    `source` line and results list `source_ids` instead of `sources`.
+    """
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="No questions given")
+    if len(request.questions) > settings.BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400,
+                            detail=f"Too many questions (max {settings.BATCH_MAX_QUESTIONS} per batch)")
+
+    concurrency = max(1, min(request.concurrency or settings.BATCH_CONCURRENCY, settings.BATCH_CONCURRENCY))
+    logger.info(f"📚 Batch query received: {len(request.questions)} questions (concurrency {concurrency})")
+    return StreamingResponse(
+        _ndjson_batch(request, pipeline, concurrency),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/load")
+async def get_load(pipeline: RAGPipeline = Depends(get_pipeline)):
+    """Generation queue and the current load stage with its limits, for this worker."""
+    return {"admission": pipeline.admission.stats(), "degradation": pipeline.degradation.stats()}
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(pipeline: RAGPipeline = Depends(get_pipeline)):
+    """Answer, embedding and MMR candidate cache hit/miss counters, request coalescing and partition routing, for this worker."""
+    answers = {"enabled": False} if pipeline.cache is None else {"enabled": True, **pipeline.cache.stats()}
+    return {
+        "answers": answers,
+        "embeddings": pipeline.embeddings.stats(),
+        "candidates": pipeline.retriever.candidates.stats(),
+        "coalescing": pipeline.flights.stats(),
+        "routing": {"enabled": False} if pipeline.router is None else {"enabled": True, **pipeline.router.stats()},
+    }
@@ -0,0 +1,95 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from app.core import metrics
+from app.core.config import settings
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot get a generation slot in time."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Semaphore plus a bounded waiting room in front of the LLM.
+
+    At most `max_concurrent` requests hold a slot; up to `max_queue` more
+    may wait for `queue_timeout` seconds. Anything beyond that is rejected
+    immediately with a Retry-After hint instead of piling up into timeouts.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = settings.LLM_MAX_CONCURRENCY,
+        max_queue: int = settings.LLM_MAX_QUEUE,
+        queue_timeout: float = settings.LLM_QUEUE_TIMEOUT,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        # Moving average of how long a slot is held, used for Retry-After
+        self._avg_hold = 10.0
+        # (admitted at, seconds spent queued) of recent requests, read by the degradation controller.
+        # Generation time is left out: it grows with the answer length, not with the load
+        self._waits = deque(maxlen=256)
+
+    def retry_after(self) -> int:
+        rounds = (self.waiting + 1) / self.max_concurrent
+        return max(1, math.ceil(self._avg_hold * rounds))
+
+    def check(self):
+        """Fail fast when the waiting room is already full."""
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise AdmissionRejected("Generation queue is full", self.retry_after())
+
+    @asynccontextmanager
+    async def slot(self):
+        self.check()
+
+        self.waiting += 1
+        queued = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise AdmissionRejected("Timed out waiting for a generation slot", self.retry_after())
+        finally:
+            self.waiting -= 1
+            waited = time.perf_counter() - queued
+            metrics.record("queue", waited)
+            self._waits.append((time.monotonic(), waited))
+
+        self.active += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * (time.perf_counter() - start)
+            self._semaphore.release()
+
+    def recent_queue_wait(self, window: float) -> float:
+        """p90 time spent waiting for a slot over the last `window` seconds (0 without samples)."""
+        since = time.monotonic() - window
+        recent = sorted(seconds for admitted, seconds in self._waits if admitted >= since)
+        if not recent:
+            return 0.0
+        return recent[min(len(recent) - 1, int(len(recent) * 0.9))]
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+        }
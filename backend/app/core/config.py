@@ -3,9 +3,34 @@ from typing import List
 
 class Settings(BaseSettings):
     # Ollama
+    # Comma-separated replica URLs; each call goes to the healthy one with the fewest requests in flight
     OLLAMA_BASE_URL: str = "http://ollama:11434"
+    # Separate replicas for embeddings ("" = share OLLAMA_BASE_URL)
+    OLLAMA_EMBED_URL: str = ""
     OLLAMA_MODEL: str = "llama3.2:1b"
     EMBEDDING_MODEL: str = "nomic-embed-text"
+    OLLAMA_TIMEOUT: float = 300.0
+    OLLAMA_MAX_CONNECTIONS: int = 20
+    # Failover — failed calls move to another replica; failing replicas sit out OLLAMA_EJECT_SECONDS
+    # and are re-checked via /api/tags every OLLAMA_HEALTH_INTERVAL seconds
+    OLLAMA_RETRIES: int = 2
+    OLLAMA_EJECT_SECONDS: float = 10.0
+    OLLAMA_HEALTH_INTERVAL: float = 5.0
+    # Startup — with FAST_BOOT the API serves at once while the vector store, model pulls and warm-up
+    # run in the background; GET /ready answers 503 until they finish (failed steps are retried)
+    FAST_BOOT: bool = True
+    STARTUP_RETRY_SECONDS: float = 5.0
+    STARTUP_WARMUP: bool = True
+    # Vector store — "http" (Chroma server), "persistent" (embedded Chroma), "flat" (NumPy exact search)
+    # or "mmap" (read-only quantized index built by scripts/build_vector_index.py)
+    VECTOR_BACKEND: str = "http"
+    CHROMA_PERSIST_DIR: str = "data/chroma"
+    FLAT_INDEX_DIR: str = "data/index/flat"
+    MMAP_INDEX_DIR: str = "data/index/mmap"
+    MMAP_INDEX_NPROBE: int = 8
+    # Partitioning — one collection per statute family, searched only where the question points
+    PARTITION_BY_FAMILY: bool = False
+    PARTITION_MAX_ROUTED: int = 2
     # ChromaDB
     CHROMA_HOST: str = "chromadb"
     CHROMA_PORT: int = 8000
@@ -17,6 +42,79 @@ class Settings(BaseSettings):
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
     TOP_K_RESULTS: int = 5
+    # Generation window — prompt + answer must fit in LLM_NUM_CTX tokens
+    LLM_NUM_CTX: int = 2048
+    LLM_NUM_PREDICT: int = 2048
+    # Context packing — token budget for retrieved law text in the prompt. The answer keeps its
+    # num_predict free in the window: at least CONTEXT_RESERVE_TOKENS, at most
+    # CONTEXT_MAX_RESERVE_SHARE of LLM_NUM_CTX
+    CONTEXT_TOKENIZER: str = "cl100k_base"
+    CONTEXT_TOKEN_BUDGET: int = 1024
+    CONTEXT_RESERVE_TOKENS: int = 512
+    CONTEXT_MAX_RESERVE_SHARE: float = 0.5
+    CONTEXT_MIN_CHUNK_TOKENS: int = 64
+    # MMR re-ranking — candidates fetched per query and relevance/diversity trade-off
+    MMR_FETCH_K: int = 100
+    MMR_LAMBDA: float = 0.7
+    MMR_CANDIDATE_CACHE_SIZE: int = 20000
+    # Hybrid retrieval — BM25 keyword index fused with vector search (RRF)
+    HYBRID_SEARCH_ENABLED: bool = True
+    KEYWORD_INDEX_PATH: str = "data/index/keyword.sqlite3"
+    KEYWORD_TOP_K: int = 20
+    RRF_K: int = 60
+    # Background ingestion jobs — job progress (saved every INGEST_JOB_SYNC_SECONDS) and the chunk
+    # ids of each uploaded law are kept in INGEST_STATE_PATH, shared by every worker and replica
+    # mounting data/, so any of them answers GET /api/ingest/{job_id}
+    INGEST_UPLOAD_DIR: str = "data/uploads"
+    INGEST_MAX_UPLOAD_MB: int = 200
+    INGEST_STATE_PATH: str = "data/ingest.sqlite3"
+    INGEST_WORKERS: int = 2
+    INGEST_EMBED_CONCURRENCY: int = 2
+    INGEST_JOB_HISTORY: int = 100
+    INGEST_JOB_SYNC_SECONDS: float = 1.0
+    # PDF extraction — page ranges parsed in a process pool (0 = serially), text cached per file digest
+    INGEST_PDF_WORKERS: int = 2
+    INGEST_PDF_PAGES_PER_TASK: int = 16
+    INGEST_TEXT_CACHE_DIR: str = "data/cache/pdf_text"
+    # Admission control — bounds concurrent generations on the Ollama model
+    LLM_MAX_CONCURRENCY: int = 2
+    LLM_MAX_QUEUE: int = 16
+    LLM_QUEUE_TIMEOUT: float = 60.0
+    # Graceful degradation — under load, answers shrink in stages (reduced, minimal) and the last
+    # stage (sources_only) skips the LLM. Stage N starts once the generation queue holds
+    # DEGRADE_QUEUE_DEPTHS[N-1] requests or the p90 wait for a generation slot over the last
+    # DEGRADE_QUEUE_WAIT_WINDOW seconds reaches DEGRADE_QUEUE_WAIT_SECONDS[N-1] (keep these below
+    # LLM_QUEUE_TIMEOUT); it steps back down one stage per DEGRADE_COOLDOWN seconds. Per-stage
+    # limits for reduced and minimal:
+    DEGRADE_ENABLED: bool = True
+    DEGRADE_QUEUE_DEPTHS: List[int] = [4, 8, 12]
+    DEGRADE_QUEUE_WAIT_SECONDS: List[float] = [10.0, 20.0, 40.0]
+    DEGRADE_QUEUE_WAIT_WINDOW: float = 60.0
+    DEGRADE_COOLDOWN: float = 10.0
+    DEGRADE_NUM_PREDICT: List[int] = [1024, 384]
+    DEGRADE_TOP_K: List[int] = [4, 3]
+    DEGRADE_CONTEXT_TOKENS: List[int] = [768, 512]
+    # Batch queries (POST /api/query/batch) — generations a batch runs at once (each also takes an
+    # admission slot) and vector searches it runs at once
+    BATCH_MAX_QUESTIONS: int = 1000
+    BATCH_CONCURRENCY: int = 2
+    BATCH_SEARCH_CONCURRENCY: int = 8
+    # Coalesce concurrent identical questions into one retrieval + generation
+    COALESCE_ENABLED: bool = True
+    # Answer cache — exact (normalized text) and semantic (embedding) tiers
+    ANSWER_CACHE_ENABLED: bool = True
+    # Stamp bumped whenever ingestion changes the collection; every worker and replica sharing data/
+    # stops serving answers cached before it
+    COLLECTION_VERSION_PATH: str = "data/collection.version"
+    ANSWER_CACHE_MAX_ENTRIES: int = 1024
+    ANSWER_CACHE_TTL: float = 3600.0
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 512
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    # Embedding cache — in-process LRU plus optional SQLite store ("" disables it), holding at most
+    # EMBED_CACHE_MAX_ROWS vectors (oldest pruned first, ~3 KB each at 768 dimensions; 0 = no cap)
+    EMBED_CACHE_SIZE: int = 10000
+    EMBED_CACHE_PATH: str = "data/cache/embeddings.sqlite3"
+    EMBED_CACHE_MAX_ROWS: int = 100000
 
     class Config:
         env_file = ".env"
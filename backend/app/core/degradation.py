@@ -0,0 +1,111 @@
+import time
+from typing import List, NamedTuple
+
+from loguru import logger
+
+from app.core import metrics
+from app.core.config import settings
+
+STAGE_NAMES = ("normal", "reduced", "minimal", "sources_only")
+
+
+class LoadStage(NamedTuple):
+    level: int
+    name: str
+    num_predict: int
+    top_k: int
+    context_tokens: int
+
+    @property
+    def generates(self) -> bool:
+        """False at the last stage, where answers are built from the sources alone."""
+        return self.level < len(STAGE_NAMES) - 1
+
+
+def build_stages(num_predict: List[int] = settings.DEGRADE_NUM_PREDICT, top_k: List[int] = settings.DEGRADE_TOP_K,
+                 context_tokens: List[int] = settings.DEGRADE_CONTEXT_TOKENS) -> List[LoadStage]:
+    """Normal limits from the generation settings, then the reduced and minimal ones, then sources only."""
+    limits = [(settings.LLM_NUM_PREDICT, settings.TOP_K_RESULTS, settings.CONTEXT_TOKEN_BUDGET),
+              *zip(num_predict, top_k, context_tokens)]
+    # Sources only: no generation, the usual number of sources
+    limits.append((0, settings.TOP_K_RESULTS, 0))
+    return [LoadStage(level, name, *limits[level]) for level, name in enumerate(STAGE_NAMES)]
+
+
+class DegradationController:
+    """
+    Picks how much work each query may cost from the live generation load.
+
+    The stage is the highest one whose queue depth or recent queue wait
+    threshold is met (see `AdmissionController.recent_queue_wait`). Load
+    rising moves it up at once; it comes back down one stage at a time,
+    no sooner than `cooldown` seconds after the last change, so it does not
+    flap while the queue drains.
+    """
+
+    def __init__(
+        self,
+        admission,
+        enabled: bool = settings.DEGRADE_ENABLED,
+        queue_depths: List[int] = settings.DEGRADE_QUEUE_DEPTHS,
+        queue_wait_seconds: List[float] = settings.DEGRADE_QUEUE_WAIT_SECONDS,
+        window: float = settings.DEGRADE_QUEUE_WAIT_WINDOW,
+        cooldown: float = settings.DEGRADE_COOLDOWN,
+        stages: List[LoadStage] = None,
+    ):
+        self.admission = admission
+        self.enabled = enabled
+        self.queue_depths = queue_depths
+        self.queue_wait_seconds = queue_wait_seconds
+        self.window = window
+        self.cooldown = cooldown
+        self.stages = stages or build_stages()
+        self.level = 0
+        self._changed = time.monotonic()
+
+    def _target(self) -> int:
+        waiting = self.admission.waiting
+        queue_wait = self.admission.recent_queue_wait(self.window)
+        target = 0
+        for level, (depth, seconds) in enumerate(zip(self.queue_depths, self.queue_wait_seconds), 1):
+            if waiting >= depth or queue_wait >= seconds:
+                target = level
+        return min(target, len(self.stages) - 1)
+
+    def peek(self) -> LoadStage:
+        """Current stage, without moving it; for status reads such as `stats()` and the gauge."""
+        return self.stages[self.level if self.enabled else 0]
+
+    def select(self) -> LoadStage:
+        """
+        Stage for a new query. The only place the stage changes: it first
+        follows the load up at once, or down one stage after the cooldown.
+        """
+        if not self.enabled:
+            return self.stages[0]
+        target = self._target()
+        now = time.monotonic()
+        if target > self.level or (target < self.level and now - self._changed >= self.cooldown):
+            level = target if target > self.level else self.level - 1
+            log = logger.warning if level > self.level else logger.info
+            log(f"{'📉' if level > self.level else '📈'} Load stage {self.stages[self.level].name} → "
+                f"{self.stages[level].name} (waiting={self.admission.waiting}, "
+                f"p90 wait={self.admission.recent_queue_wait(self.window):.1f}s)")
+            self.level = level
+            self._changed = now
+        return self.stages[self.level]
+
+    def count(self, stage: LoadStage):
+        """Counts one query about to retrieve and generate at `stage` in `paklex_load_stage_requests_total`."""
+        metrics.LOAD_STAGE_REQUESTS.inc(stage=stage.name)
+
+    def stats(self) -> dict:
+        stage = self.peek()
+        return {
+            "enabled": self.enabled,
+            "stage": stage.name,
+            "level": stage.level,
+            "waiting": self.admission.waiting,
+            "p90_queue_wait_s": round(self.admission.recent_queue_wait(self.window), 3),
+            "limits": stage._asdict(),
+        }
@@ -0,0 +1,262 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Seconds; spans a cache hit (~ms) up to a long CPU-only generation
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 200)
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class _Value(_Metric):
+    """
+    One float per label set, updated in place or read from `fn` (returning
+    {label tuple: value}) at scrape time.
+    """
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 fn: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self.fn = fn
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        if self.fn is not None:
+            try:
+                values.update(self.fn())
+            except Exception:
+                # A failing collector must not break the whole scrape
+                pass
+        return [f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in values.items()]
+
+
+class Counter(_Value):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Value):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # per-bucket counts, then sum and count
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, series in self._series.items():
+                bounds = [str(b) for b in self.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, series[:len(self.buckets)] + [series[-1]]):
+                    le = 'le="' + bound + '"'
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {count}")
+                labels = _labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {series[-2]}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = (), fn=None) -> Counter:
+        return self.register(Counter(name, help, labels, fn))
+
+    def gauge(self, name: str, help: str, labels: Tuple[str, ...] = (), fn=None) -> Gauge:
+        return self.register(Gauge(name, help, labels, fn))
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "paklex_http_request_duration_seconds", "HTTP request latency", ("route", "method", "status"))
+STAGE_SECONDS = REGISTRY.histogram(
+    "paklex_stage_duration_seconds", "Latency of one RAG pipeline stage", ("route", "stage"))
+LLM_TTFT_SECONDS = REGISTRY.histogram(
+    "paklex_llm_time_to_first_token_seconds", "Generation start to first streamed token", ("route",))
+LLM_PREFILL_SECONDS = REGISTRY.histogram(
+    "paklex_llm_prefill_seconds", "Ollama prompt evaluation time (prompt_eval_duration)")
+LLM_DECODE_RATE = REGISTRY.histogram(
+    "paklex_llm_decode_tokens_per_second", "Ollama generation speed (eval_count / eval_duration)",
+    buckets=RATE_BUCKETS)
+LLM_TOKENS = REGISTRY.counter(
+    "paklex_llm_tokens_total", "Tokens processed by Ollama generations", ("kind",))
+INGEST_ITEMS = REGISTRY.counter(
+    "paklex_ingest_items_total", "Items completed by each ingestion stage", ("stage", "unit"))
+INGEST_BUSY_SECONDS = REGISTRY.counter(
+    "paklex_ingest_busy_seconds_total", "Worker time spent in each ingestion stage", ("stage",))
+PARTITION_SEARCHES = REGISTRY.counter(
+    "paklex_partition_searches_total", "Vector searches per statute-family partition", ("partition",))
+PARTITION_FALLBACKS = REGISTRY.counter(
+    "paklex_partition_fallbacks_total", "Routed searches widened to every partition for lack of matches")
+OLLAMA_RETRIES = REGISTRY.counter(
+    "paklex_ollama_retries_total", "Ollama calls retried on another replica after a failure", ("pool",))
+OLLAMA_EJECTIONS = REGISTRY.counter(
+    "paklex_ollama_ejections_total", "Ollama replicas taken out of rotation", ("pool", "replica"))
+LOAD_STAGE_REQUESTS = REGISTRY.counter(
+    "paklex_load_stage_requests_total", "Queries answered at each load stage", ("stage",))
+BATCH_QUESTIONS = REGISTRY.counter(
+    "paklex_batch_questions_total", "Questions received in batch queries, by outcome", ("outcome",))
+
+
+class RequestTimer:
+    """
+    Per-request stage breakdown in milliseconds.
+
+    Bound to the current context by `track`; `stage` and `record` anywhere
+    down the call stack (including tasks spawned from it) add to it and to
+    the `STAGE_SECONDS` histogram under the timer's route.
+    """
+
+    def __init__(self, route: str):
+        self.route = route
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        # Non-duration figures such as decode speed
+        self.values: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float):
+        self.stages[name] = round(self.stages.get(name, 0.0) + seconds * 1000, 2)
+        STAGE_SECONDS.observe(seconds, route=self.route, stage=name)
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.start) * 1000, 2)
+
+    def breakdown(self) -> Dict[str, float]:
+        """Stage durations in ms, the request total, then `values`."""
+        return {**self.stages, "total": self.elapsed_ms(), **self.values}
+
+    def server_timing(self) -> str:
+        """`Server-Timing` header value, shown per request in browser dev tools."""
+        stages = {**self.stages, "total": self.elapsed_ms()}
+        return ", ".join(f"{name};dur={ms}" for name, ms in stages.items())
+
+
+_current: ContextVar[Optional[RequestTimer]] = ContextVar("paklex_request_timer", default=None)
+
+
+@contextmanager
+def track(route: str) -> Iterator[RequestTimer]:
+    timer = RequestTimer(route)
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return _current.get()
+
+
+def record(name: str, seconds: float):
+    timer = _current.get()
+    if timer is not None:
+        timer.record(name, seconds)
+    else:
+        STAGE_SECONDS.observe(seconds, route="none", stage=name)
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def record_ttft(seconds: float):
+    timer = _current.get()
+    LLM_TTFT_SECONDS.observe(seconds, route=timer.route if timer else "none")
+    record("llm_ttft", seconds)
+
+
+def record_generation(stats: dict):
+    """Record the timing fields of Ollama's final `done` message (durations are ns)."""
+    prompt_ns = stats.get("prompt_eval_duration") or 0
+    eval_ns = stats.get("eval_duration") or 0
+    eval_count = stats.get("eval_count") or 0
+    LLM_TOKENS.inc(stats.get("prompt_eval_count") or 0, kind="prompt")
+    LLM_TOKENS.inc(eval_count, kind="completion")
+    if prompt_ns:
+        LLM_PREFILL_SECONDS.observe(prompt_ns / 1e9)
+        record("llm_prefill", prompt_ns / 1e9)
+    if eval_ns:
+        rate = eval_count / (eval_ns / 1e9)
+        LLM_DECODE_RATE.observe(rate)
+        record("llm_decode", eval_ns / 1e9)
+        timer = _current.get()
+        if timer is not None:
+            timer.values["decode_tokens_per_s"] = round(rate, 1)
+            timer.values["completion_tokens"] = eval_count
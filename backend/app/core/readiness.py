@@ -0,0 +1,35 @@
+import time
+from typing import Iterable, Optional
+
+
+class Readiness:
+    """
+    State of the startup steps, reported by GET /ready.
+
+    Every step starts `pending` and ends `ready` or `failed` (with the last
+    error; a failed step may be retried and turn `ready` later). The
+    process is ready once every step is ready.
+    """
+
+    def __init__(self, steps: Iterable[str]):
+        self.started = time.monotonic()
+        self.steps = {name: {"status": "pending"} for name in steps}
+
+    def mark(self, step: str, status: str, error: Optional[str] = None, seconds: Optional[float] = None):
+        state = {"status": status}
+        if error:
+            state["error"] = error
+        if seconds is not None:
+            state["seconds"] = round(seconds, 3)
+        self.steps[step] = state
+
+    @property
+    def ready(self) -> bool:
+        return all(state["status"] == "ready" for state in self.steps.values())
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "uptime_seconds": round(time.monotonic() - self.started, 3),
+            "steps": dict(self.steps),
+        }
@@ -0,0 +1,117 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+class _Broadcast:
+    """Events of one in-flight stream, replayed to every subscriber."""
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self.subscribers = 0
+        self.changed = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical work into one in-flight execution.
+
+    `run` shares one task between callers with the same key; `stream` shares
+    one async iterator, fanning every event out to all subscribers (late
+    joiners first get a replay of what was already produced). A shared
+    stream is cancelled once its last subscriber goes away, so an abandoned
+    generation still stops upstream. Keys are dropped as soon as the work
+    finishes; later callers start fresh (and usually hit the answer cache).
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.stream_leaders = 0
+        self.stream_coalesced = 0
+
+    def streaming(self, key: str) -> bool:
+        return key in self._streams
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await factory()
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._calls.pop(key, None) if self._calls.get(key) is t else None)
+        else:
+            self.coalesced += 1
+        # One caller disconnecting must not cancel the work the others wait on
+        return await asyncio.shield(task)
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        if not self.enabled:
+            async for event in factory():
+                yield event
+            return
+
+        flight = self._streams.get(key)
+        if flight is None:
+            self.stream_leaders += 1
+            flight = _Broadcast()
+            self._streams[key] = flight
+            flight.task = asyncio.ensure_future(self._pump(key, flight, factory()))
+        else:
+            self.stream_coalesced += 1
+
+        flight.subscribers += 1
+        try:
+            seen = 0
+            while True:
+                async with flight.changed:
+                    await flight.changed.wait_for(lambda: len(flight.events) > seen or flight.done)
+                    batch = flight.events[seen:]
+                    finished = flight.done
+                seen += len(batch)
+                for event in batch:
+                    yield event
+                if finished:
+                    break
+            if flight.error is not None:
+                raise flight.error
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: str, flight: _Broadcast):
+        if self._streams.get(key) is flight:
+            del self._streams[key]
+
+    async def _pump(self, key: str, flight: _Broadcast, events: AsyncIterator[Any]):
+        try:
+            async for event in events:
+                async with flight.changed:
+                    flight.events.append(event)
+                    flight.changed.notify_all()
+        except Exception as e:
+            flight.error = e
+        finally:
+            self._forget(key, flight)
+            flight.done = True
+            async with flight.changed:
+                flight.changed.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._calls) + len(self._streams),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "stream_leaders": self.stream_leaders,
+            "stream_coalesced": self.stream_coalesced,
+        }
@@ -0,0 +1,112 @@
+import re
+import time
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from app.rag.router import law_family, law_jurisdiction
+
+SEPARATORS = ["\n\n", "\n", "Section", "Article", ". ", " "]
+# Streamed text is split once this many chunk sizes have accumulated
+STREAM_BUFFER_CHUNKS = 4
+
+
+# ── Metadata helpers ──────────────────────────────────────────────
+def clean_law_name(filename: str) -> str:
+    name = re.sub(r'^[a-z0-9]{10,}', '', filename)
+    name = name.replace(".pdf.txt", "").replace(".pdf", "").replace(".txt", "")
+    name = name.replace("_", " ").replace("-", " ").strip()
+    return name.title() if name else filename
+
+def extract_year(text: str) -> str:
+    match = re.search(r'(18|19|20)\d{2}', text[:500])
+    return match.group(0) if match else "N/A"
+
+def extract_section(text: str) -> str:
+    match = re.search(r'(Section|SECTION|Article|ARTICLE|Clause)\s+(\d+[A-Z]?)', text)
+    return match.group(2) if match else "General"
+
+def extract_title(text: str) -> str:
+    lines = [l.strip() for l in text[:1000].split('\n') if len(l.strip()) > 10]
+    for line in lines:
+        if any(word in line.upper() for word in ['ACT', 'ORDINANCE', 'CODE', 'ORDER', 'RULES']):
+            return line.strip()[:80]
+    return lines[0][:80] if lines else "Unknown Law"
+
+
+# ── Splitting (runs inside ingestion worker processes) ────────────
+@lru_cache(maxsize=8)
+def get_splitter(chunk_size: int, chunk_overlap: int):
+    # Imported here so the API process does not load langchain until something is ingested
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=SEPARATORS,
+    )
+
+def split_law(law: dict, chunk_size: int, chunk_overlap: int) -> List[Tuple[str, dict]]:
+    """
+    Split one law into `(chunk_text, metadata)` pairs.
+
+    `law` carries `text`, `source_file`, `law_name`, `law_number` and
+    `year`; the section number is extracted per chunk.
+    """
+    chunks = get_splitter(chunk_size, chunk_overlap).split_text(law["text"])
+    return [(chunk, chunk_metadata(law, chunk, j)) for j, chunk in enumerate(chunks)]
+
+def chunk_metadata(law: dict, chunk: str, index: int) -> dict:
+    return {
+        "law_name"    : law["law_name"],
+        "law_number"  : law["law_number"],
+        "section"     : extract_section(chunk),
+        "year"        : law["year"],
+        "chunk_index" : index,
+        "source_file" : law["source_file"],
+        # Statute family picks the partition; jurisdiction is kept for filtering
+        "family"      : law_family(law["law_name"], law["source_file"]),
+        "jurisdiction": law_jurisdiction(law["law_name"], law["source_file"]),
+    }
+
+def split_pages(law: dict, pages: Iterable[str], chunk_size: int, chunk_overlap: int) -> Iterator[Tuple[str, dict]]:
+    """
+    Split a law whose text arrives page by page, yielding chunks as they become final.
+
+    Pages are joined with blank lines as for whole-text splitting. Once
+    `STREAM_BUFFER_CHUNKS` chunks' worth of text is buffered it is split;
+    every chunk but the last is final, and the last is carried over and
+    re-split together with the pages that follow.
+    """
+    splitter = get_splitter(chunk_size, chunk_overlap)
+    buffer, index = "", 0
+    for page in pages:
+        buffer = f"{buffer}\n\n{page}" if buffer else page
+        if len(buffer) < STREAM_BUFFER_CHUNKS * chunk_size:
+            continue
+        chunks = splitter.split_text(buffer)
+        for chunk in chunks[:-1]:
+            yield chunk, chunk_metadata(law, chunk, index)
+            index += 1
+        buffer = chunks[-1] if chunks else ""
+    for chunk in splitter.split_text(buffer) if buffer.strip() else []:
+        yield chunk, chunk_metadata(law, chunk, index)
+        index += 1
+
+def timed_split_law(law: dict, chunk_size: int, chunk_overlap: int) -> Tuple[List[Tuple[str, dict]], float]:
+    start = time.perf_counter()
+    chunks = split_law(law, chunk_size, chunk_overlap)
+    return chunks, time.perf_counter() - start
+
+def law_from_corpus_entry(index: int, entry: dict) -> Optional[dict]:
+    """Build a law record from a `{file_name, text}` corpus entry, or None if empty."""
+    filename = entry.get("file_name", f"unknown_{index}")
+    text     = entry.get("text", "").strip()
+    if not text:
+        return None
+    clean_name = clean_law_name(filename)
+    return {
+        "source_file": filename,
+        "text"       : text,
+        "law_name"   : extract_title(text) if len(clean_name) < 5 else clean_name,
+        "law_number" : f"Source: {filename[:30]}",
+        "year"       : extract_year(text),
+    }
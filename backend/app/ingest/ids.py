@@ -0,0 +1,18 @@
+import hashlib
+
+
+def chunk_id(source_file: str, chunk_index: int, text: str) -> str:
+    """
+    Stable, content-addressed chunk id.
+
+    Unlike Python's salted `hash()`, the digest is identical across runs and
+    processes, so re-ingesting a law upserts the same ids instead of adding
+    duplicates.
+    """
+    digest = hashlib.sha256(f"{source_file}\0{chunk_index}\0{text}".encode("utf-8")).hexdigest()
+    return f"doc_{digest[:32]}"
+
+
+def law_digest(text: str) -> str:
+    """Digest of a whole law's text, used to detect unchanged laws on re-runs."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -0,0 +1,287 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.ingest.manifest import UploadRegistry
+from app.ingest.pdf import PdfExtractor
+from app.ingest.pipeline import IngestPipeline
+
+
+def load_pages(path: str, pdf: PdfExtractor, digest: Optional[str] = None):
+    """Yield the text of each page (PDF) or the whole file (TXT)."""
+    if path.endswith(".pdf"):
+        yield from pdf.pages(path, digest)
+        return
+    # langchain_community is slow to import; only text uploads need it
+    from langchain_community.document_loaders import TextLoader
+    for page in TextLoader(path).lazy_load():
+        yield page.page_content
+
+
+class IngestJob:
+    """Progress of one background ingestion of one or more uploaded files."""
+
+    def __init__(self, files: List[dict]):
+        self.id = uuid.uuid4().hex
+        self.files = files
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.pages_parsed = 0
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.pipeline: Optional[IngestPipeline] = None
+        self.result: Optional[dict] = None
+
+    def to_dict(self) -> dict:
+        totals = self.result or (getattr(self.pipeline, "totals", None) or {})
+        chunks_total = totals.get("chunks", 0)
+        chunks_stored = totals.get("chunks_stored", 0)
+        stats = getattr(self.pipeline, "stats", None) or {}
+        chunks_embedded = stats["embed"].items if "embed" in stats else chunks_stored
+
+        eta = None
+        if self.status == "running" and self.started_at and chunks_stored:
+            rate = chunks_stored / (time.time() - self.started_at)
+            # Chunk totals grow while files are still being parsed
+            eta = round((chunks_total - chunks_stored) / rate, 1) if rate else None
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "files": [{k: f[k] for k in ("filename", "law_name", "law_number", "year")} for f in self.files],
+            "pages_parsed": self.pages_parsed,
+            "chunks_total": chunks_total,
+            "chunks_embedded": chunks_embedded,
+            "chunks_stored": chunks_stored,
+            "eta_seconds": eta,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobStore:
+    """
+    Snapshots of ingestion jobs (`IngestJob.to_dict`) on SQLite.
+
+    Every uvicorn worker and every replica sharing `data/` reads the same
+    file, so `GET /api/ingest/{job_id}` works wherever the request lands,
+    and finished jobs outlive restarts. The worker running a job rewrites
+    its snapshot every `sync_seconds`; an unfinished job not updated for
+    `STALE_SYNCS` intervals belonged to a worker that stopped, and is
+    reported as failed. Only the newest `history` jobs are kept.
+    """
+
+    STALE_SYNCS = 10
+
+    def __init__(self, path: str, history: int = settings.INGEST_JOB_HISTORY,
+                 sync_seconds: float = settings.INGEST_JOB_SYNC_SECONDS):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.history = history
+        self.sync_seconds = sync_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS ingest_jobs ("
+            "job_id TEXT PRIMARY KEY, created_at REAL NOT NULL, updated_at REAL NOT NULL, snapshot TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS ingest_jobs_created ON ingest_jobs(created_at);"
+        )
+        self._conn.commit()
+
+    def save(self, snapshots: List[dict]):
+        now = time.time()
+        with self._lock, self._conn as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO ingest_jobs VALUES (?, ?, ?, ?)",
+                [(s["job_id"], s["created_at"], now, json.dumps(s)) for s in snapshots],
+            )
+            conn.execute(
+                "DELETE FROM ingest_jobs WHERE job_id NOT IN "
+                "(SELECT job_id FROM ingest_jobs ORDER BY created_at DESC LIMIT ?)",
+                (self.history,),
+            )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT updated_at, snapshot FROM ingest_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        snapshot = json.loads(row[1])
+        if snapshot["status"] in ("queued", "running") and time.time() - row[0] > self.STALE_SYNCS * self.sync_seconds:
+            snapshot.update(status="failed", eta_seconds=None, error="Interrupted: the worker running this job stopped")
+        return snapshot
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class IngestJobManager:
+    """
+    Runs uploaded-document ingestion in a background thread pool.
+
+    Each job streams its files page by page through an `IngestPipeline`
+    (split → embed → upsert); PDF pages come from a shared `PdfExtractor`
+    process pool and its per-digest text cache. Once a law is fully stored,
+    the chunks of its earlier upload that the new version did not write
+    again are deleted (see `UploadRegistry`), so a failed re-upload leaves
+    the earlier version searchable. Job progress is written to a shared
+    `JobStore`, where status queries from any worker read it.
+    """
+
+    def __init__(self, chroma, embeddings, on_complete: Optional[Callable[["IngestJob"], None]] = None):
+        self.chroma = chroma
+        self.embeddings = embeddings
+        self.on_complete = on_complete
+        self.jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._uploads: Optional[UploadRegistry] = None
+        self._store: Optional[JobStore] = None
+        self._state_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._syncer: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=settings.INGEST_WORKERS, thread_name_prefix="ingest-job")
+        self.pdf = PdfExtractor(settings.INGEST_PDF_WORKERS, settings.INGEST_PDF_PAGES_PER_TASK,
+                                settings.INGEST_TEXT_CACHE_DIR or None)
+
+    async def submit(self, files: List[dict]) -> IngestJob:
+        job = IngestJob(files)
+        # Stored before the 202 goes out, so any worker can answer the first status query
+        await asyncio.to_thread(self._save, job)
+        self.jobs[job.id] = job
+        while len(self.jobs) > settings.INGEST_JOB_HISTORY:
+            self.jobs.popitem(last=False)
+        self._start_syncer()
+
+        future = asyncio.get_running_loop().run_in_executor(self._executor, self._run, job)
+        future.add_done_callback(lambda _: self._finished(job))
+        return job
+
+    def status(self, job_id: str) -> Optional[dict]:
+        """Progress of a job run by this worker, else its last snapshot in the shared store. Blocking."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self.store.get(job_id)
+
+    # Opened by the first upload or status query, not at startup
+    @property
+    def uploads(self) -> UploadRegistry:
+        with self._state_lock:
+            if self._uploads is None:
+                self._uploads = UploadRegistry(settings.INGEST_STATE_PATH)
+        return self._uploads
+
+    @property
+    def store(self) -> JobStore:
+        with self._state_lock:
+            if self._store is None:
+                self._store = JobStore(settings.INGEST_STATE_PATH)
+        return self._store
+
+    def _save(self, *jobs: IngestJob):
+        self.store.save([job.to_dict() for job in jobs])
+
+    def _start_syncer(self):
+        if self._syncer is None:
+            self._syncer = threading.Thread(target=self._sync, name="ingest-job-sync", daemon=True)
+            self._syncer.start()
+
+    def _sync(self):
+        """Rewrite the snapshots of this worker's unfinished jobs every `INGEST_JOB_SYNC_SECONDS`."""
+        while not self._stop.wait(settings.INGEST_JOB_SYNC_SECONDS):
+            unfinished = [job for job in list(self.jobs.values()) if job.status in ("queued", "running")]
+            if not unfinished:
+                continue
+            try:
+                self._save(*unfinished)
+            except Exception as e:
+                logger.warning(f"⚠️ Saving ingest job progress failed: {e}")
+
+    def _laws(self, job: IngestJob):
+        def pages(f: dict):
+            for text in load_pages(f["path"], self.pdf, f.get("digest")):
+                job.pages_parsed += 1
+                yield text
+
+        for f in job.files:
+            yield {
+                "source_file": f["filename"],
+                "digest": f.get("digest"),
+                "pages": pages(f),
+                "law_name": f["law_name"],
+                "law_number": f["law_number"],
+                "year": f["year"],
+            }
+
+    def _replace_earlier(self, law: dict):
+        ids = law.get("ids", [])
+        stale = self.uploads.stale(law, ids)
+        if stale:
+            self.chroma.delete_ids(stale)
+            logger.info(f"🧹 Removed {len(stale)} outdated chunks of {law['source_file']}")
+        self.uploads.record(law, ids)
+
+    def _run(self, job: IngestJob):
+        job.status = "running"
+        job.started_at = time.time()
+        job.pipeline = IngestPipeline(
+            self.embeddings,
+            self.chroma.upsert,
+            chunk_size=settings.CHUNK_SIZE,
+            chunk_overlap=settings.CHUNK_OVERLAP,
+            embed_workers=settings.INGEST_EMBED_CONCURRENCY,
+            split_workers=0,
+            on_law_stored=self._replace_earlier,
+        )
+        try:
+            job.result = job.pipeline.run(self._laws(job))
+            if job.result["errors"]:
+                job.status = "failed"
+                job.error = f"Failed to ingest: {', '.join(job.result['errors'])}"
+            else:
+                job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            for f in job.files:
+                if os.path.exists(f["path"]):
+                    os.unlink(f["path"])
+            try:
+                self._save(job)
+            except Exception as e:
+                logger.error(f"❌ Saving ingest job {job.id} failed: {e}")
+
+    def _finished(self, job: IngestJob):
+        if job.status == "completed":
+            logger.info(f"✅ Ingest job {job.id}: {job.result['chunks_stored']} chunks from {len(job.files)} file(s)")
+        else:
+            logger.error(f"❌ Ingest job {job.id} failed: {job.error}")
+        if self.on_complete:
+            self.on_complete(job)
+
+    def shutdown(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.pdf.shutdown()
+        if self._syncer is not None:
+            self._syncer.join()
+        for state in (self._uploads, self._store):
+            if state is not None:
+                state.close()
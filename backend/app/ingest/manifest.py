@@ -0,0 +1,128 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+
+class IngestManifest:
+    """
+    Append-only checkpoint of laws that are fully stored in the collection.
+
+    Each line records `source_file`, the law's text digest and its chunk
+    count, written only after all of the law's chunks are upserted. An
+    interrupted run therefore resumes from the last flushed law, and a law
+    whose digest is unchanged is skipped with a single dict lookup.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from a crash; the law is redone
+                        continue
+                    self._entries[entry["source_file"]] = entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def digest_of(self, source_file: str) -> Optional[str]:
+        entry = self._entries.get(source_file)
+        return entry["digest"] if entry else None
+
+    def is_current(self, source_file: str, digest: str) -> bool:
+        return self.digest_of(source_file) == digest
+
+    def record(self, source_file: str, digest: str, chunks: int):
+        entry = {"source_file": source_file, "digest": digest, "chunks": chunks}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._entries[source_file] = entry
+
+    def reset(self):
+        self._entries.clear()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class UploadRegistry:
+    """
+    Chunk ids of every law stored through `/api/ingest`, on SQLite.
+
+    An upload is the same law as an earlier one when it has the same file
+    name and either the same law metadata (a new version of its text) or
+    the same file digest (corrected metadata). Once the new version is fully
+    stored, `stale` gives the earlier chunk ids it did not write again and
+    `record` replaces the earlier entries. Different laws uploaded under one
+    file name keep their own entries.
+
+    WAL mode lets every uvicorn worker share the file.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS uploaded_laws ("
+            "law_key TEXT PRIMARY KEY, filename TEXT NOT NULL, digest TEXT);"
+            "CREATE INDEX IF NOT EXISTS uploaded_laws_file ON uploaded_laws(filename);"
+            "CREATE TABLE IF NOT EXISTS uploaded_chunks ("
+            "law_key TEXT NOT NULL, chunk_id TEXT NOT NULL, PRIMARY KEY (law_key, chunk_id)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS uploaded_chunks_id ON uploaded_chunks(chunk_id);"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def law_key(law: dict) -> str:
+        return "\0".join(str(law[k]) for k in ("source_file", "law_name", "law_number", "year"))
+
+    def _earlier(self, law: dict) -> List[str]:
+        rows = self._conn.execute(
+            "SELECT law_key FROM uploaded_laws WHERE filename = ? AND (law_key = ? OR digest = ?)",
+            (law["source_file"], self.law_key(law), law.get("digest")),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def stale(self, law: dict, ids: List[str]) -> List[str]:
+        """Chunk ids of the earlier versions of `law` that are not in `ids` and belong to no other law."""
+        with self._lock:
+            earlier = self._earlier(law)
+            if not earlier:
+                return []
+            marks = ",".join("?" * len(earlier))
+            rows = self._conn.execute(
+                f"SELECT DISTINCT c.chunk_id FROM uploaded_chunks c WHERE c.law_key IN ({marks}) "
+                f"AND NOT EXISTS (SELECT 1 FROM uploaded_chunks o "
+                f"WHERE o.chunk_id = c.chunk_id AND o.law_key NOT IN ({marks}))",
+                earlier + earlier,
+            ).fetchall()
+        current = set(ids)
+        return [row[0] for row in rows if row[0] not in current]
+
+    def record(self, law: dict, ids: List[str]):
+        """Make `ids` the chunks of `law`, replacing its earlier versions."""
+        key = self.law_key(law)
+        with self._lock, self._conn as conn:
+            for earlier in self._earlier(law):
+                conn.execute("DELETE FROM uploaded_chunks WHERE law_key = ?", (earlier,))
+                conn.execute("DELETE FROM uploaded_laws WHERE law_key = ?", (earlier,))
+            conn.execute("INSERT INTO uploaded_laws VALUES (?, ?, ?)", (key, law["source_file"], law.get("digest")))
+            conn.executemany("INSERT OR IGNORE INTO uploaded_chunks VALUES (?, ?)", [(key, i) for i in ids])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,157 @@
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, Optional
+
+from loguru import logger
+
+# Bumped when extraction changes, so cached text from an older extractor is not reused
+EXTRACTOR_VERSION = "pypdf-1"
+DIGEST_BLOCK = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(DIGEST_BLOCK):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def page_count(path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def extract_range(path: str, start: int, stop: int) -> List[str]:
+    """Text of pages [start, stop) — runs in a worker process, which parses the file itself."""
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    pages = []
+    for i in range(start, stop):
+        try:
+            pages.append(reader.pages[i].extract_text() or "")
+        except Exception as e:
+            # One malformed page should not sink a 500-page gazette
+            logger.warning(f"⚠️ Page {i + 1} of {os.path.basename(path)} unreadable: {e}")
+            pages.append("")
+    return pages
+
+
+class TextCache:
+    """Extracted page text per file digest, as gzipped JSON under `directory`."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.{EXTRACTOR_VERSION}.json.gz")
+
+    def get(self, digest: str) -> Optional[List[str]]:
+        try:
+            with gzip.open(self._path(digest), "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, digest: str, pages: List[str]):
+        path = self._path(digest)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=3) as f:
+            json.dump(pages, f)
+        os.replace(tmp, path)
+
+
+class PdfExtractor:
+    """
+    Parallel PDF text extraction that streams pages in order.
+
+    Page ranges of `pages_per_task` pages are parsed in a process pool (pypdf
+    is pure Python and holds the GIL), with at most two ranges per worker in
+    flight; `pages()` yields each page as soon as it and every page before it
+    are extracted, so the splitter starts on page 1 while later pages are
+    still being parsed. The pool uses `spawn`, which is safe to start from the
+    API's threads. With `workers=0` pages are extracted serially in the
+    calling thread.
+
+    A `TextCache` keyed by file digest makes re-uploads of the same file (for
+    example with corrected law metadata) skip parsing entirely.
+    """
+
+    def __init__(self, workers: int = 2, pages_per_task: int = 16, cache_dir: Optional[str] = None):
+        self.workers = max(0, workers)
+        self.pages_per_task = max(1, pages_per_task)
+        self.cache = TextCache(cache_dir) if cache_dir else None
+        self.hits = 0
+        self.misses = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def pages(self, path: str, digest: Optional[str] = None) -> Iterator[str]:
+        digest = digest or (file_digest(path) if self.cache else None)
+        if self.cache:
+            cached = self.cache.get(digest)
+            if cached is not None:
+                self.hits += 1
+                yield from cached
+                return
+            self.misses += 1
+
+        extracted = []
+        for text in self._extract(path):
+            extracted.append(text)
+            yield text
+        if self.cache:
+            try:
+                self.cache.put(digest, extracted)
+            except OSError as e:
+                logger.warning(f"⚠️ Could not cache text of {os.path.basename(path)}: {e}")
+
+    def _extract(self, path: str) -> Iterator[str]:
+        total = page_count(path)
+        ranges = [(start, min(start + self.pages_per_task, total)) for start in range(0, total, self.pages_per_task)]
+        if self.workers == 0 or len(ranges) == 1:
+            for start, stop in ranges:
+                yield from extract_range(path, start, stop)
+            return
+
+        window = deque()
+        try:
+            for start, stop in ranges:
+                window.append(self.pool.submit(extract_range, path, start, stop))
+                if len(window) >= 2 * self.workers:
+                    yield from window.popleft().result()
+            while window:
+                yield from window.popleft().result()
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge page); start a fresh pool for the next file
+            self.shutdown()
+            raise
+        finally:
+            # Consumer stopped early (job failed or cancelled): drop queued ranges
+            for future in window:
+                future.cancel()
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "cache_hits": self.hits, "cache_misses": self.misses}
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
@@ -0,0 +1,350 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional
+
+from loguru import logger
+
+from app.core import metrics
+from app.ingest.documents import split_pages, timed_split_law
+from app.ingest.ids import chunk_id
+
+
+class StageStats:
+    """Item count and busy time of one pipeline stage, across its workers."""
+
+    def __init__(self, name: str, unit: str, workers: int):
+        self.name = name
+        self.unit = unit
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self.stalled = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items: int, seconds: float):
+        with self._lock:
+            self.items += items
+            self.busy += seconds
+        metrics.INGEST_ITEMS.inc(items, stage=self.name, unit=self.unit)
+        metrics.INGEST_BUSY_SECONDS.inc(seconds, stage=self.name)
+
+    def stall(self, seconds: float):
+        with self._lock:
+            self.stalled += seconds
+
+    def report(self, wall: float) -> dict:
+        return {
+            "stage": self.name,
+            "items": self.items,
+            "unit": self.unit,
+            "workers": self.workers,
+            "busy_s": round(self.busy, 2),
+            # Throughput of one busy worker, and the stage's share of wall time
+            "per_worker_rate": round(self.items / self.busy, 1) if self.busy else 0.0,
+            "utilization": round(self.busy / (wall * self.workers), 3) if wall else 0.0,
+            "stalled_s": round(self.stalled, 2),
+        }
+
+
+class IngestPipeline:
+    """
+    Staged, bounded ingestion pipeline: split → embed → store.
+
+    - split: laws are split and their per-chunk metadata extracted in a
+      process pool, with at most `queue_size` laws in flight
+      (`split_workers=0` splits on a single thread instead, for callers
+      such as the API that should not fork).
+    - embed: chunks are grouped into `embed_batch_size` requests and run on a
+      thread pool with at most `embed_workers` requests in flight.
+    - store: a single writer thread upserts into the vector store from a
+      bounded queue, so writes overlap with splitting and embedding.
+
+    A law may carry `pages` (an iterator of page texts, e.g. from
+    `PdfExtractor.pages`) instead of `text`: it is then split on the
+    calling thread as its pages arrive, and its chunks are embedded while
+    later pages are still being extracted.
+
+    Bounded queues everywhere keep memory proportional to the batch sizes.
+    `on_law_started` runs before a law's first chunk is written (e.g. to
+    delete stale chunks) and `on_law_stored` once all its chunks are written,
+    with their ids in the law's `ids`.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        store: Callable[[List[str], List[List[float]], List[str], List[dict]], None],
+        *,
+        chunk_size: int,
+        chunk_overlap: int,
+        embed_batch_size: int = 50,
+        embed_workers: int = 2,
+        split_workers: int = 2,
+        store_batch_size: int = 200,
+        queue_size: int = 8,
+        on_law_started: Optional[Callable[[dict], None]] = None,
+        on_law_stored: Optional[Callable[[dict], None]] = None,
+        on_progress: Optional[Callable[[dict], None]] = None,
+    ):
+        self.embeddings = embeddings
+        self.store = store
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.embed_batch_size = embed_batch_size
+        self.embed_workers = max(1, embed_workers)
+        self.split_workers = max(0, split_workers)
+        self.store_batch_size = store_batch_size
+        self.queue_size = max(1, queue_size)
+        self.on_law_started = on_law_started
+        self.on_law_stored = on_law_stored
+        self.on_progress = on_progress
+
+    def run(self, laws: Iterable[dict]) -> dict:
+        self.stats = {
+            "split": StageStats("split", "laws", max(1, self.split_workers)),
+            "embed": StageStats("embed", "chunks", self.embed_workers),
+            "store": StageStats("store", "chunks", 1),
+        }
+        self.totals = {"laws": 0, "laws_stored": 0, "chunks": 0, "chunks_stored": 0, "errors": []}
+        self._store_queue = queue.Queue(maxsize=self.queue_size)
+        self._inflight = threading.BoundedSemaphore(self.embed_workers)
+        start = time.perf_counter()
+
+        writer = threading.Thread(target=self._writer, name="ingest-writer", daemon=True)
+        writer.start()
+        try:
+            split_pool = (ProcessPoolExecutor(max_workers=self.split_workers) if self.split_workers
+                          else ThreadPoolExecutor(max_workers=1))
+            with split_pool, ThreadPoolExecutor(max_workers=self.embed_workers) as embed_pool:
+                batch = []
+                for law, chunks in self._split_stage(split_pool, laws):
+                    self._put(("law", law))
+                    for text, metadata in chunks:
+                        batch.append((text, metadata, law["_seq"]))
+                        if len(batch) >= self.embed_batch_size:
+                            self._submit_embed(embed_pool, batch)
+                            batch = []
+                    if law.get("_streamed"):
+                        # Streamed law: its chunk count is only known now
+                        self._put(("law_end", law["_seq"]))
+                if batch:
+                    self._submit_embed(embed_pool, batch)
+        finally:
+            self._store_queue.put(None)
+            writer.join()
+
+        wall = time.perf_counter() - start
+        return {
+            **{k: v for k, v in self.totals.items() if k != "errors"},
+            "errors": self.totals["errors"],
+            "wall_s": round(wall, 2),
+            "chunks_per_s": round(self.totals["chunks_stored"] / wall, 1) if wall else 0.0,
+            "stages": [s.report(wall) for s in self.stats.values()],
+        }
+
+    # ── Stages ────────────────────────────────────────────────────
+    def _put(self, item):
+        start = time.perf_counter()
+        self._store_queue.put(item)
+        self.stats["store"].stall(time.perf_counter() - start)
+
+    def _split_stage(self, pool: ProcessPoolExecutor, laws: Iterable[dict]):
+        """Submit laws to the process pool, keeping at most `queue_size` in flight, in order."""
+        window = deque()
+
+        def drain():
+            law, future = window.popleft()
+            wait_start = time.perf_counter()
+            try:
+                chunks, seconds = future.result()
+            except Exception as e:
+                self.totals["errors"].append(law["source_file"])
+                logger.error(f"❌ Splitting {law['source_file']} failed: {e}")
+                return None
+            finally:
+                self.stats["split"].stall(time.perf_counter() - wait_start)
+            self.stats["split"].add(1, seconds)
+            law["chunks"] = len(chunks)
+            self.totals["chunks"] += len(chunks)
+            return law, chunks
+
+        for seq, law in enumerate(laws):
+            law["_seq"] = seq
+            self.totals["laws"] += 1
+            if "pages" in law:
+                # Keep laws in order: finish the ones already in the pool first
+                while window:
+                    result = drain()
+                    if result:
+                        yield result
+                law["_streamed"] = True
+                yield law, self._stream_split(law)
+                continue
+            # Only the fields the worker needs cross the process boundary
+            payload = {k: law[k] for k in ("text", "source_file", "law_name", "law_number", "year")}
+            window.append((law, pool.submit(timed_split_law, payload, self.chunk_size, self.chunk_overlap)))
+            law.pop("text", None)
+            if len(window) >= self.queue_size:
+                result = drain()
+                if result:
+                    yield result
+        while window:
+            result = drain()
+            if result:
+                yield result
+
+    def _stream_split(self, law: dict):
+        """Split a law's pages as they arrive; waiting for a page counts as a split stall."""
+        waited = 0.0
+
+        def pages():
+            nonlocal waited
+            source = iter(law.pop("pages"))
+            while True:
+                wait_start = time.perf_counter()
+                page = next(source, None)
+                waited += time.perf_counter() - wait_start
+                if page is None:
+                    return
+                yield page
+
+        start = time.perf_counter()
+        count = 0
+        law["chunks"] = None
+        try:
+            for chunk in split_pages(law, pages(), self.chunk_size, self.chunk_overlap):
+                count += 1
+                self.totals["chunks"] += 1
+                yield chunk
+        except Exception as e:
+            self.totals["errors"].append(law["source_file"])
+            logger.error(f"❌ Splitting {law['source_file']} failed: {e}")
+            law["_failed"] = True
+        finally:
+            law["chunks"] = count
+            self.stats["split"].stall(waited)
+            self.stats["split"].add(1, time.perf_counter() - start - waited)
+
+    def _submit_embed(self, pool: ThreadPoolExecutor, batch: list):
+        wait_start = time.perf_counter()
+        self._inflight.acquire()
+        self.stats["embed"].stall(time.perf_counter() - wait_start)
+        pool.submit(self._embed, batch)
+
+    def _embed(self, batch: list):
+        try:
+            texts = [text for text, _, _ in batch]
+            start = time.perf_counter()
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                logger.error(f"❌ Embedding batch of {len(batch)} chunks failed: {e}")
+                self._put(("error", {seq for _, _, seq in batch}))
+                return
+            self.stats["embed"].add(len(batch), time.perf_counter() - start)
+            self._put(("batch", batch, vectors))
+        finally:
+            self._inflight.release()
+
+    def _writer(self):
+        pending = {}   # seq -> [law, chunks written, started]
+        failed = set()
+        while True:
+            item = self._store_queue.get()
+            if item is None:
+                break
+            kind = item[0]
+            try:
+                if kind == "law":
+                    law = item[1]
+                    pending[law["_seq"]] = [law, 0, False]
+                    self._check_done(law["_seq"], pending, failed)
+                elif kind == "law_end":
+                    self._check_done(item[1], pending, failed)
+                elif kind == "error":
+                    failed.update(item[1])
+                elif kind == "batch":
+                    self._write_batch(item[1], item[2], pending, failed)
+            except Exception as e:
+                # Keep draining: producers block on the bounded queue if the writer stops reading
+                logger.error(f"❌ Ingest writer failed on a {kind} item: {e}")
+                failed.update(self._item_seqs(item))
+
+        for law, _, _ in pending.values():
+            self.totals["errors"].append(law["source_file"])
+
+    @staticmethod
+    def _item_seqs(item) -> set:
+        """Laws a store queue item belongs to."""
+        kind = item[0]
+        if kind == "law":
+            return {item[1]["_seq"]}
+        if kind == "law_end":
+            return {item[1]}
+        if kind == "error":
+            return set(item[1])
+        return {seq for _, _, seq in item[1]}
+
+    def _write_batch(self, batch: list, vectors: list, pending: dict, failed: set):
+        seqs = [seq for _, _, seq in batch]
+        try:
+            for seq in dict.fromkeys(seqs):
+                entry = pending[seq]
+                if not entry[2]:
+                    entry[2] = True
+                    if self.on_law_started:
+                        self.on_law_started(entry[0])
+
+            texts = [text for text, _, _ in batch]
+            metadatas = [metadata for _, metadata, _ in batch]
+            ids = [chunk_id(m["source_file"], m["chunk_index"], t) for m, t in zip(metadatas, texts)]
+            start = time.perf_counter()
+            for lo in range(0, len(texts), self.store_batch_size):
+                hi = lo + self.store_batch_size
+                self.store(ids[lo:hi], vectors[lo:hi], texts[lo:hi], metadatas[lo:hi])
+            self.stats["store"].add(len(texts), time.perf_counter() - start)
+            self.totals["chunks_stored"] += len(texts)
+            for seq, written in zip(seqs, ids):
+                pending[seq][0].setdefault("ids", []).append(written)
+        except Exception as e:
+            logger.error(f"❌ Storing batch of {len(batch)} chunks failed: {e}")
+            failed.update(seqs)
+
+        for seq in seqs:
+            entry = pending.get(seq)
+            if entry is None:
+                continue
+            entry[1] += 1
+            self._check_done(seq, pending, failed)
+
+    def _check_done(self, seq: int, pending: dict, failed: set):
+        """A law is done once its chunk count is known and that many chunks were written."""
+        entry = pending.get(seq)
+        if entry is None or entry[0].get("chunks") is None or entry[1] < entry[0]["chunks"]:
+            return
+        del pending[seq]
+        if entry[0].get("_failed"):
+            return
+        if seq in failed:
+            self.totals["errors"].append(entry[0]["source_file"])
+        else:
+            self._law_done(entry[0])
+
+    def _law_done(self, law: dict):
+        if self.on_law_stored:
+            try:
+                self.on_law_stored(law)
+            except Exception as e:
+                logger.error(f"❌ Checkpointing {law['source_file']} failed: {e}")
+                self.totals["errors"].append(law["source_file"])
+                return
+        self.totals["laws_stored"] += 1
+        if self.on_progress:
+            try:
+                self.on_progress({**self.totals, "law": law})
+            except Exception as e:
+                # The law itself is stored; only its progress report is lost
+                logger.error(f"❌ Reporting progress for {law['source_file']} failed: {e}")
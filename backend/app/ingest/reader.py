@@ -0,0 +1,81 @@
+import json
+from typing import Iterator
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+def iter_jsonl(path: str) -> Iterator[dict]:
+    """Yield one law per line from a JSON Lines corpus."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_json_array(path: str, read_size: int = 1 << 20) -> Iterator[dict]:
+    """
+    Incrementally parse a top-level JSON array, yielding one element at a time.
+
+    Only the current element plus one `read_size` block is held in memory,
+    so peak usage is bounded by the largest single law rather than the
+    whole corpus.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        eof = False
+
+        def fill(size: int = read_size) -> bool:
+            nonlocal buf, pos, eof
+            block = f.read(size)
+            if not block:
+                eof = True
+                return False
+            buf = buf[pos:] + block
+            pos = 0
+            return True
+
+        def skip_ws():
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in _WHITESPACE:
+                    pos += 1
+                if pos < len(buf) or not fill():
+                    return
+
+        skip_ws()
+        if pos >= len(buf) or buf[pos] != "[":
+            raise ValueError(f"{path}: expected a JSON array")
+        pos += 1
+
+        while True:
+            skip_ws()
+            if pos >= len(buf):
+                raise ValueError(f"{path}: unterminated JSON array")
+            if buf[pos] == "]":
+                return
+            while True:
+                try:
+                    item, end = _DECODER.raw_decode(buf, pos)
+                    break
+                except json.JSONDecodeError:
+                    # Element spans past the buffered text — read more, growing
+                    # the read geometrically so a huge law isn't re-parsed
+                    # once per block
+                    if eof or not fill(max(read_size, len(buf) - pos)):
+                        raise
+            pos = end
+            yield item
+
+            skip_ws()
+            if pos < len(buf) and buf[pos] == ",":
+                pos += 1
+
+
+def iter_corpus(path: str) -> Iterator[dict]:
+    """Stream laws from `.jsonl`/`.ndjson` files or a top-level JSON array."""
+    if path.endswith((".jsonl", ".ndjson")):
+        return iter_jsonl(path)
+    return iter_json_array(path)
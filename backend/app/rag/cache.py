@@ -0,0 +1,152 @@
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+
+def normalize_question(question: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    text = re.sub(r"\s+", " ", question.strip().lower())
+    return text.rstrip(" ?.!")
+
+
+class CollectionVersion:
+    """
+    Version stamp of the law collection, in a small file under `data/`.
+
+    Every worker and replica sharing the directory reads the same stamp,
+    and whoever changes the collection (an ingest job, the bulk ingestion
+    script) `bump`s it.
+    """
+
+    def __init__(self, path: str = settings.COLLECTION_VERSION_PATH):
+        self.path = path
+
+    def current(self) -> str:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return ""
+
+    def bump(self) -> str:
+        version = uuid.uuid4().hex
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{version}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp, self.path)
+        return version
+
+
+class AnswerCache:
+    """
+    Two-tier cache in front of `query_laws`.
+
+    The exact tier is keyed on the normalized question text. The semantic
+    tier keeps unit-normalized question embeddings and returns a stored
+    answer when a new question is within `threshold` cosine similarity.
+    Both tiers are LRU-bounded and entries expire after `ttl` seconds.
+    Entries also carry the `CollectionVersion` their answer was retrieved
+    under (see `version`), and are not served once the collection changed.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.ANSWER_CACHE_MAX_ENTRIES,
+        semantic_max_entries: int = settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl: float = settings.ANSWER_CACHE_TTL,
+        threshold: float = settings.SEMANTIC_CACHE_THRESHOLD,
+        collection: Optional[CollectionVersion] = None,
+    ):
+        self.max_entries = max_entries
+        self.semantic_max_entries = semantic_max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.collection = collection
+        self._exact: "OrderedDict[str, tuple]" = OrderedDict()
+        self._semantic: "OrderedDict[str, tuple]" = OrderedDict()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def version(self) -> str:
+        """
+        Current collection version; read it before retrieving and pass it
+        to `put`, so an answer retrieved before an ingest finished is not
+        cached under the newer version.
+        """
+        return self.collection.current() if self.collection else ""
+
+    def _stale(self, entry: tuple, version: str) -> bool:
+        return entry[0] < time.monotonic() or entry[1] != version
+
+    def get_exact(self, key: str) -> Optional[dict]:
+        entry = self._exact.get(key)
+        if entry is None or self._stale(entry, self.version()):
+            self._exact.pop(key, None)
+            return None
+        self._exact.move_to_end(key)
+        self.exact_hits += 1
+        return {**entry[2], "cached": True}
+
+    def get_semantic(self, embedding: List[float]) -> Optional[dict]:
+        version = self.version()
+        for key in [k for k, v in self._semantic.items() if self._stale(v, version)]:
+            del self._semantic[key]
+        if not self._semantic:
+            self.misses += 1
+            return None
+
+        keys = list(self._semantic)
+        matrix = np.stack([self._semantic[k][2] for k in keys])
+        scores = matrix @ self._unit(embedding)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        key = keys[best]
+        self._semantic.move_to_end(key)
+        self.semantic_hits += 1
+        return {**self._semantic[key][3], "cached": True}
+
+    def put(self, key: str, embedding: List[float], result: dict, version: str = ""):
+        expires_at = time.monotonic() + self.ttl
+        self._exact[key] = (expires_at, version, result)
+        self._exact.move_to_end(key)
+        while len(self._exact) > self.max_entries:
+            self._exact.popitem(last=False)
+
+        if embedding is not None:
+            self._semantic[key] = (expires_at, version, self._unit(embedding), result)
+            self._semantic.move_to_end(key)
+            while len(self._semantic) > self.semantic_max_entries:
+                self._semantic.popitem(last=False)
+
+    def clear(self):
+        self._exact.clear()
+        self._semantic.clear()
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+            "exact_entries": len(self._exact),
+            "semantic_entries": len(self._semantic),
+        }
@@ -1,56 +1,22 @@
-from langchain_ollama import OllamaLLM
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+import asyncio
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+
 from loguru import logger
 
+from app.core import metrics
+from app.core.admission import AdmissionRejected
 from app.core.config import settings
-from app.rag.prompts import legal_query_prompt
-from app.rag.retriever import get_retriever
-
-
-def format_docs(docs):
-    formatted = []
-    for i, doc in enumerate(docs):
-        meta = doc.metadata
-        law_header = f"[LAW {i+1}] {meta.get('law_name', 'Unknown')} | {meta.get('law_number', 'N/A')} | Section {meta.get('section', 'N/A')}"
-        formatted.append(f"{law_header}\n{doc.page_content}")
-    return "\n\n{'='*60}\n\n".join(formatted)
-
-
-def build_rag_chain():
-    llm = OllamaLLM(
-        base_url=settings.OLLAMA_BASE_URL,
-        model=settings.OLLAMA_MODEL,
-        temperature=0.1,
-        num_predict=2048,
-        timeout=300,
-        num_ctx=2048,
-    )
-
-    retriever = get_retriever()
-
-    chain = (
-        {
-            "context": retriever | format_docs,
-            "question": RunnablePassthrough(),
-        }
-        | legal_query_prompt
-        | llm
-        | StrOutputParser()
-    )
-
-    logger.info("✅ RAG chain built successfully")
-    return chain
+from app.core.degradation import LoadStage
+from app.rag.cache import normalize_question
+from app.rag.citations import parse_citation
 
+# Times a batch item waits out a full generation queue before it is reported as failed
+BATCH_ADMISSION_ATTEMPTS = 3
 
-async def query_laws(question: str) -> dict:
-    """Query the RAG chain and return response with source documents."""
-    retriever = get_retriever()
-    docs = retriever.invoke(question)
-
-    chain = build_rag_chain()
-    response = chain.invoke(question)
 
+def format_sources(docs) -> list:
     sources = []
     for doc in docs:
         sources.append({
@@ -60,9 +26,316 @@ async def query_laws(question: str) -> dict:
             "year": doc.metadata.get("year", "N/A"),
             "excerpt": doc.page_content[:300] + "...",
         })
+    return sources
+
+
+def build_rag_chain(llm):
+    """
+    Build the generation half of the RAG pipeline.
+
+    The chain expects {"context": str, "question": str}; retrieval happens
+    once in `query_laws` so the same documents feed the prompt and the sources.
+    """
+    # langchain_core's runnables are slow to import; loaded when the chain is first built
+    from langchain_core.output_parsers import StrOutputParser
+    from app.rag.prompts import legal_query_prompt
+    chain = legal_query_prompt | llm | StrOutputParser()
+
+    logger.info("✅ RAG chain built successfully")
+    return chain
 
+
+async def generate(pipeline, context: str, question: str,
+                   num_predict: int = settings.LLM_NUM_PREDICT) -> AsyncIterator[str]:
+    """
+    Stream answer tokens from the chain, timing first token and total generation.
+    Closing this generator closes the chain's stream (and the Ollama request) at once.
+    """
+    start = time.perf_counter()
+    first = True
+    async with aclosing(pipeline.chain_for(num_predict).astream({"context": context, "question": question})) as tokens:
+        async for token in tokens:
+            if first:
+                metrics.record_ttft(time.perf_counter() - start)
+                first = False
+            yield token
+    metrics.record("llm_total", time.perf_counter() - start)
+
+
+async def lookup_citation(question: str, pipeline) -> Optional[dict]:
+    """
+    Answer a pure citation lookup ("Section 302 PPC") straight from the
+    citation index: no embedding, no vector search, no generation.
+    Returns None when the question is not a bare citation or nothing matches.
+    """
+    citation = parse_citation(question)
+    if citation is None or pipeline.keyword_index is None:
+        return None
+    docs = await asyncio.to_thread(
+        pipeline.keyword_index.lookup_citation, citation.law, citation.section, 3
+    )
+    if not docs:
+        return None
+
+    label = "Article" if citation.kind == "article" else "Section"
+    law_name = docs[0].metadata.get("law_name", citation.law.title())
+    body = "\n\n---\n\n".join(doc.page_content for doc in docs)
+    sources = format_sources(docs)
     return {
+        "answer": (
+            f"## {law_name} — {label} {citation.section}\n\n{body}\n\n"
+            f"*Statute text as stored in the PakLex database. Describe your case for a legal analysis.*"
+        ),
+        "sources": sources,
+        "total_sources": len(sources),
+    }
+
+
+def flight_key(question: str, stage: LoadStage) -> str:
+    """
+    Request-coalescing key: the normalized question plus everything that
+    shapes its answer, so requests answered at different load stages (or
+    after a model/settings change) never share one flight.
+    """
+    return "|".join(str(part) for part in (
+        normalize_question(question), settings.OLLAMA_MODEL, settings.LLM_NUM_CTX,
+        stage.name, stage.num_predict, stage.top_k, stage.context_tokens,
+    ))
+
+
+async def retrieve_and_pack(pipeline, embedding: List[float], question: str, stage: LoadStage):
+    """Retrieve `stage.top_k` chunks and pack them into the stage's context budget."""
+    with metrics.stage("retrieve"):
+        docs = await pipeline.retriever.asearch(embedding, question, k=stage.top_k)
+    with metrics.stage("pack"):
+        return pipeline.packer.pack(docs, question, max_tokens=stage.context_tokens, num_predict=stage.num_predict)
+
+
+async def answer_from_sources(pipeline, embedding: List[float], question: str, stage: LoadStage) -> dict:
+    """
+    The last load stage: the most relevant provisions, with no generation
+    and so no admission slot.
+    """
+    with metrics.stage("retrieve"):
+        docs = await pipeline.retriever.asearch(embedding, question, k=stage.top_k)
+    sources = format_sources(docs)
+    listing = "\n".join(
+        f"{i}. **{source['law_name']}** — Section {source['section']}: {' '.join(source['excerpt'].split())}"
+        for i, source in enumerate(sources, 1)
+    )
+    return {
+        "answer": (
+            f"## Relevant Laws Found\n\n{listing}\n\n"
+            f"*PakLex is under heavy load, so no legal analysis was generated for this question. "
+            f"Ask again in a few minutes for a full answer.*"
+        ),
+        "sources": sources,
+        "total_sources": len(sources),
+        "load_stage": stage.name,
+    }
+
+
+async def query_laws(question: str, pipeline, stage: Optional[LoadStage] = None) -> dict:
+    """
+    Query the RAG chain and return response with source documents.
+
+    Fully async: embedding and generation stream over the pooled Ollama
+    client; only the generation waits for an admission slot, retrieval and
+    packing run before it.
+    Bare citation lookups are answered from the citation index, and other
+    answers are served from `pipeline.cache` when an equal or semantically
+    close question was answered recently. Under load, `pipeline.degradation`
+    shrinks the answer, top-k and context budget, or skips generation
+    (`stage` pins the load stage, e.g. the one in the caller's flight key);
+    only full answers are cached.
+    """
+    if (direct := await lookup_citation(question, pipeline)) is not None:
+        return direct
+
+    cache = pipeline.cache
+    key = normalize_question(question)
+    version = cache.version() if cache else ""
+    if cache and (cached := cache.get_exact(key)):
+        return cached
+
+    with metrics.stage("embed"):
+        embedding = await pipeline.embeddings.aembed_query(question)
+    if cache and (cached := cache.get_semantic(embedding)):
+        return cached
+
+    stage = stage or pipeline.degradation.select()
+    pipeline.degradation.count(stage)
+    if not stage.generates:
+        return await answer_from_sources(pipeline, embedding, question, stage)
+
+    # Fail fast on a full queue before retrieving; the slot itself is held only while Ollama generates
+    pipeline.admission.check()
+    packed = await retrieve_and_pack(pipeline, embedding, question, stage)
+    async with pipeline.admission.slot():
+        response = "".join([token async for token in generate(pipeline, packed.text, question, stage.num_predict)])
+
+    sources = format_sources(packed.docs)
+    result = {
         "answer": response,
         "sources": sources,
         "total_sources": len(sources),
+        "tokens": packed.usage(),
+        "load_stage": stage.name,
     }
+    if cache and stage.level == 0:
+        cache.put(key, embedding, result, version)
+    return result
+
+
+async def stream_laws(question: str, pipeline, stage: Optional[LoadStage] = None) -> AsyncIterator[dict]:
+    """
+    Streaming variant of `query_laws`.
+
+    Yields a `sources` event as soon as retrieval finishes (before queueing
+    for a generation slot), then one `token` event per generated chunk. If
+    the consumer stops iterating (client disconnect), the generator is
+    closed/cancelled inside `astream`, which closes the Ollama HTTP stream
+    and aborts the generation upstream.
+    A cache hit, citation lookup or sources-only answer (last load stage)
+    is replayed as a single token event.
+    """
+    cache = pipeline.cache
+    key = normalize_question(question)
+    version = cache.version() if cache else ""
+    ready = await lookup_citation(question, pipeline)
+    if ready is None and cache:
+        ready = cache.get_exact(key)
+    embedding = None
+    if ready is None:
+        with metrics.stage("embed"):
+            embedding = await pipeline.embeddings.aembed_query(question)
+        ready = cache.get_semantic(embedding) if cache else None
+    if ready is None:
+        stage = stage or pipeline.degradation.select()
+        pipeline.degradation.count(stage)
+        if not stage.generates:
+            ready = await answer_from_sources(pipeline, embedding, question, stage)
+
+    if ready is not None:
+        yield {"event": "sources", "data": {"sources": ready["sources"], "total_sources": ready["total_sources"]}}
+        yield {"event": "token", "data": ready["answer"]}
+        yield {"event": "done", "data": {"cached": ready.get("cached", False), "tokens": ready.get("tokens"),
+                                         "load_stage": ready.get("load_stage", "normal")}}
+        return
+
+    # Sources go out as soon as retrieval is done, before any wait for a generation slot
+    packed = await retrieve_and_pack(pipeline, embedding, question, stage)
+    sources = format_sources(packed.docs)
+    yield {"event": "sources", "data": {"sources": sources, "total_sources": len(sources)}}
+
+    generated = generate(pipeline, packed.text, question, stage.num_predict)
+    async with pipeline.admission.slot(), aclosing(generated) as stream:
+        tokens = []
+        async for token in stream:
+            tokens.append(token)
+            yield {"event": "token", "data": token}
+
+    if cache and stage.level == 0:
+        cache.put(key, embedding, {
+            "answer": "".join(tokens),
+            "sources": sources,
+            "total_sources": len(sources),
+            "tokens": packed.usage(),
+            "load_stage": stage.name,
+        }, version)
+    yield {"event": "done", "data": {"cached": False, "tokens": packed.usage(), "load_stage": stage.name}}
+
+
+async def _generate_admitted(pipeline, context: str, question: str, num_predict: int) -> str:
+    for attempt in range(BATCH_ADMISSION_ATTEMPTS):
+        try:
+            async with pipeline.admission.slot():
+                return "".join([token async for token in generate(pipeline, context, question, num_predict)])
+        except AdmissionRejected as e:
+            if attempt == BATCH_ADMISSION_ATTEMPTS - 1:
+                raise
+            await asyncio.sleep(e.retry_after)
+
+
+async def answer_batch(questions: List[str], pipeline, concurrency: int = settings.BATCH_CONCURRENCY
+                       ) -> AsyncIterator[Tuple[List[int], Union[dict, Exception]]]:
+    """
+    Answer many questions, yielding `(indexes, result)` as each one finishes.
+
+    Questions equal after normalization are answered once and share
+    `indexes`. Citation lookups and exact cache hits come first; the rest
+    are embedded in one `aembed_documents` call, semantic cache hits are
+    returned, and the remaining questions are retrieved concurrently (at
+    most `BATCH_SEARCH_CONCURRENCY` searches at once) and generated with at
+    most `concurrency` generations in flight, each holding an admission
+    slot. Each question takes the load stage current when it starts, like
+    a single query. A failed question yields its exception instead of a
+    result.
+    """
+    cache = pipeline.cache
+    version = cache.version() if cache else ""
+    groups: Dict[str, List[int]] = {}
+    for i, question in enumerate(questions):
+        groups.setdefault(normalize_question(question), []).append(i)
+
+    pending = []
+    for key, indexes in groups.items():
+        question = questions[indexes[0]]
+        try:
+            ready = await lookup_citation(question, pipeline)
+        except Exception as e:
+            ready = e
+        if ready is None and cache:
+            ready = cache.get_exact(key)
+        if ready is None:
+            pending.append((key, question))
+        else:
+            yield indexes, ready
+    if not pending:
+        return
+
+    try:
+        with metrics.stage("embed"):
+            embeddings = await pipeline.embeddings.aembed_documents([question for _, question in pending])
+    except Exception as e:
+        for key, _ in pending:
+            yield groups[key], e
+        return
+
+    searches = asyncio.Semaphore(settings.BATCH_SEARCH_CONCURRENCY)
+    generations = asyncio.Semaphore(concurrency)
+
+    async def answer(key: str, question: str, embedding: List[float]):
+        try:
+            if cache and (cached := cache.get_semantic(embedding)):
+                return key, cached
+            with metrics.track("query_batch") as timer:
+                stage = pipeline.degradation.select()
+                pipeline.degradation.count(stage)
+                if not stage.generates:
+                    async with searches:
+                        result = await answer_from_sources(pipeline, embedding, question, stage)
+                    return key, {**result, "timings": timer.breakdown()}
+                async with searches:
+                    packed = await retrieve_and_pack(pipeline, embedding, question, stage)
+                async with generations:
+                    response = await _generate_admitted(pipeline, packed.text, question, stage.num_predict)
+            sources = format_sources(packed.docs)
+            result = {"answer": response, "sources": sources, "total_sources": len(sources),
+                      "tokens": packed.usage(), "load_stage": stage.name}
+            if cache and stage.level == 0:
+                cache.put(key, embedding, result, version)
+            return key, {**result, "timings": timer.breakdown()}
+        except Exception as e:
+            return key, e
+
+    tasks = [asyncio.create_task(answer(key, question, embedding))
+             for (key, question), embedding in zip(pending, embeddings)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            key, result = await finished
+            yield groups[key], result
+    finally:
+        # Client went away: stop the generations still queued or running
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,106 @@
+import re
+from typing import List, NamedTuple, Optional
+
+# Common short forms of the statutes users cite most
+LAW_ALIASES = {
+    "ppc": "pakistan penal code",
+    "crpc": "code of criminal procedure",
+    "cr pc": "code of criminal procedure",
+    "cpc": "code of civil procedure",
+    "qso": "qanun e shahadat",
+    "constitution": "constitution",
+}
+
+_SECTION = re.compile(r"\b(section|sec|article|art)\.?\s*(\d+[a-z]?)\b")
+_SHORT_FORM = re.compile(r"\b(ppc|crpc|cpc|qso)\s*(\d+[a-z]?)\b|\b(\d+[a-z]?)\s*(ppc|crpc|cpc|qso)\b")
+# "Section 69. Extortion" / "Article 25A. Right to education", or a bare number only when the line is
+# shaped like a statute heading ("302. Punishment of qatl-i-amd.—"), so numbered clauses are not headings
+_HEADING = re.compile(
+    r"^\s*(?:(?:section|article)\s+(\d+[A-Z]?)\.\s+\S|(\d+[A-Z]?)\.\s+[^\n]{1,150}?[.:]\s*[—–-])",
+    re.IGNORECASE | re.MULTILINE,
+)
+_FILLER = {
+    "what", "whats", "is", "are", "does", "do", "say", "says", "said", "show", "me", "give", "the",
+    "text", "of", "full", "read", "reads", "under", "in", "tell", "about", "please", "provision",
+    "provisions", "contents", "content", "wording", "state", "states", "a", "an", "law", "s",
+}
+
+
+class Citation(NamedTuple):
+    law: str       # normalized law key, e.g. "pakistan penal code"
+    section: str   # e.g. "302", "25A"
+    kind: str      # "section" or "article"
+
+
+def normalize_law(name: str) -> str:
+    """Lower-case a law title and strip years, act numbers and punctuation; expand aliases."""
+    text = name.lower()
+    text = re.sub(r"\(.*?\)", " ", text)
+    text = re.sub(r"\b(act|ordinance|order)\s+[ivxlcdm]+\s+of\b", " ", text)
+    text = re.sub(r"\b(18|19|20)\d{2}\b|\b(pdf|txt)\b", " ", text)
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    text = re.sub(r"^(the|source)\s+", "", text.strip())
+    text = re.sub(r"\s+", " ", text).strip()
+    return LAW_ALIASES.get(text, text)
+
+
+def chunk_sections(text: str, metadata: dict) -> List[tuple]:
+    """`(section, kind)` pairs a chunk should be found under: its headings, then its metadata section."""
+    sections = [((m.group(1) or m.group(2)).upper(), "heading") for m in _HEADING.finditer(text)]
+    section = str(metadata.get("section", ""))
+    if section and section not in ("General", "N/A") and (section.upper(), "heading") not in sections:
+        sections.append((section.upper(), "metadata"))
+    return list(dict.fromkeys(sections))
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text)
+
+
+def parse_citation(question: str) -> Optional[Citation]:
+    """
+    Recognise a question that is only a statute lookup, e.g. "Section 302 PPC",
+    "what does article 199 of the Constitution say?" or "PPC 379".
+
+    Returns None when the question carries anything beyond the citation
+    (facts, a scenario, a request for analysis) so it goes through full RAG.
+    """
+    text = question.lower().strip()
+
+    short = _SHORT_FORM.search(text)
+    if short and not _SECTION.search(text):
+        alias = short.group(1) or short.group(4)
+        number = short.group(2) or short.group(3)
+        rest = _words(text[:short.start()] + " " + text[short.end():])
+        if all(w in _FILLER for w in rest):
+            return Citation(LAW_ALIASES[alias], number.upper(), "section")
+        return None
+
+    m = _SECTION.search(text)
+    if not m:
+        return None
+    kind = "article" if m.group(1).startswith("art") else "section"
+    number = m.group(2).upper()
+    before, after = _words(text[:m.start()]), _words(text[m.end():])
+
+    # The law name is whatever follows the number ("... of the PPC"), or
+    # precedes the marker ("PPC section 302"); everything else must be filler.
+    while after and after[0] in ("of", "the", "in", "under"):
+        after.pop(0)
+    while after and after[-1] in _FILLER:
+        after.pop()
+    if after:
+        law_words, rest = after, before
+    else:
+        while before and before[0] in _FILLER:
+            before.pop(0)
+        law_words, rest = before, []
+
+    if any(w not in _FILLER for w in rest):
+        return None
+    if not law_words:
+        if kind != "article":
+            return None
+        law_words = ["constitution"]
+    law = normalize_law(" ".join(law_words))
+    return Citation(law, number, kind) if law else None
@@ -0,0 +1,224 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from langchain_core.documents import Document
+from loguru import logger
+
+from app.core.config import settings
+
+SEPARATOR = "\n\n" + "=" * 60 + "\n\n"
+# Ollama's chat template adds a few tokens around every message
+MESSAGE_OVERHEAD = 4
+
+
+class TokenCounter:
+    """
+    tiktoken-backed token counting.
+
+    The encoding is loaded on first use. tiktoken downloads encodings on
+    first load, so an offline host falls back to a ~4 chars/token estimate
+    instead of failing the request. Either way the count only approximates
+    the local model's tokenizer, which is why the packer also keeps a reserve.
+    """
+
+    def __init__(self, encoding: str = settings.CONTEXT_TOKENIZER):
+        self.encoding_name = encoding
+        self._encoding = None
+        self._loaded = False
+
+    @property
+    def encoding(self):
+        if not self._loaded:
+            self._loaded = True
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                logger.warning(f"⚠️ tiktoken encoding '{self.encoding_name}' unavailable, estimating tokens: {e}")
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut `text` to at most `max_tokens`, backing off to a sentence or line end."""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is None:
+            head = text[:max_tokens * 4]
+        else:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            head = self.encoding.decode(tokens[:max_tokens])
+        if len(head) >= len(text):
+            return text
+        cut = max(head.rfind(". "), head.rfind(".\n"), head.rfind("\n"))
+        if cut >= len(head) * 0.6:
+            head = head[:cut + 1]
+        return head.rstrip() + " …"
+
+
+@dataclass
+class PackedContext:
+    text: str
+    docs: List[Document]
+    context_tokens: int
+    prompt_tokens: int
+    budget: int
+    truncated: int = 0
+    dropped: int = 0
+
+    def usage(self) -> dict:
+        return {
+            "prompt": self.prompt_tokens,
+            "context": self.context_tokens,
+            "budget": self.budget,
+            "chunks": len(self.docs),
+            "truncated": self.truncated,
+            "dropped": self.dropped,
+        }
+
+
+def compress(text: str) -> str:
+    """Collapse the runs of spaces and blank lines left behind by PDF extraction."""
+    text = re.sub(r"[ \t\u00a0]+", " ", text)
+    text = re.sub(r" ?\n ?", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def strip_overlap(kept: str, text: str, min_overlap: int = 20) -> str:
+    """Drop the prefix of `text` that repeats the tail of `kept` (splitter chunk overlap)."""
+    limit = min(len(kept), len(text), settings.CHUNK_OVERLAP * 2)
+    for n in range(limit, min_overlap - 1, -1):
+        if kept.endswith(text[:n]):
+            return text[n:].lstrip()
+    return text
+
+
+def _law_key(meta: dict) -> str:
+    return meta.get("source_file") or meta.get("law_name", "")
+
+
+def law_header(i: int, meta: dict) -> str:
+    return (f"[LAW {i}] {meta.get('law_name', 'Unknown')} | {meta.get('law_number', 'N/A')} "
+            f"| Section {meta.get('section', 'N/A')}")
+
+
+def format_docs(docs: List[Document]) -> str:
+    return SEPARATOR.join(f"{law_header(i, doc.metadata)}\n{doc.page_content}" for i, doc in enumerate(docs, 1))
+
+
+def water_level(sizes: List[int], budget: int) -> int:
+    """Largest per-chunk cap c with sum(min(size, c)) <= budget: short chunks stay whole."""
+    remaining, n = budget, len(sizes)
+    for i, size in enumerate(sorted(sizes)):
+        share = remaining // (n - i)
+        if size > share:
+            return share
+        remaining -= size
+    return max(sizes, default=0)
+
+
+class ContextPacker:
+    """
+    Fits retrieved chunks into the prompt's share of `num_ctx`.
+
+    Chunks are whitespace-compressed and de-duplicated: a chunk contained in
+    an earlier one from the same law is dropped, and the splitter overlap
+    shared with an earlier neighbour is cut. What remains is capped at an
+    even per-chunk share of the budget, so long chunks are trimmed before
+    short ones and lowest-ranked chunks are dropped only if the share would
+    fall below `min_chunk_tokens`.
+
+    The budget is `max_tokens`, further limited to whatever `num_ctx` leaves
+    after the system prompt, the question and the answer's reserve (see
+    `answer_reserve`).
+    """
+
+    def __init__(self, num_ctx: int, max_tokens: int = settings.CONTEXT_TOKEN_BUDGET,
+                 reserve: int = settings.CONTEXT_RESERVE_TOKENS,
+                 max_reserve_share: float = settings.CONTEXT_MAX_RESERVE_SHARE,
+                 num_predict: int = settings.LLM_NUM_PREDICT,
+                 min_chunk_tokens: int = settings.CONTEXT_MIN_CHUNK_TOKENS,
+                 counter: Optional[TokenCounter] = None):
+        self.num_ctx = num_ctx
+        self.max_tokens = max_tokens
+        self.reserve = reserve
+        self.max_reserve_share = max_reserve_share
+        self.num_predict = num_predict
+        self.min_chunk_tokens = min_chunk_tokens
+        self.counter = counter or TokenCounter()
+
+    def answer_reserve(self, num_predict: Optional[int] = None) -> int:
+        """
+        Tokens of `num_ctx` kept free for an answer of up to `num_predict`
+        tokens: at least `reserve` (token counts are estimates), at most
+        `max_reserve_share` of the window so the laws still get room.
+        """
+        wanted = min(num_predict or self.num_predict, int(self.num_ctx * self.max_reserve_share))
+        return max(self.reserve, wanted)
+
+    def prompt_overhead(self, question: str) -> int:
+        from app.rag.prompts import legal_query_prompt  # deferred with the rest of the generation stack
+        messages = legal_query_prompt.format_messages(context="", question=question)
+        return sum(self.counter.count(m.content) + MESSAGE_OVERHEAD for m in messages)
+
+    def dedupe(self, docs: List[Document]) -> List[Document]:
+        kept: List[Document] = []
+        for doc in docs:
+            text = compress(doc.page_content)
+            law = _law_key(doc.metadata)
+            for other in kept:
+                if _law_key(other.metadata) != law:
+                    continue
+                if text in other.page_content:
+                    text = ""
+                    break
+                text = strip_overlap(other.page_content, text)
+            if text:
+                kept.append(Document(page_content=text, metadata=doc.metadata))
+        return kept
+
+    def pack(self, docs: List[Document], question: str, max_tokens: Optional[int] = None,
+             num_predict: Optional[int] = None) -> PackedContext:
+        overhead = self.prompt_overhead(question)
+        budget = min(max_tokens or self.max_tokens, self.num_ctx - overhead - self.answer_reserve(num_predict))
+        budget = max(budget, 0)
+
+        chunks = self.dedupe(docs)
+        # Header + separator cost per chunk, charged before body tokens are shared out
+        framing = [self.counter.count(law_header(i, c.metadata) + "\n" + SEPARATOR) for i, c in enumerate(chunks, 1)]
+        sizes = [self.counter.count(c.page_content) for c in chunks]
+        cap = water_level(sizes, budget - sum(framing))
+        while len(chunks) > 1 and cap < self.min_chunk_tokens and cap < max(sizes):
+            chunks.pop()
+            framing.pop()
+            sizes.pop()
+            cap = water_level(sizes, budget - sum(framing))
+        # Never send an empty context when even one chunk does not fit
+        cap = max(cap, self.min_chunk_tokens)
+
+        truncated = 0
+        packed = []
+        for chunk, size in zip(chunks, sizes):
+            if size > cap:
+                truncated += 1
+                chunk = Document(page_content=self.counter.truncate(chunk.page_content, cap), metadata=chunk.metadata)
+            packed.append(chunk)
+
+        text = format_docs(packed)
+        context_tokens = self.counter.count(text)
+        logger.debug(f"🧮 Packed {len(packed)}/{len(docs)} chunks: {context_tokens}/{budget} context tokens")
+        return PackedContext(
+            text=text,
+            docs=packed,
+            context_tokens=context_tokens,
+            prompt_tokens=overhead + context_tokens,
+            budget=budget,
+            truncated=truncated,
+            dropped=len(docs) - len(packed),
+        )
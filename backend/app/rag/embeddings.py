@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+from app.services.ollama_service import OllamaService
+
+
+class PooledOllamaEmbeddings(Embeddings):
+    """LangChain embeddings backed by a shared, pooled `OllamaService`."""
+
+    def __init__(self, service: OllamaService, model: str):
+        self.service = service
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self.service.embed(self.model, texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return await self.service.aembed(self.model, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class EmbeddingStore:
+    """
+    Persistent float32 vector store on SQLite, keyed by content hash.
+
+    WAL mode lets several uvicorn workers and the ingestion script share
+    one file. With `max_rows`, the oldest-written vectors are pruned on
+    open and whenever an insert takes the table past the cap (down to
+    `PRUNE_TO` of it, so pruning does not run on every insert once full).
+    """
+
+    PRUNE_TO = 0.9
+
+    def __init__(self, path: str, max_rows: int = 0):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if "stored_at" not in columns:
+            # Files from before the cap: their rows count as the oldest
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN stored_at REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_stored_at ON embeddings(stored_at)")
+        self._conn.commit()
+        with self._lock:
+            # Last counted size plus this process's inserts since; recounted before pruning
+            self._rows = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._prune()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        now = time.time()
+        rows = [(k, np.asarray(v, dtype=np.float32).tobytes(), now) for k, v in items.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings(key, vector, stored_at) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+            self._rows += len(rows)
+            self._prune()
+
+    def _prune(self):
+        """Drop the oldest rows once past `max_rows`; the caller holds the lock."""
+        if not self.max_rows or self._rows <= self.max_rows:
+            return
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if self._rows <= self.max_rows:
+            return
+        excess = self._rows - int(self.max_rows * self.PRUNE_TO)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY stored_at LIMIT ?)",
+            (excess,),
+        )
+        self._conn.commit()
+        self._rows -= excess
+        logger.info(f"🧹 Pruned {excess} cached embeddings (cap {self.max_rows})")
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Caching wrapper around any LangChain embeddings model.
+
+    Vectors are keyed by (model name, SHA-256 of the text) and looked up in
+    an in-process LRU first, then the optional persistent `EmbeddingStore`.
+    Only texts missing from both are sent to Ollama, in a single batch.
+    Cached vectors are float32 arrays (3 KB for 768 dimensions, against
+    ~25 KB as a list of Python floats) and become lists only on the way
+    out. The async methods run the SQLite store's reads and writes in a
+    thread, off the event loop.
+    """
+
+    def __init__(self, underlying: Embeddings, model: str, max_entries: int = 10000,
+                 store: Optional[EmbeddingStore] = None):
+        self.underlying = underlying
+        self.model = model
+        self.max_entries = max_entries
+        self.store = store
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model}:{digest}"
+
+    def _remember(self, items: Dict[str, np.ndarray]):
+        with self._lock:
+            for key, vector in items.items():
+                self._lru[key] = vector
+                self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _cached(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+        return found
+
+    def _load(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        from_store = self.store.get_many(keys)
+        self._remember(from_store)
+        return from_store
+
+    @staticmethod
+    def _missing(keys: List[str], found: Dict[str, np.ndarray]) -> List[str]:
+        return [k for k in dict.fromkeys(keys) if k not in found]
+
+    def _todo(self, keys: List[str], texts: List[str], found: Dict[str, np.ndarray]) -> Dict[str, str]:
+        todo = {k: t for k, t in zip(keys, texts) if k not in found}
+        self.hits += len(texts) - len(todo)
+        self.misses += len(todo)
+        return todo
+
+    def _fresh(self, found: Dict[str, np.ndarray], todo: Dict[str, str],
+               vectors: List[List[float]]) -> Dict[str, np.ndarray]:
+        fresh = {k: np.asarray(v, dtype=np.float32) for k, v in zip(todo.keys(), vectors)}
+        self._remember(fresh)
+        found.update(fresh)
+        return fresh
+
+    @staticmethod
+    def _vectors(keys: List[str], found: Dict[str, np.ndarray]) -> List[List[float]]:
+        return [found[k].tolist() for k in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(t) for t in texts]
+        found = self._cached(keys)
+        missing = self._missing(keys, found)
+        if missing and self.store is not None:
+            found.update(self._load(missing))
+        todo = self._todo(keys, texts, found)
+        if todo:
+            fresh = self._fresh(found, todo, self.underlying.embed_documents(list(todo.values())))
+            if self.store is not None:
+                self.store.put_many(fresh)
+        return self._vectors(keys, found)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(t) for t in texts]
+        found = self._cached(keys)
+        missing = self._missing(keys, found)
+        if missing and self.store is not None:
+            found.update(await asyncio.to_thread(self._load, missing))
+        todo = self._todo(keys, texts, found)
+        if todo:
+            fresh = self._fresh(found, todo, await self.underlying.aembed_documents(list(todo.values())))
+            if self.store is not None:
+                await asyncio.to_thread(self.store.put_many, fresh)
+        return self._vectors(keys, found)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._lru),
+            "persistent": self.store is not None,
+        }
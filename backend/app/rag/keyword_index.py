@@ -0,0 +1,183 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.rag.citations import chunk_sections, normalize_law
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "has", "have",
+    "he", "her", "his", "i", "in", "is", "it", "my", "of", "on", "or", "she", "that", "the",
+    "their", "they", "this", "to", "under", "was", "what", "which", "who", "will", "with",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    rowid INTEGER PRIMARY KEY,
+    chunk_id TEXT UNIQUE NOT NULL,
+    source_file TEXT,
+    document TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_source ON chunks(source_file);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    document, content='chunks', content_rowid='rowid', tokenize='porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS citations (
+    section TEXT NOT NULL,
+    law_key TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    PRIMARY KEY (section, law_key, chunk_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS citations_chunk ON citations(chunk_id);
+CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts(rowid, document) VALUES (new.rowid, new.document);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+    INSERT INTO chunks_fts(chunks_fts, rowid, document) VALUES ('delete', old.rowid, old.document);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_au AFTER UPDATE ON chunks BEGIN
+    INSERT INTO chunks_fts(chunks_fts, rowid, document) VALUES ('delete', old.rowid, old.document);
+    INSERT INTO chunks_fts(rowid, document) VALUES (new.rowid, new.document);
+END;
+"""
+
+
+def match_query(question: str) -> Optional[str]:
+    """Turn free text into an FTS5 OR-query of quoted terms (BM25 weighs them by IDF)."""
+    terms = [t for t in _TOKEN.findall(question.lower()) if t not in _STOPWORDS]
+    if not terms:
+        return None
+    return " OR ".join(f'"{t}"' for t in dict.fromkeys(terms))
+
+
+def _like_escape(text: str) -> str:
+    """Match `text` literally inside a LIKE pattern declared with `ESCAPE '\\'`."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class KeywordIndex:
+    """
+    Persistent BM25 inverted index over ingested chunks (SQLite FTS5).
+
+    Complements vector search for exact citations such as "Section 302 PPC"
+    or "Article 199". The file is opened lazily on first use, updated
+    incrementally on every upsert, and shared by all workers, replicas on
+    the same node and data volume, and the ingestion script (WAL mode, one
+    connection per thread). Their writes are visible to the next query
+    without reopening; never swap the file while it is open.
+
+    Every upsert also maintains a `(section, law) → chunk` citation table,
+    so a pure citation lookup is answered by `lookup_citation` without
+    embeddings or the LLM.
+    """
+
+    def __init__(self, path: str = settings.KEYWORD_INDEX_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # Every thread's connection, so close() can reach them all
+        self._conns = set()
+        self._conns_lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.add(conn)
+        return conn
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[dict]):
+        rows, citations = [], []
+        for chunk_id, doc, meta in zip(ids, documents, metadatas):
+            meta = meta or {}
+            rows.append((chunk_id, meta.get("source_file"), doc, json.dumps(meta)))
+            law_key = normalize_law(str(meta.get("law_name", "")))
+            citations.extend(
+                (section, law_key, chunk_id, kind) for section, kind in chunk_sections(doc, meta)
+            )
+        with self._write_lock, self.conn as conn:
+            conn.executemany(
+                "INSERT INTO chunks(chunk_id, source_file, document, metadata) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(chunk_id) DO UPDATE SET source_file=excluded.source_file, "
+                "document=excluded.document, metadata=excluded.metadata",
+                rows,
+            )
+            conn.executemany("DELETE FROM citations WHERE chunk_id = ?", [(r[0],) for r in rows])
+            conn.executemany("INSERT OR IGNORE INTO citations VALUES (?, ?, ?, ?)", citations)
+
+    def delete_source(self, source_file: str):
+        with self._write_lock, self.conn as conn:
+            conn.execute(
+                "DELETE FROM citations WHERE chunk_id IN (SELECT chunk_id FROM chunks WHERE source_file = ?)",
+                (source_file,),
+            )
+            conn.execute("DELETE FROM chunks WHERE source_file = ?", (source_file,))
+
+    def delete_ids(self, ids: List[str]):
+        with self._write_lock, self.conn as conn:
+            conn.executemany("DELETE FROM citations WHERE chunk_id = ?", [(i,) for i in ids])
+            conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(i,) for i in ids])
+
+    def lookup_citation(self, law: str, section: str, limit: int = 5) -> List[Document]:
+        """
+        Chunks for `section` of the law whose normalized title contains `law`.
+
+        Chunks where the section is a heading rank before chunks that only
+        carry it as metadata.
+        """
+        law_key = normalize_law(law)
+        if not law_key:
+            # "%" or "" would otherwise match the section in every law
+            return []
+        rows = self.conn.execute(
+            "SELECT c.chunk_id, c.document, c.metadata FROM citations t "
+            "JOIN chunks c ON c.chunk_id = t.chunk_id "
+            "WHERE t.section = ? AND t.law_key LIKE ? ESCAPE '\\' "
+            "ORDER BY t.kind = 'heading' DESC, c.source_file, c.rowid LIMIT ?",
+            (section.upper(), f"%{_like_escape(law_key)}%", limit),
+        ).fetchall()
+        return [
+            Document(page_content=doc, metadata={**json.loads(meta), "chunk_id": chunk_id})
+            for chunk_id, doc, meta in rows
+        ]
+
+    def search(self, question: str, k: int = settings.KEYWORD_TOP_K) -> List[Document]:
+        query = match_query(question)
+        if query is None:
+            return []
+        rows = self.conn.execute(
+            "SELECT c.chunk_id, c.document, c.metadata FROM chunks_fts "
+            "JOIN chunks c ON c.rowid = chunks_fts.rowid "
+            "WHERE chunks_fts MATCH ? ORDER BY bm25(chunks_fts) LIMIT ?",
+            (query, k),
+        ).fetchall()
+        return [
+            Document(page_content=doc, metadata={**json.loads(meta), "chunk_id": chunk_id})
+            for chunk_id, doc, meta in rows
+        ]
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def close(self):
+        """Close the connections of every thread; each reopens on its next use."""
+        with self._conns_lock:
+            conns, self._conns = self._conns, set()
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
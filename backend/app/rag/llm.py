@@ -0,0 +1,81 @@
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+
+class PooledOllamaLLM(LLM):
+    """
+    Ollama completion model that streams through a shared `OllamaService`.
+
+    Per-call overrides (e.g. `llm.bind(num_predict=512)`) are forwarded as
+    Ollama options.
+    """
+
+    service: Any
+    model: str
+    temperature: float = 0.1
+    num_predict: int = 2048
+    num_ctx: int = 2048
+
+    @property
+    def _llm_type(self) -> str:
+        return "pooled-ollama"
+
+    def _options(self, stop: Optional[List[str]], **kwargs: Any) -> dict:
+        options = {
+            "temperature": kwargs.get("temperature", self.temperature),
+            "num_predict": kwargs.get("num_predict", self.num_predict),
+            "num_ctx": kwargs.get("num_ctx", self.num_ctx),
+        }
+        if stop:
+            options["stop"] = stop
+        return options
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        return "".join(chunk.text for chunk in self._stream(prompt, stop, run_manager, **kwargs))
+
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        parts = []
+        async for chunk in self._astream(prompt, stop, run_manager, **kwargs):
+            parts.append(chunk.text)
+        return "".join(parts)
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        for token in self.service.generate_stream(self.model, prompt, self._options(stop, **kwargs)):
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        async for token in self.service.agenerate_stream(self.model, prompt, self._options(stop, **kwargs)):
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+import numpy as np
+
+from app.core.config import settings
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def mmr_select(query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float = 0.7) -> List[int]:
+    """
+    Maximal marginal relevance over a (n, dim) candidate matrix.
+
+    Cosine relevance to the query is computed for every candidate in one
+    product; each pick then costs a single (n, dim) @ (dim,) product to
+    update every candidate's max similarity to the selected set, instead of
+    langchain's per-candidate Python loop over a growing similarity matrix.
+    Returns candidate row indices in selection order.
+    """
+    n = len(candidates)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    unit = _unit_rows(np.asarray(candidates, dtype=np.float32))
+    relevance = unit @ _unit_rows(np.asarray(query, dtype=np.float32))
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    taken = np.zeros(n, dtype=bool)
+    taken[first] = True
+    redundancy = unit @ unit[first]
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[taken] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        taken[best] = True
+        np.maximum(redundancy, unit @ unit[best], out=redundancy)
+    return selected
+
+
+class CandidateEmbeddingCache:
+    """
+    LRU of stored chunk embeddings keyed by chunk id.
+
+    Chunk ids are content digests, so a cached vector can never go stale;
+    repeat candidates are re-ranked without pulling their embeddings from
+    Chroma again.
+    """
+
+    def __init__(self, max_entries: int = settings.MMR_CANDIDATE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for key in ids:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+            self.hits += len(found)
+            self.misses += len(ids) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        with self._lock:
+            for key, vector in items.items():
+                self._lru[key] = vector
+                self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._lru)}
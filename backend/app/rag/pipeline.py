@@ -0,0 +1,249 @@
+import asyncio
+import threading
+import time
+from typing import List, Optional
+
+from loguru import logger
+
+from app.core import metrics
+from app.core.admission import AdmissionController
+from app.core.config import settings
+from app.core.degradation import DegradationController
+from app.core.readiness import Readiness
+from app.core.singleflight import SingleFlight
+from app.ingest.jobs import IngestJobManager
+from app.rag.cache import AnswerCache, CollectionVersion
+from app.rag.context import ContextPacker
+from app.rag.embeddings import CachedEmbeddings, EmbeddingStore, PooledOllamaEmbeddings
+from app.rag.keyword_index import KeywordIndex
+from app.rag.retriever import LegalRetriever
+from app.rag.router import PartitionRouter
+from app.services.chroma_service import ChromaService
+from app.services.ollama_service import OllamaService
+
+STARTUP_STEPS = ("vector_store", "models", "warmup")
+
+
+class RAGPipeline:
+    """
+    Process-wide registry of the long-lived RAG objects.
+
+    Built once in the app lifespan and handed to routes through
+    `app.api.deps`, so requests reuse the pooled Ollama/Chroma connections.
+    Constructing it opens no connections; `startup()` does, and records its
+    progress in `readiness`.
+    """
+
+    def __init__(self, ollama: OllamaService = None, chroma_client=None, embed_ollama: OllamaService = None):
+        # Generation and embedding replica pools; one shared pool unless OLLAMA_EMBED_URL is set
+        self.ollama = ollama or OllamaService(name="generate")
+        self.embed_ollama = embed_ollama or (
+            OllamaService(settings.OLLAMA_EMBED_URL, name="embed") if settings.OLLAMA_EMBED_URL else self.ollama
+        )
+        self.embedding_store = (EmbeddingStore(settings.EMBED_CACHE_PATH, max_rows=settings.EMBED_CACHE_MAX_ROWS)
+                                if settings.EMBED_CACHE_PATH else None)
+        self.embeddings = CachedEmbeddings(
+            PooledOllamaEmbeddings(self.embed_ollama, settings.EMBEDDING_MODEL),
+            settings.EMBEDDING_MODEL,
+            max_entries=settings.EMBED_CACHE_SIZE,
+            store=self.embedding_store,
+        )
+        # Opened lazily on first search/upsert
+        self.keyword_index = KeywordIndex() if settings.HYBRID_SEARCH_ENABLED else None
+        self.chroma = ChromaService(self.embeddings, client=chroma_client, keyword_index=self.keyword_index)
+        # LLM and chain pull in langchain_core's runnable stack, the slowest import; built on first use
+        self._llm = None
+        self._chain = None
+        # Chains for the smaller answer budgets of the degradation stages, by num_predict
+        self._budget_chains = {}
+        self._lazy_lock = threading.Lock()
+        self.packer = ContextPacker(num_ctx=settings.LLM_NUM_CTX)
+        self.router = PartitionRouter(settings.PARTITION_MAX_ROUTED) if settings.PARTITION_BY_FAMILY else None
+        self.retriever = LegalRetriever(self.chroma, self.embeddings, keyword_index=self.keyword_index,
+                                        router=self.router)
+        self.admission = AdmissionController()
+        self.degradation = DegradationController(self.admission)
+        self.flights = SingleFlight(enabled=settings.COALESCE_ENABLED)
+        self.collection_version = CollectionVersion()
+        self.cache = AnswerCache(collection=self.collection_version) if settings.ANSWER_CACHE_ENABLED else None
+        self.ingest_jobs = IngestJobManager(self.chroma, self.embeddings, on_complete=self._on_ingested)
+        self.readiness = Readiness(STARTUP_STEPS)
+        self._startup_task: Optional[asyncio.Task] = None
+        self._health_tasks: List[asyncio.Task] = []
+        self._register_metrics()
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            with self._lazy_lock:
+                if self._llm is None:
+                    from app.rag.llm import PooledOllamaLLM
+                    self._llm = PooledOllamaLLM(
+                        service=self.ollama,
+                        model=settings.OLLAMA_MODEL,
+                        temperature=0.1,
+                        num_predict=settings.LLM_NUM_PREDICT,
+                        num_ctx=settings.LLM_NUM_CTX,
+                    )
+        return self._llm
+
+    @property
+    def chain(self):
+        if self._chain is None:
+            llm = self.llm
+            with self._lazy_lock:
+                if self._chain is None:
+                    from app.rag.chain import build_rag_chain
+                    self._chain = build_rag_chain(llm)
+        return self._chain
+
+    def chain_for(self, num_predict: int):
+        """The RAG chain with answers capped at `num_predict` tokens."""
+        if num_predict == settings.LLM_NUM_PREDICT:
+            return self.chain
+        if num_predict not in self._budget_chains:
+            llm = self.llm
+            with self._lazy_lock:
+                if num_predict not in self._budget_chains:
+                    from app.rag.chain import build_rag_chain
+                    self._budget_chains[num_predict] = build_rag_chain(llm.bind(num_predict=num_predict))
+        return self._budget_chains[num_predict]
+
+    def _register_metrics(self):
+        # Read at scrape time so they never drift from the live objects
+        metrics.REGISTRY.gauge(
+            "paklex_llm_requests", "Generations holding or waiting for an admission slot", ("state",),
+            fn=lambda: {("active",): self.admission.active, ("waiting",): self.admission.waiting},
+        )
+        metrics.REGISTRY.gauge(
+            "paklex_load_stage", "Current load stage (0 normal, 1 reduced, 2 minimal, 3 sources only)",
+            fn=lambda: {(): self.degradation.peek().level},
+        )
+        metrics.REGISTRY.counter(
+            "paklex_coalesced_requests_total", "Requests answered by joining an identical in-flight question", ("mode",),
+            fn=lambda: {("json",): self.flights.coalesced, ("stream",): self.flights.stream_coalesced},
+        )
+        metrics.REGISTRY.counter(
+            "paklex_cache_lookups_total", "Cache lookups by cache and outcome", ("cache", "outcome"),
+            fn=self._cache_lookups,
+        )
+        metrics.REGISTRY.gauge(
+            "paklex_ingest_jobs", "Background ingestion jobs by status", ("status",),
+            fn=lambda: self._count_by(job.status for job in list(self.ingest_jobs.jobs.values())),
+        )
+        metrics.REGISTRY.gauge(
+            "paklex_ollama_in_flight", "Requests in flight per Ollama replica", ("pool", "replica"),
+            fn=lambda: {(p.name, r.url): r.in_flight for p in self.ollama_pools for r in p.replicas},
+        )
+        metrics.REGISTRY.gauge(
+            "paklex_ollama_replica_healthy", "1 while an Ollama replica is in rotation", ("pool", "replica"),
+            fn=lambda: {(p.name, r.url): int(r.healthy) for p in self.ollama_pools for r in p.replicas},
+        )
+        metrics.REGISTRY.gauge(
+            "paklex_startup_step_ready", "1 once a startup step has finished (GET /ready)", ("step",),
+            fn=lambda: {(step,): int(state["status"] == "ready") for step, state in self.readiness.steps.items()},
+        )
+
+    @staticmethod
+    def _count_by(values) -> dict:
+        counts = {}
+        for value in values:
+            counts[(value,)] = counts.get((value,), 0) + 1
+        return counts
+
+    def _cache_lookups(self) -> dict:
+        values = {}
+        if self.cache:
+            stats = self.cache.stats()
+            values[("answer", "exact_hit")] = stats["exact_hits"]
+            values[("answer", "semantic_hit")] = stats["semantic_hits"]
+            values[("answer", "miss")] = stats["misses"]
+        for name, stats in (("embedding", self.embeddings.stats()), ("candidate", self.retriever.candidates.stats())):
+            values[(name, "hit")] = stats["hits"]
+            values[(name, "miss")] = stats["misses"]
+        return values
+
+    @property
+    def ollama_pools(self) -> List[OllamaService]:
+        return [self.ollama] if self.embed_ollama is self.ollama else [self.ollama, self.embed_ollama]
+
+    def ollama_stats(self) -> dict:
+        return {pool.name: pool.stats() for pool in self.ollama_pools}
+
+    def _on_ingested(self, job):
+        # New law text can change answers: retire what every worker cached before it
+        try:
+            self.collection_version.bump()
+        except OSError as e:
+            logger.error(f"❌ Bumping the collection version failed: {e}")
+        if self.cache:
+            self.cache.clear()
+
+    async def startup(self, retry_seconds: Optional[float] = None):
+        """
+        Open the vector store, pull missing models, then warm them up.
+
+        With `retry_seconds` (background startup) a failed step is retried
+        at that interval until it succeeds. Without it, vector store errors
+        propagate and model errors are only logged, so the API still comes up.
+        Periodic Ollama replica health checks start here too.
+        """
+        if not self._health_tasks:
+            self._health_tasks = [asyncio.create_task(pool.run_health_checks()) for pool in self.ollama_pools]
+        await self._step("vector_store", self.chroma.initialize, retry_seconds, required=True)
+        if await self._step("models", self._ensure_models, retry_seconds):
+            await self._step("warmup", self._warm_up, retry_seconds)
+
+    def start_background(self):
+        """Run `startup()` as a task with retries; GET /ready reports when it is done."""
+        self._startup_task = asyncio.create_task(self.startup(retry_seconds=settings.STARTUP_RETRY_SECONDS))
+
+    async def _step(self, name: str, fn, retry_seconds: Optional[float], required: bool = False) -> bool:
+        start = time.perf_counter()
+        while True:
+            try:
+                await fn()
+                self.readiness.mark(name, "ready", seconds=time.perf_counter() - start)
+                logger.info(f"✅ Startup step '{name}' done in {time.perf_counter() - start:.1f}s")
+                return True
+            except Exception as e:
+                self.readiness.mark(name, "failed", error=f"{type(e).__name__}: {e}")
+                if retry_seconds is None:
+                    if required:
+                        raise
+                    logger.error(f"❌ Startup step '{name}' failed: {e}")
+                    return False
+                logger.warning(f"⚠️ Startup step '{name}' failed, retrying in {retry_seconds:g}s: {e}")
+                await asyncio.sleep(retry_seconds)
+
+    async def _ensure_models(self):
+        if self.embed_ollama is self.ollama:
+            await self.ollama.ensure_models([settings.OLLAMA_MODEL, settings.EMBEDDING_MODEL])
+        else:
+            await asyncio.gather(self.ollama.ensure_models([settings.OLLAMA_MODEL]),
+                                 self.embed_ollama.ensure_models([settings.EMBEDDING_MODEL]))
+
+    async def _warm_up(self):
+        # Import the generation stack and load the tokenizer off the event loop
+        await asyncio.to_thread(lambda: (self.chain, self.packer.counter.count("")))
+        if settings.STARTUP_WARMUP:
+            # Load both models into every replica's memory so the first user does not pay for it
+            await asyncio.gather(
+                self.embed_ollama.warm_up(settings.EMBEDDING_MODEL, embedding=True),
+                self.ollama.warm_up(settings.OLLAMA_MODEL, {"num_ctx": settings.LLM_NUM_CTX}),
+            )
+
+    async def aclose(self):
+        if self._startup_task is not None and not self._startup_task.done():
+            self._startup_task.cancel()
+        for task in self._health_tasks:
+            task.cancel()
+        self.ingest_jobs.shutdown()
+        for pool in self.ollama_pools:
+            await pool.aclose()
+        self.chroma.close()
+        if self.embedding_store is not None:
+            self.embedding_store.close()
+        if self.keyword_index is not None:
+            self.keyword_index.close()
+        logger.info("✅ RAG pipeline connections closed")
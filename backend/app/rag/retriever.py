@@ -1,34 +1,118 @@
-import chromadb
-from langchain_chroma import Chroma
-from langchain_ollama import OllamaEmbeddings
+import asyncio
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from loguru import logger
+from app.core import metrics
 from app.core.config import settings
+from app.ingest.ids import chunk_id
+from app.rag.mmr import CandidateEmbeddingCache, mmr_select
+from app.rag.router import PartitionRouter
+
+
+def document_key(doc: Document) -> str:
+    """Identity of a chunk independent of which index returned it."""
+    meta = doc.metadata
+    return chunk_id(meta.get("source_file", ""), meta.get("chunk_index", 0), doc.page_content)
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int = settings.RRF_K) -> List[Document]:
+    """Merge ranked lists by summing 1 / (k + rank) for every list a chunk appears in."""
+    scores, docs = {}, {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, 1):
+            key = document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+class LegalRetriever:
+    """
+    MMR retrieval over the law collection.
+
+    The question is embedded through the async Ollama client. One vector
+    backend query (blocking, run in a worker thread) returns the top
+    `fetch_k` candidates; their stored embeddings come from a local
+    `CandidateEmbeddingCache`, with only unseen ids fetched from the
+    backend, and `mmr_select` re-ranks them in NumPy. This keeps large `fetch_k`
+    values (100–500) cheap.
+
+    With a `keyword_index`, BM25 hits for the question are fused with the
+    vector results by reciprocal rank fusion, so exact citations such as
+    "Section 302 PPC" are not lost to purely semantic ranking.
+
+    With a `router` (partitioned stores only), the vector search covers just
+    the statute families the question points at; see `PartitionedBackend`.
+    """
+
+    def __init__(self, store, embeddings, k: int = settings.TOP_K_RESULTS,
+                 fetch_k: int = settings.MMR_FETCH_K, lambda_mult: float = settings.MMR_LAMBDA,
+                 keyword_index=None, candidate_cache: Optional[CandidateEmbeddingCache] = None,
+                 router: Optional[PartitionRouter] = None):
+        # `store` is anything exposing a `VectorBackend` as `backend` (ChromaService)
+        self.store = store
+        self.embeddings = embeddings
+        self.keyword_index = keyword_index
+        self.candidates = candidate_cache or CandidateEmbeddingCache()
+        self.router = router
+        self.k = k
+        self.fetch_k = fetch_k
+        self.lambda_mult = lambda_mult
+
+    async def aretrieve(self, question: str) -> List[Document]:
+        embedding = await self.embeddings.aembed_query(question)
+        return await self.asearch(embedding, question)
+
+    async def asearch(self, embedding: List[float], question: Optional[str] = None,
+                      k: Optional[int] = None) -> List[Document]:
+        k = k or self.k
+        partitions = self.router.route(question) if self.router and question else None
+        if self.keyword_index is None or question is None:
+            return await self._vector_search(embedding, k, partitions)
+
+        vector_docs, keyword_docs = await asyncio.gather(
+            # Over-fetch on the vector side so fusion has candidates to rank
+            self._vector_search(embedding, k * 2, partitions),
+            self._keyword_search(question),
+        )
+        return reciprocal_rank_fusion([vector_docs, keyword_docs])[:k]
+
+    async def _vector_search(self, embedding: List[float], k: int,
+                             partitions: Optional[List[str]] = None) -> List[Document]:
+        return await asyncio.to_thread(self.mmr_search, embedding, k, max(self.fetch_k, k), partitions)
+
+    def _candidate_vectors(self, ids: List[str]) -> np.ndarray:
+        found = self.candidates.get_many(ids)
+        missing = [i for i in ids if i not in found]
+        if missing:
+            fresh = self.store.backend.get_embeddings(missing)
+            self.candidates.put_many(fresh)
+            found.update(fresh)
+        return np.stack([found[i] for i in ids])
 
+    def mmr_search(self, embedding: List[float], k: int, fetch_k: int,
+                   partitions: Optional[List[str]] = None) -> List[Document]:
+        """Top-`fetch_k` vector candidates re-ranked to `k` by MMR (blocking)."""
+        with metrics.stage("vector_search"):
+            ids, documents, metadatas = self.store.backend.query(embedding, fetch_k, partitions)
+        if not ids:
+            return []
+        with metrics.stage("candidate_embeddings"):
+            vectors = self._candidate_vectors(ids)
+        with metrics.stage("rerank"):
+            picks = mmr_select(np.asarray(embedding, dtype=np.float32), vectors, k, self.lambda_mult)
+        return [
+            Document(page_content=documents[i], metadata={**metadatas[i], "chunk_id": ids[i]})
+            for i in picks
+        ]
 
-def get_embeddings():
-    return OllamaEmbeddings(
-        model=settings.EMBEDDING_MODEL,
-    )
-
-
-def get_vectorstore():
-    client = chromadb.HttpClient(
-        host=settings.CHROMA_HOST,
-        port=settings.CHROMA_PORT,
-    )
-    return Chroma(
-        client=client,
-        collection_name=settings.COLLECTION_NAME,
-        embedding_function=get_embeddings(),
-    )
-
-
-def get_retriever():
-    vectorstore = get_vectorstore()
-    return vectorstore.as_retriever(
-        search_type="mmr",
-        search_kwargs={
-            "k": settings.TOP_K_RESULTS,
-            "fetch_k": 20,
-            "lambda_mult": 0.7,
-        },
-    )
\ No newline at end of file
+    async def _keyword_search(self, question: str) -> List[Document]:
+        try:
+            with metrics.stage("keyword_search"):
+                return await asyncio.to_thread(self.keyword_index.search, question)
+        except Exception as e:
+            # Keyword search is an enhancement; never fail the query over it
+            logger.warning(f"⚠️ Keyword search failed: {e}")
+            return []
@@ -0,0 +1,90 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Statute families, most specific first: a law goes to the first family whose
+# title patterns match, a question is routed to every family it mentions.
+FAMILIES: Dict[str, Tuple[str, ...]] = {
+    "constitution": (r"\bconstitution", r"\barticles?\s+\d+", r"fundamental rights?", r"\bwrit\b"),
+    "criminal": (r"penal code", r"\bp\.?p\.?c\b", r"\bcr\.?\s?p\.?c\b", r"criminal", r"qanun-?e-?shahadat",
+                 r"\bevidence\b", r"terroris", r"narcotic", r"\bf\.?i\.?r\b", r"\bbail\b", r"\bpolice\b",
+                 r"\boffen[cs]es?\b", r"\b(murder|qatl|theft|robbery|dacoity|kidnapp?ing|rape|hurt|blasphemy)\b"),
+    "family": (r"family (court|law)", r"muslim family", r"dissolution of muslim marriages?", r"guardians?",
+               r"\bdowry\b", r"\b(divorce|khula|talaq|nikah|marriage|custody|dower|haq mehr)\b"),
+    "civil": (r"civil procedure", r"\bc\.?p\.?c\b", r"\bcontracts?\b", r"specific relief", r"\blimitation\b",
+              r"transfer of property", r"\bsuccession\b", r"\binheritance\b", r"\bregistration\b",
+              r"\b(suit|decree|injunction|plaint)\b"),
+    "property": (r"rent(ed)? premises", r"rent restriction", r"\btenan(t|cy)", r"\blandlords?\b", r"land revenue",
+                 r"land acquisition", r"\beviction\b", r"\b(property|mutation|possession)\b"),
+    "tax": (r"income tax", r"sales tax", r"\bcustoms\b", r"federal excise", r"finance act", r"\btax(es|ation)?\b",
+            r"\b(fbr|withholding)\b"),
+    "labour": (r"industrial relations", r"\bworkm[ae]n\b", r"\bfactories\b", r"minimum wages?", r"\blabou?r\b",
+               r"\bemploy(ee|er|ment)s?\b", r"social security", r"\b(eobi|gratuity|wages?)\b"),
+    "commercial": (r"\bcompan(y|ies)\b", r"\bsecurities\b", r"\bbank(ing|s)?\b", r"\bpartnership\b",
+                   r"negotiable instruments", r"\bcheques?\b", r"\binsurance\b", r"\barbitration\b",
+                   r"\bcompetition\b", r"\btrade ?marks?\b", r"\bcopyright\b"),
+}
+# Catch-all for laws no family claims; always searched, so routing never hides them
+GENERAL = "general"
+PARTITIONS = tuple(FAMILIES) + (GENERAL,)
+
+JURISDICTIONS = (
+    ("punjab", r"\bpunjab\b"),
+    ("sindh", r"\bsindh\b"),
+    ("khyber_pakhtunkhwa", r"khyber pakhtunkhwa|\bkpk?\b|\bn\.?w\.?f\.?p\b"),
+    ("balochistan", r"\bbalochistan\b|\bbaluchistan\b"),
+    ("islamabad", r"\bislamabad\b|\bict\b"),
+)
+
+_FAMILY_RES = {family: [re.compile(p, re.IGNORECASE) for p in patterns] for family, patterns in FAMILIES.items()}
+_JURISDICTION_RES = [(name, re.compile(p, re.IGNORECASE)) for name, p in JURISDICTIONS]
+
+
+def law_family(law_name: str, source_file: str = "") -> str:
+    """Partition of a law, from its title (or file name when the title says nothing)."""
+    for text in (law_name, source_file.replace("_", " ")):
+        for family, patterns in _FAMILY_RES.items():
+            if any(p.search(text or "") for p in patterns):
+                return family
+    return GENERAL
+
+
+def law_jurisdiction(law_name: str, source_file: str = "") -> str:
+    text = f"{law_name} {source_file.replace('_', ' ')}"
+    for name, pattern in _JURISDICTION_RES:
+        if pattern.search(text):
+            return name
+    return "federal"
+
+
+def partition_collection(collection: str, partition: str) -> str:
+    return f"{collection}__{partition}"
+
+
+class PartitionRouter:
+    """
+    Picks the statute families a question is about by keyword hits.
+
+    Returns up to `max_partitions` families (most hits first) plus the
+    `general` catch-all, or None when nothing matches, which means: search
+    every partition. Pure regex, so routing costs microseconds.
+    """
+
+    def __init__(self, max_partitions: int = 2):
+        self.max_partitions = max_partitions
+        self.routed = 0
+        self.unrouted = 0
+
+    def route(self, question: str) -> Optional[List[str]]:
+        hits = {
+            family: sum(1 for p in patterns if p.search(question))
+            for family, patterns in _FAMILY_RES.items()
+        }
+        chosen = [f for f in sorted(hits, key=hits.get, reverse=True) if hits[f]][:self.max_partitions]
+        if not chosen:
+            self.unrouted += 1
+            return None
+        self.routed += 1
+        return chosen + [GENERAL]
+
+    def stats(self) -> dict:
+        return {"routed": self.routed, "unrouted": self.unrouted}
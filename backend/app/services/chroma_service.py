@@ -1,54 +1,80 @@
-import chromadb
-from chromadb import HttpClient
-from langchain_ollama import OllamaEmbeddings
-from langchain_chroma import Chroma
+import asyncio
+
 from app.core.config import settings
+from app.ingest.ids import chunk_id
+from app.services.vector_store import ChromaBackend, PartitionedBackend, VectorBackend, create_backend
 from loguru import logger
 
 
-def get_chroma_client():
-    return HttpClient(
-        host=settings.CHROMA_HOST,
-        port=settings.CHROMA_PORT,
-    )
+class ChromaService:
+    """
+    The law collection: vectors in the configured `VectorBackend`
+    (`settings.VECTOR_BACKEND`), with the keyword index kept in step.
 
+    Passing a chromadb `client` (e.g. an EphemeralClient in benchmarks)
+    wraps it directly instead of building the configured backend.
+    """
 
-class ChromaService:
-    def __init__(self):
-        # Don't connect at import time — connect lazily
-        self._client = None
-        self.embeddings = OllamaEmbeddings(
-            model=settings.EMBEDDING_MODEL,
-        )
+    def __init__(self, embeddings, client=None, keyword_index=None, backend: VectorBackend = None):
+        # Don't connect at import time — connect lazily, then reuse
+        if backend is None and client is not None:
+            backend = (PartitionedBackend(lambda name: ChromaBackend(client, name))
+                       if settings.PARTITION_BY_FAMILY else ChromaBackend(client))
+        self._backend = backend
+        self.keyword_index = keyword_index
+        self.embeddings = embeddings
 
     @property
-    def client(self):
-        if self._client is None:
-            self._client = get_chroma_client()
-        return self._client
+    def backend(self) -> VectorBackend:
+        if self._backend is None:
+            self._backend = create_backend()
+        return self._backend
 
     async def initialize(self):
         try:
-            self.client.get_or_create_collection(
-                name=settings.COLLECTION_NAME,
-            )
-            logger.info(f"✅ Collection '{settings.COLLECTION_NAME}' ready")
+            await asyncio.to_thread(self.backend.initialize)
+            logger.info(f"✅ Collection '{settings.COLLECTION_NAME}' ready ({self.backend.name} backend)")
         except Exception as e:
-            logger.error(f"❌ ChromaDB init failed: {e}")
+            logger.error(f"❌ Vector store init failed: {e}")
             raise
 
     async def add_documents(self, documents: list) -> int:
-        vectorstore = Chroma(
-            client=self.client,
-            collection_name=settings.COLLECTION_NAME,
-            embedding_function=self.embeddings,
-        )
-        vectorstore.add_documents(documents)
+        texts = [doc.page_content for doc in documents]
+        metadatas = [doc.metadata for doc in documents]
+        ids = [chunk_id(m.get("source_file", ""), m.get("chunk_index", i), t)
+               for i, (m, t) in enumerate(zip(metadatas, texts))]
+        vectors = await self.embeddings.aembed_documents(texts)
+        await asyncio.to_thread(self.upsert, ids, vectors, texts, metadatas)
         return len(documents)
 
+    def upsert(self, ids: list, embeddings: list, documents: list, metadatas: list):
+        """Write pre-embedded chunks under content-addressed ids, keeping the keyword index in step."""
+        self.backend.upsert(ids, embeddings, documents, metadatas)
+        if self.keyword_index is not None:
+            self.keyword_index.upsert(ids, documents, metadatas)
+
+    def delete_source(self, source_file: str):
+        self.backend.delete_source(source_file)
+        if self.keyword_index is not None:
+            self.keyword_index.delete_source(source_file)
+
+    def delete_ids(self, ids: list):
+        self.backend.delete_ids(ids)
+        if self.keyword_index is not None:
+            self.keyword_index.delete_ids(ids)
+
     async def get_stats(self) -> dict:
-        collection = self.client.get_or_create_collection(settings.COLLECTION_NAME)
-        return {
+        count = await asyncio.to_thread(self.backend.count)
+        stats = {
             "collection": settings.COLLECTION_NAME,
-            "total_documents": collection.count(),
-        }
\ No newline at end of file
+            "backend": self.backend.name,
+            "total_documents": count,
+        }
+        if isinstance(self.backend, PartitionedBackend):
+            stats["partitions"] = await asyncio.to_thread(self.backend.counts)
+        return stats
+
+    def close(self):
+        if self._backend is not None:
+            self._backend.close()
+            self._backend = None
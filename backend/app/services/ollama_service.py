@@ -1,26 +1,342 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from typing import AsyncIterator, Iterator, List, Optional, Sequence, Union
+
 import httpx
+from app.core import metrics
 from app.core.config import settings
 from loguru import logger
 
+# Worth trying another replica: the server is down, restarting or overloaded. 4xx and model errors are not.
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+def parse_urls(urls: Union[str, Sequence[str]]) -> List[str]:
+    """`"http://a:11434, http://b:11434"` or a list of URLs -> list of URLs."""
+    if isinstance(urls, str):
+        urls = urls.split(",")
+    return [url.strip().rstrip("/") for url in urls if url and url.strip()]
+
+
+class OllamaReplica:
+    """One Ollama server: its pooled keep-alive clients, requests in flight and health."""
+
+    def __init__(self, url: str, pool: str):
+        self.url = url
+        self.pool = pool
+        self.in_flight = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.pulling: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+    def _client_kwargs(self) -> dict:
+        return {
+            "base_url": self.url,
+            "timeout": httpx.Timeout(settings.OLLAMA_TIMEOUT, connect=10),
+            "limits": httpx.Limits(
+                max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OLLAMA_MAX_CONNECTIONS,
+            ),
+        }
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(**self._client_kwargs())
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(**self._client_kwargs())
+        return self._async_client
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    def eject(self, seconds: float, reason: str):
+        if self.healthy:
+            metrics.OLLAMA_EJECTIONS.inc(pool=self.pool, replica=self.url)
+            logger.warning(f"⚠️ Ollama replica {self.url} ({self.pool}) ejected for {seconds:g}s: {reason}")
+        self.failures += 1
+        self.ejected_until = time.monotonic() + seconds
+
+    def reinstate(self):
+        if self.failures:
+            logger.info(f"✅ Ollama replica {self.url} ({self.pool}) back in rotation")
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    async def list_models(self) -> List[str]:
+        r = await self.async_client.get("/api/tags", timeout=10)
+        r.raise_for_status()
+        return [m["name"] for m in r.json().get("models", [])]
+
+    def stats(self) -> dict:
+        return {"url": self.url, "healthy": self.healthy, "in_flight": self.in_flight, "failures": self.failures}
+
+    async def aclose(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
 
 class OllamaService:
-    async def health_check(self):
-        async with httpx.AsyncClient() as client:
+    """
+    Ollama HTTP client over one or more replicas (`base_url` is a URL, a
+    comma-separated list or a list), each with its own pooled keep-alive
+    connections, so calls never open a new client.
+
+    Each call goes to the healthy replica with the fewest requests in
+    flight; ties rotate. A replica that refuses the connection, times out or
+    answers 5xx is ejected for `eject_seconds` and the call is retried on
+    another replica, up to `retries` times. A stream is retried only before
+    its first token. `check_health()` probes every replica's /api/tags and
+    ejects those that are down or lack the pool's models; `run_health_checks()`
+    repeats it so recovered replicas return. If every replica is ejected,
+    calls still go to the least loaded one rather than failing outright.
+    """
+
+    def __init__(self, base_url: Union[str, Sequence[str], None] = None, name: str = "ollama",
+                 retries: int = settings.OLLAMA_RETRIES, eject_seconds: float = settings.OLLAMA_EJECT_SECONDS):
+        self.name = name
+        self.replicas = [OllamaReplica(url, name) for url in parse_urls(base_url or settings.OLLAMA_BASE_URL)]
+        if not self.replicas:
+            raise ValueError("No Ollama URL configured")
+        self.retries = retries
+        self.eject_seconds = eject_seconds
+        # Models every replica must have; set by `ensure_models`
+        self.models: List[str] = []
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+
+    # ── Routing ───────────────────────────────────────────────────
+    def _acquire(self, tried: List[OllamaReplica]) -> OllamaReplica:
+        with self._lock:
+            candidates = [r for r in self.replicas if r not in tried] or self.replicas
+            candidates = [r for r in candidates if r.healthy] or candidates
+            start = next(self._turn) % len(candidates)
+            rotated = candidates[start:] + candidates[:start]
+            replica = min(rotated, key=lambda r: r.in_flight)
+            replica.in_flight += 1
+            return replica
+
+    def _release(self, replica: OllamaReplica):
+        with self._lock:
+            replica.in_flight -= 1
+
+    def _failed(self, replica: OllamaReplica, error: Exception, tried: List[OllamaReplica],
+                retryable: bool = True) -> bool:
+        """Eject `replica` if `error` says it is unwell; True if the call should move to another replica."""
+        if isinstance(error, httpx.HTTPStatusError) and error.response.status_code not in RETRY_STATUSES:
+            return False
+        replica.eject(self.eject_seconds, f"{type(error).__name__}: {error}")
+        tried.append(replica)
+        if not retryable or len(tried) > self.retries or len(tried) >= len(self.replicas):
+            return False
+        metrics.OLLAMA_RETRIES.inc(pool=self.name)
+        return True
+
+    def _call(self, fn):
+        tried: List[OllamaReplica] = []
+        while True:
+            replica = self._acquire(tried)
             try:
-                r = await client.get(f"{settings.OLLAMA_BASE_URL}/api/tags", timeout=10)
-                models = [m["name"] for m in r.json().get("models", [])]
-                if settings.OLLAMA_MODEL not in " ".join(models):
-                    logger.warning(f"⚠️ Model {settings.OLLAMA_MODEL} not found. Pulling...")
-                    await self.pull_model()
-                else:
-                    logger.info(f"✅ Ollama model {settings.OLLAMA_MODEL} ready")
-            except Exception as e:
-                logger.error(f"❌ Ollama unreachable: {e}")
-
-    async def pull_model(self):
-        async with httpx.AsyncClient(timeout=300) as client:
-            await client.post(
-                f"{settings.OLLAMA_BASE_URL}/api/pull",
-                json={"name": settings.OLLAMA_MODEL},
-            )
-            logger.info(f"✅ Model {settings.OLLAMA_MODEL} pulled")
+                return fn(replica)
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if not self._failed(replica, e, tried):
+                    raise
+            finally:
+                self._release(replica)
+
+    async def _acall(self, fn):
+        tried: List[OllamaReplica] = []
+        while True:
+            replica = self._acquire(tried)
+            try:
+                return await fn(replica)
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if not self._failed(replica, e, tried):
+                    raise
+            finally:
+                self._release(replica)
+
+    # ── Health and models ─────────────────────────────────────────
+    async def list_models(self) -> List[str]:
+        return await self._acall(lambda replica: replica.list_models())
+
+    async def _probe(self, replica: OllamaReplica) -> bool:
+        try:
+            available = " ".join(await replica.list_models())
+        except (httpx.HTTPError, ValueError) as e:
+            replica.eject(self.eject_seconds, f"/api/tags failed: {e}")
+            return False
+        missing = [m for m in self.models if m not in available]
+        if missing:
+            replica.eject(self.eject_seconds, f"missing {', '.join(missing)}")
+            if replica.pulling is None or replica.pulling.done():
+                replica.pulling = asyncio.create_task(self._pull_missing(replica, missing))
+            return False
+        replica.reinstate()
+        return True
+
+    async def _pull_missing(self, replica: OllamaReplica, models: List[str]):
+        for model in models:
+            logger.warning(f"⚠️ Model {model} not found on {replica.url}. Pulling...")
+            try:
+                await self._pull(replica, model)
+            except (httpx.HTTPError, RuntimeError) as e:
+                logger.error(f"❌ Pulling {model} on {replica.url} failed: {e}")
+                return
+        await self._probe(replica)
+
+    async def check_health(self) -> int:
+        """Probe every replica's /api/tags, ejecting or reinstating it; returns how many are healthy."""
+        return sum(await asyncio.gather(*(self._probe(r) for r in self.replicas)))
+
+    async def run_health_checks(self, interval: float = settings.OLLAMA_HEALTH_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            await self.check_health()
+
+    async def ensure_models(self, models: List[str]):
+        """Pull any of `models` missing on a reachable replica; fails unless one replica ends up with all of them."""
+        self.models = list(dict.fromkeys(self.models + models))
+        await self.check_health()
+        await asyncio.gather(*(r.pulling for r in self.replicas if r.pulling is not None))
+        healthy = [r.url for r in self.replicas if r.healthy]
+        if not healthy:
+            raise RuntimeError(f"No Ollama replica in '{self.name}' is reachable with {', '.join(self.models)}")
+        logger.info(f"✅ Ollama models {', '.join(models)} available on {len(healthy)}/{len(self.replicas)} replicas")
+
+    async def _pull(self, replica: OllamaReplica, model: str):
+        # Streamed, so the read timeout applies per progress line rather than to the whole download
+        async with replica.async_client.stream("POST", "/api/pull", json={"name": model}) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if line:
+                    self._parse_line(line)
+        logger.info(f"✅ Model {model} pulled on {replica.url}")
+
+    async def pull_model(self, model: str = None):
+        """Pull `model` on every replica."""
+        model = model or settings.OLLAMA_MODEL
+        await asyncio.gather(*(self._pull(r, model) for r in self.replicas))
+
+    async def warm_up(self, model: str, options: Optional[dict] = None, embedding: bool = False):
+        """
+        One-token generation (or one embedding) that makes every healthy
+        replica load `model` into memory. Generation `options` must carry
+        the same `num_ctx` as real requests, or the first real request
+        reloads the model with the new context size.
+        """
+        async def one(replica: OllamaReplica):
+            if embedding:
+                r = await replica.async_client.post("/api/embed", json={"model": model, "input": ["warm-up"]})
+            else:
+                payload = {"model": model, "prompt": "Hello", "stream": False,
+                           "options": {**(options or {}), "num_predict": 1}}
+                r = await replica.async_client.post("/api/generate", json=payload)
+            r.raise_for_status()
+            self._parse_line(r.text)
+
+        replicas = [r for r in self.replicas if r.healthy] or self.replicas
+        results = await asyncio.gather(*(one(r) for r in replicas), return_exceptions=True)
+        for replica, result in zip(replicas, results):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ Warm-up of {model} on {replica.url} failed: {result}")
+        if all(isinstance(result, Exception) for result in results):
+            raise results[0]
+
+    # ── Embeddings ────────────────────────────────────────────────
+    def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        def call(replica: OllamaReplica):
+            r = replica.client.post("/api/embed", json={"model": model, "input": texts})
+            r.raise_for_status()
+            return r.json()["embeddings"]
+        return self._call(call)
+
+    async def aembed(self, model: str, texts: List[str]) -> List[List[float]]:
+        async def call(replica: OllamaReplica):
+            r = await replica.async_client.post("/api/embed", json={"model": model, "input": texts})
+            r.raise_for_status()
+            return r.json()["embeddings"]
+        return await self._acall(call)
+
+    # ── Generation ────────────────────────────────────────────────
+    @staticmethod
+    def _parse_line(line: str) -> dict:
+        part = json.loads(line)
+        if part.get("error"):
+            raise RuntimeError(f"Ollama error: {part['error']}")
+        return part
+
+    def generate_stream(self, model: str, prompt: str, options: dict) -> Iterator[str]:
+        payload = {"model": model, "prompt": prompt, "stream": True, "options": options}
+        tried: List[OllamaReplica] = []
+        while True:
+            replica = self._acquire(tried)
+            started = False
+            try:
+                with replica.client.stream("POST", "/api/generate", json=payload) as r:
+                    r.raise_for_status()
+                    for line in r.iter_lines():
+                        if not line:
+                            continue
+                        part = self._parse_line(line)
+                        if part.get("response"):
+                            started = True
+                            yield part["response"]
+                        if part.get("done"):
+                            metrics.record_generation(part)
+                            break
+                return
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if not self._failed(replica, e, tried, retryable=not started):
+                    raise
+            finally:
+                self._release(replica)
+
+    async def agenerate_stream(self, model: str, prompt: str, options: dict) -> AsyncIterator[str]:
+        payload = {"model": model, "prompt": prompt, "stream": True, "options": options}
+        tried: List[OllamaReplica] = []
+        while True:
+            replica = self._acquire(tried)
+            started = False
+            try:
+                async with replica.async_client.stream("POST", "/api/generate", json=payload) as r:
+                    r.raise_for_status()
+                    async for line in r.aiter_lines():
+                        if not line:
+                            continue
+                        part = self._parse_line(line)
+                        if part.get("response"):
+                            started = True
+                            yield part["response"]
+                        if part.get("done"):
+                            metrics.record_generation(part)
+                            break
+                return
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if not self._failed(replica, e, tried, retryable=not started):
+                    raise
+            finally:
+                self._release(replica)
+
+    def stats(self) -> List[dict]:
+        return [r.stats() for r in self.replicas]
+
+    async def aclose(self):
+        for replica in self.replicas:
+            if replica.pulling is not None:
+                replica.pulling.cancel()
+            await replica.aclose()
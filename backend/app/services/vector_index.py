@@ -0,0 +1,300 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+DTYPES = ("float16", "int8")
+MANIFEST = "manifest.json"
+# Rows scored per NumPy product: bounds the float32 scratch space per query
+BLOCK_ROWS = 8192
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def _quantize(unit: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Unit rows as stored codes plus the per-row scale that dequantizes them."""
+    if dtype == "float16":
+        return unit.astype(np.float16), np.ones(len(unit), dtype=np.float32)
+    scales = np.abs(unit).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(unit / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _kmeans(sample: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit rows; returns (nlist, dim) unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = sample[assign == c]
+            # Re-seed empty lists from a random point rather than letting them die
+            centroids[c] = members.sum(axis=0) if len(members) else sample[rng.integers(len(sample))]
+        centroids = _unit_rows(centroids)
+    return centroids.astype(np.float32)
+
+
+def auto_nlist(count: int) -> int:
+    """Exact search below 10k chunks (a few ms); beyond that ~4·sqrt(n) inverted lists."""
+    return 0 if count < 10000 else int(4 * np.sqrt(count))
+
+
+def build_index(path: str, records: Iterable[Tuple[List[str], list, List[str], List[dict]]], count: int,
+                dtype: str = "float16", nlist: int = 0, sample_size: int = 100000) -> dict:
+    """
+    Write a memory-mappable index for `count` chunks to the directory `path`.
+
+    `records` yields (ids, embeddings, documents, metadatas) pages. Vectors
+    are unit-normalized and stored as float16 or per-row-scaled int8 in
+    `vectors.npy`; ids, text and metadata go to the `chunks.sqlite3` side
+    table keyed by row. With `nlist` > 0 rows are clustered by k-means and
+    stored list by list, so a search scans only the probed lists.
+
+    The index is built next to `path` and swapped in by rename, so workers
+    serving the old one keep reading it until they notice the new manifest
+    (and while `path` is briefly missing between the two renames).
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown index dtype '{dtype}' (expected one of {', '.join(DTYPES)})")
+    start = time.perf_counter()
+    staging = f"{path}.building"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    side = sqlite3.connect(os.path.join(staging, "chunks.sqlite3"))
+    side.execute("CREATE TABLE staged (seq INTEGER PRIMARY KEY, id TEXT, document TEXT, metadata TEXT)")
+    raw = None
+    scales = np.empty(count, dtype=np.float32)
+    written = 0
+    for ids, embeddings, documents, metadatas in records:
+        unit = _unit_rows(np.asarray(embeddings, dtype=np.float32))
+        if raw is None:
+            # float16 staging copy of every vector; clustering reorders from it
+            raw = np.lib.format.open_memmap(os.path.join(staging, "staged.npy"), mode="w+",
+                                            dtype=np.float16, shape=(count, unit.shape[1]))
+        n = min(len(ids), count - written)
+        raw[written:written + n] = unit[:n]
+        side.executemany(
+            "INSERT INTO staged VALUES (?, ?, ?, ?)",
+            [(written + i, ids[i], documents[i], json.dumps(metadatas[i] or {}, separators=(",", ":")))
+             for i in range(n)],
+        )
+        written += n
+    if raw is None or written == 0:
+        side.close()
+        shutil.rmtree(staging)
+        raise ValueError("Nothing to index: the source collection is empty")
+
+    count = written
+    dim = raw.shape[1]
+    nlist = min(nlist, count)
+    if nlist > 0:
+        rng = np.random.default_rng(0)
+        sample_rows = np.sort(rng.choice(count, min(sample_size, count), replace=False))
+        centroids = _kmeans(raw[sample_rows].astype(np.float32), nlist)
+        assign = np.concatenate([
+            np.argmax(raw[i:i + BLOCK_ROWS].astype(np.float32) @ centroids.T, axis=1)
+            for i in range(0, count, BLOCK_ROWS)
+        ])
+        order = np.argsort(assign, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+        np.save(os.path.join(staging, "centroids.npy"), centroids)
+        np.save(os.path.join(staging, "offsets.npy"), offsets)
+    else:
+        order = np.arange(count)
+
+    vectors = np.lib.format.open_memmap(os.path.join(staging, "vectors.npy"), mode="w+",
+                                        dtype=np.float16 if dtype == "float16" else np.int8, shape=(count, dim))
+    for i in range(0, count, BLOCK_ROWS):
+        codes, block_scales = _quantize(raw[order[i:i + BLOCK_ROWS]].astype(np.float32), dtype)
+        vectors[i:i + len(codes)] = codes
+        scales[i:i + len(codes)] = block_scales
+    vectors.flush()
+    del vectors, raw
+    os.remove(os.path.join(staging, "staged.npy"))
+    if dtype == "int8":
+        np.save(os.path.join(staging, "scales.npy"), scales[:count])
+
+    # Side table rows follow the (possibly clustered) vector order
+    side.execute("CREATE TABLE placement (seq INTEGER PRIMARY KEY, row INTEGER)")
+    side.executemany("INSERT INTO placement VALUES (?, ?)", ((int(seq), row) for row, seq in enumerate(order)))
+    side.execute("CREATE TABLE chunks (row INTEGER PRIMARY KEY, id TEXT UNIQUE, document TEXT, metadata TEXT)")
+    side.execute("INSERT INTO chunks SELECT p.row, s.id, s.document, s.metadata "
+                 "FROM staged s JOIN placement p ON p.seq = s.seq")
+    side.execute("DROP TABLE staged")
+    side.execute("DROP TABLE placement")
+    side.commit()
+    side.execute("VACUUM")
+    side.close()
+
+    manifest = {"count": count, "dim": dim, "dtype": dtype, "nlist": nlist, "built_at": time.time()}
+    with open(os.path.join(staging, MANIFEST), "w") as f:
+        json.dump(manifest, f)
+
+    retired = f"{path}.old"
+    shutil.rmtree(retired, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, retired)
+    os.rename(staging, path)
+    shutil.rmtree(retired, ignore_errors=True)
+    manifest["build_s"] = round(time.perf_counter() - start, 2)
+    return manifest
+
+
+class MmapIndex:
+    """
+    Read side of `build_index`: quantized vectors memory-mapped read-only.
+
+    Opening maps the files and reads nothing, so startup is constant-time
+    whatever the corpus size. Pages come from the OS page cache, which every
+    worker process on the host shares: a worker's private memory stays flat
+    as the corpus grows. Searches score `BLOCK_ROWS` rows at a time, exactly
+    over the whole matrix or over the `nprobe` nearest inverted lists.
+    """
+
+    def __init__(self, path: str, nprobe: int = 8):
+        self.path = path
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._side: Optional[sqlite3.Connection] = None
+
+    def _manifest_stamp(self):
+        st = os.stat(os.path.join(self.path, MANIFEST))
+        return st.st_ino, st.st_mtime_ns
+
+    def open(self):
+        with self._lock:
+            self._open()
+
+    def _open(self):
+        # Everything is loaded before any of it replaces the current mapping, so a failed open
+        # (e.g. the directory swapped away mid-way) leaves the previous index intact
+        stamp = self._manifest_stamp()
+        with open(os.path.join(self.path, MANIFEST)) as f:
+            manifest = json.load(f)
+        vectors = np.load(os.path.join(self.path, "vectors.npy"), mmap_mode="r")
+        int8 = manifest["dtype"] == "int8"
+        scales = np.load(os.path.join(self.path, "scales.npy"), mmap_mode="r") if int8 else None
+        centroids = offsets = None
+        if manifest["nlist"]:
+            centroids = np.load(os.path.join(self.path, "centroids.npy"))
+            offsets = np.load(os.path.join(self.path, "offsets.npy"))
+        side = sqlite3.connect(f"file:{os.path.join(self.path, 'chunks.sqlite3')}?mode=ro",
+                               uri=True, check_same_thread=False)
+        if self._side is not None:
+            self._side.close()
+        self.manifest, self.vectors, self.scales = manifest, vectors, scales
+        self.centroids, self.offsets, self._side = centroids, offsets, side
+        self._stamp = stamp
+        logger.info(f"✅ Vector index mapped: {self.manifest['count']} x {self.manifest['dim']} "
+                    f"{self.manifest['dtype']}, nlist={self.manifest['nlist']} from {self.path}")
+
+    def _ensure_open(self):
+        # A rebuild swaps the directory in by rename; pick it up on the next call. Between the
+        # rebuild's two renames `path` has no manifest: keep serving the index already mapped
+        # (its files stay readable after the old directory is removed)
+        if self._stamp is None:
+            self._open()
+            return
+        try:
+            if self._manifest_stamp() != self._stamp:
+                self._open()
+        except FileNotFoundError:
+            logger.debug(f"⏳ {self.path} is being swapped; serving the mapped index")
+
+    def _score(self, start: int, stop: int, query: np.ndarray) -> np.ndarray:
+        parts = []
+        for i in range(start, stop, BLOCK_ROWS):
+            j = min(i + BLOCK_ROWS, stop)
+            scores = self.vectors[i:j].astype(np.float32) @ query
+            parts.append(scores * self.scales[i:j] if self.scales is not None else scores)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+    def _spans(self, query: np.ndarray, n: int) -> List[Tuple[int, int]]:
+        if self.centroids is None:
+            return [(0, self.manifest["count"])]
+        spans, covered = [], 0
+        # Probe nearest lists first; keep going past nprobe until there are n candidates
+        for c in np.argsort(-(self.centroids @ query)):
+            start, stop = int(self.offsets[c]), int(self.offsets[c + 1])
+            if stop > start:
+                spans.append((start, stop))
+                covered += stop - start
+            if len(spans) >= self.nprobe and covered >= n:
+                break
+        return spans
+
+    def _search(self, embedding: List[float], n: int) -> Tuple[np.ndarray, np.ndarray]:
+        query = _unit_rows(np.asarray(embedding, dtype=np.float32))
+        spans = self._spans(query, n)
+        rows = np.concatenate([np.arange(a, b) for a, b in spans])
+        scores = np.concatenate([self._score(a, b, query) for a, b in spans])
+        n = min(n, len(scores))
+        if n == 0:
+            return rows[:0], scores[:0]
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top])]
+        return rows[top], scores[top]
+
+    def query(self, embedding: List[float], n: int) -> Tuple[List[str], List[str], List[dict], List[float]]:
+        """(ids, documents, metadatas, cosine scores) of the `n` nearest rows, best first."""
+        with self._lock:
+            self._ensure_open()
+            rows, scores = self._search(embedding, n)
+            rows = [int(r) for r in rows]
+            if not rows:
+                return [], [], [], []
+            found = dict((r[0], r[1:]) for r in self._side.execute(
+                f"SELECT row, id, document, metadata FROM chunks WHERE row IN ({','.join('?' * len(rows))})", rows))
+        return ([found[r][0] for r in rows], [found[r][1] for r in rows], [json.loads(found[r][2]) for r in rows],
+                scores.tolist())
+
+    def embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Dequantized unit vectors for the ids present in the index."""
+        with self._lock:
+            self._ensure_open()
+            found = self._side.execute(
+                f"SELECT id, row FROM chunks WHERE id IN ({','.join('?' * len(ids))})", ids).fetchall()
+            if not found:
+                return {}
+            rows = np.array([r[1] for r in found])
+            vectors = self.vectors[rows].astype(np.float32)
+            if self.scales is not None:
+                vectors *= self.scales[rows][:, None]
+        return {chunk_id: vectors[i] for i, (chunk_id, _) in enumerate(found)}
+
+    def iter_chunks(self, batch_size: int = 1000):
+        last = -1
+        while True:
+            with self._lock:
+                self._ensure_open()
+                page = self._side.execute(
+                    "SELECT row, id, document, metadata FROM chunks WHERE row > ? ORDER BY row LIMIT ?",
+                    (last, batch_size)).fetchall()
+            if not page:
+                return
+            last = page[-1][0]
+            yield [r[1] for r in page], [r[2] for r in page], [json.loads(r[3]) for r in page]
+
+    def count(self) -> int:
+        with self._lock:
+            self._ensure_open()
+            return self.manifest["count"]
+
+    def close(self):
+        with self._lock:
+            if self._side is not None:
+                self._side.close()
+                self._side = None
+            self._stamp = None
@@ -0,0 +1,471 @@
+import heapq
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from app.core import metrics
+from app.core.config import settings
+from app.rag.router import PARTITIONS, law_family, partition_collection
+from app.services.vector_index import MmapIndex
+
+# Backends ingestion can write to; "mmap" is a read-only export built by scripts/build_vector_index.py
+WRITABLE_BACKENDS = ("http", "persistent", "flat")
+BACKENDS = WRITABLE_BACKENDS + ("mmap",)
+
+
+class VectorBackend:
+    """
+    Storage interface shared by the API, the retriever and the ingestion scripts.
+
+    All methods are blocking; async callers run them via `asyncio.to_thread`.
+    `search` returns (ids, documents, metadatas, distances) best match first;
+    distances are only comparable within one backend kind.
+    """
+
+    name = "base"
+
+    def initialize(self):
+        pass
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[dict]):
+        raise NotImplementedError
+
+    def search(self, embedding: List[float], n_results: int) -> Tuple[List[str], List[str], List[dict], List[float]]:
+        raise NotImplementedError
+
+    def query(self, embedding: List[float], n_results: int,
+              partitions: Optional[List[str]] = None) -> Tuple[List[str], List[str], List[dict]]:
+        """(ids, documents, metadatas) best match first; `partitions` only narrows a `PartitionedBackend`."""
+        return self.search(embedding, n_results)[:3]
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        raise NotImplementedError
+
+    def delete_source(self, source_file: str):
+        raise NotImplementedError
+
+    def delete_ids(self, ids: List[str]):
+        raise NotImplementedError
+
+    def iter_documents(self, batch_size: int = 1000) -> Iterator[Tuple[List[str], List[str], List[dict]]]:
+        """Every stored chunk as (ids, documents, metadatas) pages."""
+        raise NotImplementedError
+
+    def iter_records(self, batch_size: int = 1000) -> Iterator[Tuple[List[str], list, List[str], List[dict]]]:
+        """Every stored chunk with its vector, as (ids, embeddings, documents, metadatas) pages."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ChromaBackend(VectorBackend):
+    """A Chroma collection behind any chromadb client: HttpClient, PersistentClient or EphemeralClient."""
+
+    def __init__(self, client, collection_name: str = settings.COLLECTION_NAME, name: str = "chroma"):
+        self.client = client
+        self.collection_name = collection_name
+        self.name = name
+        self._collection = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            self._collection = self.client.get_or_create_collection(self.collection_name)
+        return self._collection
+
+    def initialize(self):
+        self._collection = self.client.get_or_create_collection(self.collection_name)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def search(self, embedding, n_results):
+        result = self.collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"],
+        )
+        return (result["ids"][0], result["documents"][0], [m or {} for m in result["metadatas"][0]],
+                result["distances"][0])
+
+    def get_embeddings(self, ids):
+        result = self.collection.get(ids=ids, include=["embeddings"])
+        return {i: np.asarray(v, dtype=np.float32) for i, v in zip(result["ids"], result["embeddings"])}
+
+    def delete_source(self, source_file):
+        self.collection.delete(where={"source_file": source_file})
+
+    def delete_ids(self, ids):
+        self.collection.delete(ids=ids)
+
+    def iter_documents(self, batch_size=1000):
+        total = self.collection.count()
+        for offset in range(0, total, batch_size):
+            page = self.collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+            yield page["ids"], page["documents"], page["metadatas"]
+
+    def iter_records(self, batch_size=1000):
+        total = self.collection.count()
+        for offset in range(0, total, batch_size):
+            page = self.collection.get(limit=batch_size, offset=offset,
+                                       include=["embeddings", "documents", "metadatas"])
+            yield page["ids"], page["embeddings"], page["documents"], page["metadatas"]
+
+    def count(self):
+        return self.collection.count()
+
+    def close(self):
+        # chromadb's HttpClient keeps a requests.Session on its server API
+        session = getattr(getattr(self.client, "_server", None), "_session", None)
+        if session is not None:
+            session.close()
+        self._collection = None
+
+
+class FlatBackend(VectorBackend):
+    """
+    Exact cosine search over an in-process NumPy matrix, for small corpora.
+
+    SQLite (WAL) holds ids, text, metadata and float32 vectors; the matrix
+    is loaded from it on first use and patched in place on upserts. Another
+    process writing the same file (an ingestion script, a second worker)
+    bumps SQLite's `data_version`, and the matrix is reloaded before the
+    next query. A brute-force scan of 50k x 768 floats takes a few ms, with
+    no server hop and no index to build.
+    """
+
+    name = "flat"
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            "id TEXT PRIMARY KEY, source_file TEXT, document TEXT, metadata TEXT, embedding BLOB)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS vectors_source ON vectors(source_file)")
+        self._conn.commit()
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._version = None
+
+    def _data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _load(self):
+        ids, vectors = [], []
+        for chunk_id, blob in self._conn.execute("SELECT id, embedding FROM vectors ORDER BY rowid"):
+            ids.append(chunk_id)
+            vectors.append(np.frombuffer(blob, dtype=np.float32))
+        matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True) if len(matrix) else None
+        self._matrix = matrix / np.where(norms == 0, 1.0, norms) if norms is not None else matrix
+        self._ids = ids
+        self._rows = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        self._version = self._data_version()
+        logger.info(f"✅ Flat vector index loaded: {len(ids)} vectors from {self.path}")
+
+    def _ensure_loaded(self):
+        # data_version only changes when *another* connection commits
+        if self._matrix is None or self._data_version() != self._version:
+            self._load()
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (id, source_file, document, metadata, embedding) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (i, (m or {}).get("source_file"), d, json.dumps(m or {}), v.tobytes())
+                    for i, d, m, v in zip(ids, documents, metadatas, vectors)
+                ],
+            )
+            self._conn.commit()
+            if self._matrix is None or self._data_version() != self._version:
+                self._matrix = None
+                return
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            unit = vectors / np.where(norms == 0, 1.0, norms)
+            fresh = []
+            for chunk_id, vector in zip(ids, unit):
+                row = self._rows.get(chunk_id)
+                if row is None:
+                    self._rows[chunk_id] = len(self._ids)
+                    self._ids.append(chunk_id)
+                    fresh.append(vector)
+                else:
+                    self._matrix[row] = vector
+            if fresh:
+                stack = np.vstack(fresh)
+                self._matrix = np.vstack([self._matrix, stack]) if len(self._matrix) else stack
+
+    def search(self, embedding, n_results):
+        with self._lock:
+            self._ensure_loaded()
+            if not self._ids:
+                return [], [], [], []
+            query = np.asarray(embedding, dtype=np.float32)
+            scores = self._matrix @ (query / (np.linalg.norm(query) or 1.0))
+            n = min(n_results, len(scores))
+            top = np.argpartition(-scores, n - 1)[:n]
+            top = top[np.argsort(-scores[top])]
+            ids = [self._ids[i] for i in top]
+            rows = dict((r[0], r[1:]) for r in self._conn.execute(
+                f"SELECT id, document, metadata FROM vectors WHERE id IN ({','.join('?' * len(ids))})", ids))
+        return (ids, [rows[i][0] for i in ids], [json.loads(rows[i][1]) for i in ids],
+                (1.0 - scores[top]).tolist())
+
+    def get_embeddings(self, ids):
+        with self._lock:
+            self._ensure_loaded()
+            return {i: self._matrix[self._rows[i]] for i in ids if i in self._rows}
+
+    def delete_source(self, source_file):
+        with self._lock:
+            self._conn.execute("DELETE FROM vectors WHERE source_file = ?", (source_file,))
+            self._conn.commit()
+            # Rows shift; rebuild on the next query
+            self._matrix = None
+
+    def delete_ids(self, ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM vectors WHERE id = ?", [(i,) for i in ids])
+            self._conn.commit()
+            self._matrix = None
+
+    def iter_documents(self, batch_size=1000):
+        last = 0
+        while True:
+            with self._lock:
+                page = self._conn.execute(
+                    "SELECT rowid, id, document, metadata FROM vectors WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, batch_size),
+                ).fetchall()
+            if not page:
+                return
+            last = page[-1][0]
+            yield [r[1] for r in page], [r[2] for r in page], [json.loads(r[3]) for r in page]
+
+    def iter_records(self, batch_size=1000):
+        last = 0
+        while True:
+            with self._lock:
+                page = self._conn.execute(
+                    "SELECT rowid, id, embedding, document, metadata FROM vectors WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, batch_size),
+                ).fetchall()
+            if not page:
+                return
+            last = page[-1][0]
+            yield ([r[1] for r in page], [np.frombuffer(r[2], dtype=np.float32) for r in page],
+                   [r[3] for r in page], [json.loads(r[4]) for r in page])
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class MmapBackend(VectorBackend):
+    """
+    Read-only `MmapIndex` export of a collection, shared by every worker
+    through the page cache. Rebuild it with scripts/build_vector_index.py;
+    running workers switch to the new build on their next query.
+    """
+
+    name = "mmap"
+
+    def __init__(self, path: str, nprobe: int = settings.MMAP_INDEX_NPROBE):
+        self.index = MmapIndex(path, nprobe)
+
+    def initialize(self):
+        if not os.path.exists(os.path.join(self.index.path, "manifest.json")):
+            raise FileNotFoundError(f"No vector index at {self.index.path} — run scripts/build_vector_index.py")
+        self.index.open()
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        raise RuntimeError("The mmap vector index is read-only: ingest into the source backend and rebuild it")
+
+    def search(self, embedding, n_results):
+        ids, documents, metadatas, scores = self.index.query(embedding, n_results)
+        return ids, documents, metadatas, [1.0 - score for score in scores]
+
+    def get_embeddings(self, ids):
+        return self.index.embeddings(ids)
+
+    def delete_source(self, source_file):
+        raise RuntimeError("The mmap vector index is read-only: ingest into the source backend and rebuild it")
+
+    def delete_ids(self, ids):
+        raise RuntimeError("The mmap vector index is read-only: ingest into the source backend and rebuild it")
+
+    def iter_documents(self, batch_size=1000):
+        return self.index.iter_chunks(batch_size)
+
+    def count(self):
+        return self.index.count()
+
+    def close(self):
+        self.index.close()
+
+
+class PartitionedBackend(VectorBackend):
+    """
+    One backend per statute family (`app.rag.router.PARTITIONS`), each its
+    own collection named `<collection>__<family>`.
+
+    Upserts go to the partition in each chunk's `family` metadata. A query
+    names the partitions to search (from `PartitionRouter`); they are
+    searched in parallel and merged by distance. If they hold fewer than
+    `n_results` matches, or no partitions are named, every partition is
+    searched.
+    """
+
+    def __init__(self, make: Callable[[str], VectorBackend], collection: str = settings.COLLECTION_NAME):
+        self.partitions = {p: make(partition_collection(collection, p)) for p in PARTITIONS}
+        self.name = f"{next(iter(self.partitions.values())).name}/partitioned"
+        self._pool = ThreadPoolExecutor(max_workers=len(self.partitions), thread_name_prefix="partition")
+        # Partition of recently returned chunk ids, so candidate embeddings come from one place
+        self._homes: "OrderedDict[str, str]" = OrderedDict()
+        self._homes_lock = threading.Lock()
+
+    def _map(self, fn, partitions):
+        return list(self._pool.map(lambda p: (p, fn(self.partitions[p])), partitions))
+
+    def initialize(self):
+        for partition, backend in list(self.partitions.items()):
+            try:
+                backend.initialize()
+            except FileNotFoundError:
+                # Read-only exports skip families that had no laws
+                logger.warning(f"⚠️ Partition '{partition}' has no index — skipping it")
+                del self.partitions[partition]
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        groups: Dict[str, list] = {}
+        for record in zip(ids, embeddings, documents, metadatas):
+            meta = record[3] or {}
+            family = meta.get("family") or law_family(meta.get("law_name", ""), meta.get("source_file", ""))
+            groups.setdefault(family if family in self.partitions else PARTITIONS[-1], []).append(record)
+        for family, records in groups.items():
+            self.partitions[family].upsert(*(list(column) for column in zip(*records)))
+
+    def search(self, embedding, n_results, partitions: Optional[List[str]] = None):
+        chosen = [p for p in (partitions or self.partitions) if p in self.partitions]
+        results = self._map(lambda b: b.search(embedding, n_results), chosen)
+        if partitions and sum(len(r[0]) for _, r in results) < n_results:
+            # Routed partitions are too thin for this query: widen to all of them
+            metrics.PARTITION_FALLBACKS.inc()
+            rest = [p for p in self.partitions if p not in chosen]
+            results += self._map(lambda b: b.search(embedding, n_results), rest)
+            chosen += rest
+        for partition in chosen:
+            metrics.PARTITION_SEARCHES.inc(partition=partition)
+
+        merged = heapq.nsmallest(n_results, (
+            (distance, partition, i, r)
+            for partition, r in results
+            for i, distance in enumerate(r[3])
+        ), key=lambda item: item[0])
+        with self._homes_lock:
+            for _, partition, i, r in merged:
+                self._homes[r[0][i]] = partition
+                self._homes.move_to_end(r[0][i])
+            while len(self._homes) > settings.MMR_CANDIDATE_CACHE_SIZE:
+                self._homes.popitem(last=False)
+        return ([r[0][i] for _, _, i, r in merged], [r[1][i] for _, _, i, r in merged],
+                [r[2][i] for _, _, i, r in merged], [d for d, _, _, _ in merged])
+
+    def query(self, embedding, n_results, partitions=None):
+        return self.search(embedding, n_results, partitions)[:3]
+
+    def get_embeddings(self, ids):
+        with self._homes_lock:
+            homes = {i: self._homes.get(i) for i in ids}
+        found = {}
+        by_partition: Dict[str, list] = {}
+        for chunk_id, home in homes.items():
+            by_partition.setdefault(home, []).append(chunk_id)
+        for partition, group in by_partition.items():
+            if partition is not None:
+                found.update(self.partitions[partition].get_embeddings(group))
+        unknown = [i for i in ids if i not in found]
+        if unknown:
+            for _, vectors in self._map(lambda b: b.get_embeddings(unknown), list(self.partitions)):
+                found.update(vectors)
+        return found
+
+    def delete_source(self, source_file):
+        # A re-ingested law may have changed family; clear it everywhere
+        self._map(lambda b: b.delete_source(source_file), list(self.partitions))
+
+    def delete_ids(self, ids):
+        self._map(lambda b: b.delete_ids(ids), list(self.partitions))
+
+    def iter_documents(self, batch_size=1000):
+        for backend in self.partitions.values():
+            yield from backend.iter_documents(batch_size)
+
+    def iter_records(self, batch_size=1000):
+        for backend in self.partitions.values():
+            yield from backend.iter_records(batch_size)
+
+    def count(self):
+        return sum(count for _, count in self._map(lambda b: b.count(), list(self.partitions)))
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self._map(lambda b: b.count(), list(self.partitions)))
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        for backend in self.partitions.values():
+            backend.close()
+
+
+def create_backend(kind: str = settings.VECTOR_BACKEND, collection: str = settings.COLLECTION_NAME,
+                   host: str = settings.CHROMA_HOST, port: int = settings.CHROMA_PORT,
+                   persist_dir: str = settings.CHROMA_PERSIST_DIR,
+                   flat_dir: str = settings.FLAT_INDEX_DIR,
+                   mmap_dir: str = settings.MMAP_INDEX_DIR,
+                   partitioned: bool = settings.PARTITION_BY_FAMILY) -> VectorBackend:
+    """
+    Build the configured backend: `http` (Chroma server), `persistent`
+    (embedded Chroma in this process), `flat` (NumPy exact search) or
+    `mmap` (read-only quantized index shared across workers), optionally
+    split into one collection per statute family.
+    Embedded backends write local files, so run them with a single writer.
+    """
+    if kind == "http":
+        from chromadb import HttpClient
+        client = HttpClient(host=host, port=port)
+        make = lambda name: ChromaBackend(client, name, name="http")
+    elif kind == "persistent":
+        from chromadb import PersistentClient
+        client = PersistentClient(path=persist_dir)
+        make = lambda name: ChromaBackend(client, name, name="persistent")
+    elif kind == "flat":
+        make = lambda name: FlatBackend(os.path.join(flat_dir, f"{name}.sqlite3"))
+    elif kind == "mmap":
+        make = lambda name: MmapBackend(os.path.join(mmap_dir, name))
+    else:
+        raise ValueError(f"Unknown VECTOR_BACKEND '{kind}' (expected one of {', '.join(BACKENDS)})")
+    return PartitionedBackend(make, collection) if partitioned else make(collection)
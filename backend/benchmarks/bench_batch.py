@@ -0,0 +1,151 @@
+"""
+Batch query benchmark: one POST /api/query/batch against the same number of questions sent one by one.
+
+Boots the app in-process like benchmarks/loadtest.py (fake Ollama,
+ephemeral Chroma, synthetic corpus), then answers `--questions` questions
+as single /api/query calls at `--concurrency`, then as one batch
+streamed back as NDJSON (with and without source dedupe). Each run gets
+its own question set and the answer cache is cleared in between, so no
+run is served from an earlier one's answers or embeddings.
+Reports wall time, throughput, time to the first answer, Ollama embedding
+calls, and the source payload with and without batch source dedupe.
+
+    python benchmarks/bench_batch.py --questions 200 --concurrency 8
+    python benchmarks/bench_batch.py --questions 500 --distinct 100 --output batch.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks import fake_ollama
+from benchmarks.bench_ingest_memory import generate_corpus
+from benchmarks.common import environment, free_port, serve, write_report
+from benchmarks.loadtest import build_app, configure, make_questions, seed
+
+
+async def run_single(base_url: str, questions: list, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    first = None
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=600, limits=limits) as client:
+        start = time.perf_counter()
+
+        async def one(question):
+            nonlocal first
+            async with semaphore:
+                r = await client.post("/api/query", json={"question": question})
+            if first is None:
+                first = time.perf_counter() - start
+            return r
+
+        responses = await asyncio.gather(*(one(q) for q in questions))
+        wall = time.perf_counter() - start
+    ok = [r for r in responses if r.status_code == 200]
+    return {
+        "ok": len(ok),
+        "errors": len(responses) - len(ok),
+        "wall_s": round(wall, 2),
+        "throughput_qps": round(len(ok) / wall, 2),
+        "first_answer_s": round(first, 3),
+        "source_bytes": sum(len(json.dumps(r.json()["sources"])) for r in ok),
+    }
+
+
+async def run_batch(base_url: str, questions: list, dedupe: bool) -> dict:
+    counts = {"source": 0, "result": 0, "error": 0}
+    first = None
+    source_bytes = 0
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        start = time.perf_counter()
+        async with client.stream("POST", "/api/query/batch",
+                                 json={"questions": questions, "dedupe_sources": dedupe}) as r:
+            async for line in r.aiter_lines():
+                if not line:
+                    continue
+                item = json.loads(line)
+                if item["type"] == "done":
+                    done = item
+                    continue
+                counts[item["type"]] += 1
+                if item["type"] == "source":
+                    source_bytes += len(line)
+                elif item["type"] == "result":
+                    source_bytes += len(json.dumps(item.get("sources", item.get("source_ids"))))
+                    if first is None:
+                        first = time.perf_counter() - start
+        wall = time.perf_counter() - start
+    return {
+        "ok": counts["result"],
+        "errors": counts["error"],
+        "wall_s": round(wall, 2),
+        "throughput_qps": round(counts["result"] / wall, 2),
+        "first_answer_s": round(first, 3) if first is not None else None,
+        "source_lines": counts["source"],
+        "source_bytes": source_bytes,
+        "timings": done.get("timings"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=200, help="questions per run")
+    parser.add_argument("--distinct", type=int, default=200, help="distinct questions to sample from")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent single /api/query calls")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="LLM_MAX_CONCURRENCY and BATCH_CONCURRENCY")
+    parser.add_argument("--llm-queue", type=int, default=1000, help="LLM_MAX_QUEUE")
+    parser.add_argument("--corpus-mb", type=int, default=5, help="synthetic corpus seeded into the collection")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="write results as JSON here")
+    fake_ollama.add_arguments(parser)
+    parser.set_defaults(no_answer_cache=False, no_coalesce=False, no_degrade=False)
+    args = parser.parse_args()
+
+    corpus = os.path.join(tempfile.gettempdir(), f"paklex_bench_{args.corpus_mb}mb_32kb.jsonl")
+    if not os.path.exists(corpus):
+        print(f"🧪 Generating {args.corpus_mb} MB synthetic corpus at {corpus}...", flush=True)
+        generate_corpus(corpus, args.corpus_mb, "jsonl", law_kb=32)
+
+    fake = fake_ollama.app_from_args(args)
+    runs = {}
+    with tempfile.TemporaryDirectory(prefix="paklex_batch_") as workdir, \
+            serve(fake, free_port()) as ollama_url:
+        configure(args, workdir, ollama_url)
+        os.environ["BATCH_CONCURRENCY"] = str(args.llm_concurrency)
+        app = build_app()
+        with serve(app, free_port()) as base_url:
+            pipeline = app.state.pipeline
+            print(f"🌱 Seeding collection from {corpus}...", flush=True)
+            seed(pipeline, corpus, workdir)
+            modes = [("single", lambda qs: run_single(base_url, qs, args.concurrency)),
+                     ("batch", lambda qs: run_batch(base_url, qs, dedupe=True)),
+                     ("batch_no_dedupe", lambda qs: run_batch(base_url, qs, dedupe=False))]
+            for n, (name, run) in enumerate(modes):
+                if pipeline.cache:
+                    pipeline.cache.clear()
+                rng = random.Random(args.seed + n)
+                distinct = [f"{q} (run {n})" for q in make_questions(args.distinct, args.seed + n)]
+                questions = [rng.choice(distinct) for _ in range(args.questions)]
+                embed_calls = fake.state.calls["embed"]
+                print(f"⏱️  {name}: {len(questions)} questions...", flush=True)
+                result = asyncio.run(run(questions))
+                result["embed_calls"] = fake.state.calls["embed"] - embed_calls
+                runs[name] = result
+                print(f"   {result['wall_s']}s  {result['throughput_qps']} q/s  first answer "
+                      f"{result['first_answer_s']}s  embed calls={result['embed_calls']}  "
+                      f"source bytes={result['source_bytes']}  errors={result['errors']}", flush=True)
+
+    params = {k: v for k, v in vars(args).items() if k != "output"}
+    write_report({"benchmark": "query_batch", "env": environment(), "params": params, "runs": runs}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Ingestion throughput benchmark, fully offline.
+
+Runs a synthetic corpus through the same IngestPipeline as
+scripts/ingest_json.py. Embedding goes over HTTP to benchmarks/fake_ollama.py
+and storage goes to an in-process vector store plus the keyword index, and the
+run reports chunks/sec, per-stage utilization and peak memory.
+
+    python benchmarks/bench_ingest.py --size-mb 20
+    python benchmarks/bench_ingest.py --size-mb 50 --workers 4 --embed-batch-size 100 --output ingest.json
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_ollama
+from benchmarks.bench_ingest_memory import generate_corpus
+from benchmarks.common import environment, free_port, peak_rss_mb, serve, write_report
+
+
+def run(args, workdir: str) -> dict:
+    os.environ.setdefault("COLLECTION_NAME", "bench_ingest")
+    import chromadb
+    from app.ingest.manifest import IngestManifest
+    from app.ingest.pipeline import IngestPipeline
+    from app.rag.embeddings import PooledOllamaEmbeddings
+    from app.rag.keyword_index import KeywordIndex
+    from app.services.chroma_service import ChromaService
+    from app.services.ollama_service import OllamaService
+    from scripts.ingest_json import prepare_laws
+
+    from app.services.vector_store import ChromaBackend, FlatBackend
+
+    if args.store == "flat":
+        backend = FlatBackend(os.path.join(workdir, "flat.sqlite3"))
+    elif args.store == "persistent":
+        backend = ChromaBackend(chromadb.PersistentClient(path=os.path.join(workdir, "chroma")), name="persistent")
+    else:
+        backend = ChromaBackend(chromadb.EphemeralClient(), name="ephemeral")
+    keyword_index = None if args.no_keyword_index else KeywordIndex(os.path.join(workdir, "keyword.sqlite3"))
+
+    fake = fake_ollama.app_from_args(args)
+    with serve(fake, free_port()) as url:
+        ollama = OllamaService(base_url=url)
+        embeddings = PooledOllamaEmbeddings(ollama, "nomic-embed-text")
+        chroma = ChromaService(embeddings, keyword_index=keyword_index, backend=backend)
+        pipeline = IngestPipeline(
+            embeddings,
+            chroma.upsert,
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            embed_batch_size=args.embed_batch_size,
+            embed_workers=args.workers,
+            split_workers=args.split_workers,
+            store_batch_size=args.store_batch_size,
+            queue_size=args.queue_size,
+        )
+        laws = prepare_laws(args.corpus, IngestManifest(os.path.join(workdir, "manifest.jsonl")), {"skipped": 0})
+        start = time.perf_counter()
+        report = pipeline.run(laws)
+        wall = time.perf_counter() - start
+        stored = chroma.backend.count()
+
+    return {
+        "laws": report["laws_stored"],
+        "chunks": report["chunks_stored"],
+        "chunks_in_collection": stored,
+        "errors": len(report["errors"]),
+        "wall_s": round(wall, 2),
+        "chunks_per_s": round(report["chunks_stored"] / wall, 1) if wall else 0.0,
+        "laws_per_min": round(report["laws_stored"] / wall * 60, 1) if wall else 0.0,
+        "stages": report["stages"],
+        "fake_ollama_calls": dict(fake.state.calls),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    from scripts.ingest_json import (CHUNK_OVERLAP, CHUNK_SIZE, EMBED_BATCH_SIZE, EMBED_WORKERS,
+                                     QUEUE_SIZE, SPLIT_WORKERS, STORE_BATCH_SIZE)
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=20, help="synthetic corpus size")
+    parser.add_argument("--law-kb", type=int, default=64, help="approximate size of one synthetic law")
+    parser.add_argument("--corpus", default=None, help="reuse/generate the corpus at this path")
+    parser.add_argument("--store", choices=["ephemeral", "persistent", "flat"], default="ephemeral",
+                        help="in-memory Chroma, an on-disk PersistentClient, or the flat NumPy index, in a temp dir")
+    parser.add_argument("--no-keyword-index", action="store_true")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--store-batch-size", type=int, default=STORE_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS)
+    parser.add_argument("--split-workers", type=int, default=SPLIT_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--output", default=None, help="write results as JSON here")
+    fake_ollama.add_arguments(parser)
+    args = parser.parse_args()
+
+    args.corpus = args.corpus or os.path.join(tempfile.gettempdir(), f"paklex_bench_{args.size_mb}mb_{args.law_kb}kb.jsonl")
+    if not os.path.exists(args.corpus):
+        print(f"🧪 Generating {args.size_mb} MB synthetic corpus at {args.corpus}...", flush=True)
+        generate_corpus(args.corpus, args.size_mb, "jsonl", law_kb=args.law_kb)
+
+    print(f"⏱️  Ingesting {args.corpus} (store={args.store})...", flush=True)
+    with tempfile.TemporaryDirectory(prefix="paklex_bench_") as workdir:
+        result = run(args, workdir)
+
+    params = {k: v for k, v in vars(args).items() if k not in ("output",)}
+    write_report({"benchmark": "ingest", "env": environment(), "params": params, "result": result}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Peak-memory benchmark for the JSON corpus ingestion front end.
+
+Generates a synthetic multi-GB corpus of statute-like laws, then runs the
+scripts/ingest_json.py reader and ingestion pipeline with embedding and
+storage stubbed out, once with the streaming reader and once
+with the old `json.load` approach. Each mode runs in its own process so
+peak RSS is measured in isolation.
+
+    python benchmarks/bench_ingest_memory.py --size-mb 2048
+    python benchmarks/bench_ingest_memory.py --size-mb 256 --modes stream --format jsonl
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import resource
+import subprocess
+import contextlib
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SECTION = (
+    "Section {n}. {title}.— (1) Whoever commits the offence of {title} shall be punished "
+    "with imprisonment of either description for a term which may extend to {years} years, "
+    "or with fine, or with both.\n(2) Nothing in sub-section (1) applies to acts done in good "
+    "faith under the authority of Article {article} of the Constitution.\n\n"
+)
+TITLES = ["theft", "criminal breach of trust", "cheating", "mischief", "criminal trespass",
+          "defamation", "extortion", "forgery", "robbery", "kidnapping"]
+
+
+def generate_corpus(path: str, size_mb: int, fmt: str, law_kb: int = 256):
+    """Write a synthetic corpus of roughly `size_mb` MB without holding it in memory."""
+    rng = random.Random(42)
+    target = size_mb * 1024 * 1024
+    written = 0
+    i = 0
+    with open(path, "w", encoding="utf-8") as f:
+        if fmt == "json":
+            f.write("[\n")
+        while written < target:
+            parts = [f"THE SYNTHETIC LAW NO. {i} ACT, {rng.randint(1860, 2024)}\n\n"]
+            size = len(parts[0])
+            n = 1
+            while size < law_kb * 1024:
+                part = SECTION.format(n=n, title=rng.choice(TITLES), years=rng.randint(1, 14),
+                                      article=rng.randint(1, 280))
+                parts.append(part)
+                size += len(part)
+                n += 1
+            line = json.dumps({"file_name": f"synthetic_law_{i}.pdf", "text": "".join(parts)})
+            if fmt == "json":
+                line = ("," if i else "") + line + "\n"
+            else:
+                line += "\n"
+            f.write(line)
+            written += len(line)
+            i += 1
+        if fmt == "json":
+            f.write("]\n")
+    return i
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class NullEmbeddings:
+    """Stands in for Ollama so only the pipeline's own memory is measured."""
+
+    def embed_documents(self, texts):
+        return [[0.0] * 8 for _ in texts]
+
+
+def run_mode(mode: str, corpus: str, split_workers: int, queue_size: int) -> dict:
+    from app.ingest.documents import law_from_corpus_entry
+    from app.ingest.manifest import IngestManifest
+    from app.ingest.pipeline import IngestPipeline
+    from scripts.ingest_json import CHUNK_OVERLAP, CHUNK_SIZE, prepare_laws
+
+    if mode == "stream":
+        laws = prepare_laws(corpus, IngestManifest(os.devnull + ".missing"), {"skipped": 0})
+    else:
+        with open(corpus, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        laws = (law for law in (law_from_corpus_entry(i, e) for i, e in enumerate(data, 1)) if law)
+
+    pipeline = IngestPipeline(
+        NullEmbeddings(),
+        lambda ids, vectors, texts, metadatas: None,
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        split_workers=split_workers,
+        queue_size=queue_size,
+    )
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        report = pipeline.run(laws)
+    return {
+        "mode": mode,
+        "laws": report["laws_stored"],
+        "chunks": report["chunks_stored"],
+        "seconds": report["wall_s"],
+        # Parent process only; split workers hold at most `queue_size` laws
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=2048, help="synthetic corpus size")
+    parser.add_argument("--format", choices=["json", "jsonl"], default="json")
+    parser.add_argument("--corpus", default=None, help="reuse/generate the corpus at this path")
+    parser.add_argument("--modes", default="stream,load", help="comma-separated: stream, load")
+    parser.add_argument("--split-workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--output", default=None, help="write results as JSON here")
+    parser.add_argument("--run-mode", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        result = run_mode(args.run_mode, args.corpus, args.split_workers, args.queue_size)
+        print(json.dumps(result))
+        return
+
+    corpus = args.corpus or os.path.join("/tmp", f"paklex_synthetic_{args.size_mb}mb.{args.format}")
+    if not os.path.exists(corpus):
+        print(f"🧪 Generating {args.size_mb} MB synthetic corpus at {corpus}...", flush=True)
+        laws = generate_corpus(corpus, args.size_mb, args.format)
+        print(f"✅ {laws} laws written")
+    size_mb = os.path.getsize(corpus) / (1024 * 1024)
+
+    results = []
+    for mode in args.modes.split(","):
+        print(f"⏱️  Running mode '{mode}'...", flush=True)
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-mode", mode, "--corpus", corpus,
+             "--split-workers", str(args.split_workers),
+             "--queue-size", str(args.queue_size)],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            results.append({"mode": mode, "error": proc.stderr.strip().splitlines()[-1:]})
+        else:
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        print(f"   {results[-1]}")
+
+    report = {"corpus_mb": round(size_mb, 1), "results": results}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
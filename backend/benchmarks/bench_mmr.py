@@ -0,0 +1,120 @@
+"""
+Latency of MMR re-ranking as `fetch_k` grows.
+
+Compares the old path (langchain-chroma's `max_marginal_relevance_search_by_vector`,
+which pulls every candidate embedding over HTTP and runs langchain's
+Python-level MMR) with `LegalRetriever.mmr_search` (one query, cached
+candidate embeddings, NumPy MMR).
+
+Without --chroma-host only the re-ranking step is timed, on synthetic
+embeddings. With it, both full retrieval paths run against a live
+collection, using stored chunk embeddings as query vectors.
+
+    python benchmarks/bench_mmr.py
+    python benchmarks/bench_mmr.py --fetch-k 20,100,500 --chroma-host localhost --chroma-port 8001
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+from app.rag.mmr import CandidateEmbeddingCache, mmr_select
+
+
+def timed(fn, repeats: int) -> dict:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(0.95 * (len(samples) - 1))], 3),
+    }
+
+
+def bench_rerank(fetch_ks, k: int, dim: int, lambda_mult: float, repeats: int) -> list:
+    rng = np.random.default_rng(42)
+    query = rng.standard_normal(dim).astype(np.float32)
+    results = []
+    for fetch_k in fetch_ks:
+        candidates = rng.standard_normal((fetch_k, dim)).astype(np.float32)
+        as_lists = candidates.tolist()
+        old = timed(lambda: maximal_marginal_relevance(query, as_lists, lambda_mult=lambda_mult, k=k), repeats)
+        new = timed(lambda: mmr_select(query, candidates, k, lambda_mult), repeats)
+        results.append({"fetch_k": fetch_k, "langchain": old, "numpy": new})
+        print(f"   fetch_k={fetch_k:<4} langchain p50={old['p50_ms']}ms  numpy p50={new['p50_ms']}ms", flush=True)
+    return results
+
+
+def bench_chroma(args, fetch_ks) -> list:
+    import chromadb
+    from langchain_chroma import Chroma
+    from app.rag.retriever import LegalRetriever
+    from app.services.vector_store import ChromaBackend
+
+    client = chromadb.HttpClient(host=args.chroma_host, port=args.chroma_port)
+    collection = client.get_collection(args.collection)
+
+    store = SimpleNamespace(backend=ChromaBackend(client, args.collection))
+    vectorstore = Chroma(client=client, collection_name=args.collection)
+    retriever = LegalRetriever(store, embeddings=None, k=args.k, lambda_mult=args.lambda_mult)
+
+    sample = collection.get(limit=args.repeats, include=["embeddings"])["embeddings"]
+    queries = [list(map(float, v)) for v in sample]
+    if not queries:
+        raise SystemExit(f"❌ Collection '{args.collection}' is empty")
+
+    results = []
+    for fetch_k in fetch_ks:
+        it = iter(queries)
+        old = timed(lambda: vectorstore.max_marginal_relevance_search_by_vector(
+            next(it), k=args.k, fetch_k=fetch_k, lambda_mult=args.lambda_mult), len(queries))
+        it = iter(queries)
+        retriever.candidates = CandidateEmbeddingCache()
+        cold = timed(lambda: retriever.mmr_search(next(it), args.k, fetch_k), len(queries))
+        it = iter(queries)
+        warm = timed(lambda: retriever.mmr_search(next(it), args.k, fetch_k), len(queries))
+        results.append({"fetch_k": fetch_k, "langchain_chroma": old, "retriever_cold": cold, "retriever_warm": warm})
+        print(f"   fetch_k={fetch_k:<4} langchain-chroma p50={old['p50_ms']}ms  "
+              f"retriever cold p50={cold['p50_ms']}ms  warm p50={warm['p50_ms']}ms", flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fetch-k", default="20,50,100,200,500", help="comma-separated fetch_k values")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=768, help="embedding size for the synthetic run")
+    parser.add_argument("--lambda-mult", type=float, default=0.7)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--chroma-host", default=None, help="also benchmark end-to-end against this Chroma")
+    parser.add_argument("--chroma-port", type=int, default=8001)
+    parser.add_argument("--collection", default=os.getenv("COLLECTION_NAME", "pakistan_laws"))
+    parser.add_argument("--output", default=None, help="write results as JSON here")
+    args = parser.parse_args()
+
+    fetch_ks = [int(v) for v in args.fetch_k.split(",")]
+    print(f"⏱️  Re-ranking only (dim={args.dim}, k={args.k})", flush=True)
+    report = {"rerank": bench_rerank(fetch_ks, args.k, args.dim, args.lambda_mult, args.repeats)}
+    if args.chroma_host:
+        print(f"⏱️  End-to-end against {args.chroma_host}:{args.chroma_port}/{args.collection}", flush=True)
+        report["chroma"] = bench_chroma(args, fetch_ks)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
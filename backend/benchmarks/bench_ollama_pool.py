@@ -0,0 +1,168 @@
+"""
+Ollama replica pool benchmark: least-loaded routing and failover against local fake servers.
+
+Starts `--replicas` fake Ollama servers (benchmarks/fake_ollama.py) and
+drives an `OllamaService` over all of them with `--concurrency` concurrent
+"queries" (one embedding call, then a streamed generation) for
+`--duration` seconds. With `--kill-after`, one replica is shut down
+mid-run and optionally started again on the same port at
+`--revive-after`, so ejection, retries and reinstatement by the /api/tags
+health check can be observed. Reports throughput, latency percentiles,
+errors, calls served per replica, retries and ejections.
+
+    python benchmarks/bench_ollama_pool.py --replicas 1,3 --concurrency 12
+    python benchmarks/bench_ollama_pool.py --replicas 3 --kill-after 5 --revive-after 10 --duration 20
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from contextlib import ExitStack
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_ollama
+from benchmarks.common import environment, free_port, percentiles, serve, write_report
+
+MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:1b")
+EMBED_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+
+
+class Replica:
+    """A fake Ollama server that can be stopped and started again on the same port."""
+
+    def __init__(self, args):
+        self.args = args
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.calls = {"embed": 0, "generate": 0}
+        self._stack = None
+        self._app = None
+
+    def start(self):
+        self._app = fake_ollama.app_from_args(self.args)
+        self._stack = ExitStack()
+        self._stack.enter_context(serve(self._app, self.port))
+
+    def stop(self):
+        for key in self.calls:
+            self.calls[key] += self._app.state.calls[key]
+        self._stack.close()
+        self._stack = None
+
+    def totals(self) -> dict:
+        live = self._app.state.calls if self._stack is not None else {}
+        return {key: self.calls[key] + live.get(key, 0) for key in self.calls}
+
+
+async def one_query(service, question: str) -> dict:
+    start = time.perf_counter()
+    try:
+        await service.aembed(EMBED_MODEL, [question])
+        tokens = 0
+        async for _ in service.agenerate_stream(MODEL, question, {"num_predict": 64}):
+            tokens += 1
+        return {"latency": time.perf_counter() - start, "status": "ok", "tokens": tokens}
+    except Exception as e:
+        return {"latency": time.perf_counter() - start, "status": type(e).__name__}
+
+
+async def drive(args, replicas: list) -> dict:
+    from app.core import metrics
+    from app.services.ollama_service import OllamaService
+
+    service = OllamaService([r.url for r in replicas], name=f"bench{len(replicas)}",
+                            retries=args.retries, eject_seconds=args.eject_seconds)
+    await service.ensure_models([MODEL, EMBED_MODEL])
+    health = asyncio.create_task(service.run_health_checks(args.health_interval))
+    results, events = [], []
+    deadline = time.perf_counter() + args.duration
+    start = time.perf_counter()
+
+    async def worker(i: int):
+        n = 0
+        while time.perf_counter() < deadline:
+            results.append(await one_query(service, f"question {i} {n} about section {n % 400}"))
+            n += 1
+
+    async def chaos():
+        if args.kill_after is None or len(replicas) < 2:
+            return
+        await asyncio.sleep(args.kill_after)
+        await asyncio.to_thread(replicas[-1].stop)
+        events.append({"t": round(time.perf_counter() - start, 2), "event": f"stopped {replicas[-1].url}"})
+        if args.revive_after is not None:
+            await asyncio.sleep(args.revive_after - args.kill_after)
+            await asyncio.to_thread(replicas[-1].start)
+            events.append({"t": round(time.perf_counter() - start, 2), "event": f"restarted {replicas[-1].url}"})
+
+    await asyncio.gather(chaos(), *(worker(i) for i in range(args.concurrency)))
+    wall = time.perf_counter() - start
+    health.cancel()
+    stats = service.stats()
+    await service.aclose()
+
+    ok = [r for r in results if r["status"] == "ok"]
+    errors = {}
+    for r in results:
+        if r["status"] != "ok":
+            errors[r["status"]] = errors.get(r["status"], 0) + 1
+    scrape = metrics.REGISTRY.render()
+    return {
+        "replicas": len(replicas),
+        "queries": len(results),
+        "ok": len(ok),
+        "errors": errors,
+        "throughput_qps": round(len(ok) / wall, 2),
+        "latency": percentiles([r["latency"] for r in ok]),
+        "calls_per_replica": {r.url: r.totals() for r in replicas},
+        "retries": _sum_samples(scrape, "paklex_ollama_retries_total", service.name),
+        "ejections": _sum_samples(scrape, "paklex_ollama_ejections_total", service.name),
+        "final_state": stats,
+        "events": events,
+    }
+
+
+def _sum_samples(scrape: str, metric: str, pool: str) -> float:
+    return sum(float(line.rsplit(" ", 1)[1]) for line in scrape.splitlines()
+               if line.startswith(metric + "{") and f'pool="{pool}"' in line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replicas", default="1,3", help="comma-separated replica counts to compare")
+    parser.add_argument("--concurrency", type=int, default=12)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--kill-after", type=float, default=None, help="stop the last replica after N seconds")
+    parser.add_argument("--revive-after", type=float, default=None, help="start it again after N seconds")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--eject-seconds", type=float, default=3.0)
+    parser.add_argument("--health-interval", type=float, default=1.0)
+    parser.add_argument("--output", default=None, help="write results as JSON here")
+    fake_ollama.add_arguments(parser)
+    parser.set_defaults(answer_tokens=64, ttft=0.1, tokens_per_s=100.0, parallel=4)
+    args = parser.parse_args()
+
+    runs = []
+    for count in (int(n) for n in args.replicas.split(",")):
+        replicas = [Replica(args) for _ in range(count)]
+        for replica in replicas:
+            replica.start()
+        try:
+            print(f"⏱️  replicas={count} concurrency={args.concurrency} for {args.duration:g}s...", flush=True)
+            run = asyncio.run(drive(args, replicas))
+        finally:
+            for replica in replicas:
+                if replica._stack is not None:
+                    replica.stop()
+        print(f"   {run['throughput_qps']} q/s  p50={run['latency']['p50_ms']}ms p95={run['latency']['p95_ms']}ms "
+              f"errors={run['errors']} retries={run['retries']:g} ejections={run['ejections']:g}", flush=True)
+        runs.append(run)
+
+    params = {k: v for k, v in vars(args).items() if k != "output"}
+    write_report({"benchmark": "ollama_pool", "env": environment(), "params": params, "runs": runs}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+PDF extraction benchmark: serial PyPDFLoader-style parsing vs the parallel streaming extractor.
+
+Writes a synthetic gazette-style PDF (hundreds of text-dense pages), then
+times, for each worker count: time to the first chunk reaching the
+splitter, total extraction + splitting time, and a re-run served from the
+per-digest text cache. The serial baseline parses every page in one
+thread, joins the text and only then splits, as the upload path did
+before.
+
+    python benchmarks/bench_pdf.py --pages 400
+    python benchmarks/bench_pdf.py --pages 800 --workers 1,2,4 --output pdf.json
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ingest.documents import split_law, split_pages
+from app.ingest.pdf import PdfExtractor, extract_range, page_count
+from benchmarks.bench_ingest_memory import TITLES
+from benchmarks.common import environment, write_report
+
+LAW = {"source_file": "gazette.pdf", "law_name": "Synthetic Gazette", "law_number": "N/A", "year": "2024"}
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: int, lines_per_page: int = 45):
+    """A plain PDF with one Helvetica text block per page, written without a PDF library."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for p in range(pages):
+        lines = []
+        for i in range(lines_per_page):
+            section = p * lines_per_page + i
+            title = TITLES[section % len(TITLES)]
+            lines.append(f"Section {section}. {title}: whoever contravenes this provision shall be liable "
+                         f"to punishment under the {title} Act.")
+        body = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({_escape(l)}) '" for l in lines) + " ET"
+        stream = body.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{k} 0 R" for k in kids).encode(), pages)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def run_serial(path: str, chunk_size: int, chunk_overlap: int) -> dict:
+    start = time.perf_counter()
+    pages = extract_range(path, 0, page_count(path))
+    chunks = split_law({**LAW, "text": "\n\n".join(pages)}, chunk_size, chunk_overlap)
+    total = time.perf_counter() - start
+    # Nothing reaches the splitter until the whole file is parsed
+    return {"first_chunk_s": round(total, 3), "total_s": round(total, 3), "pages": len(pages), "chunks": len(chunks)}
+
+
+def run_streamed(extractor: PdfExtractor, path: str, chunk_size: int, chunk_overlap: int) -> dict:
+    start = time.perf_counter()
+    first, chunks, pages = None, 0, 0
+
+    def counted():
+        nonlocal pages
+        for page in extractor.pages(path):
+            pages += 1
+            yield page
+
+    for _ in split_pages(LAW, counted(), chunk_size, chunk_overlap):
+        chunks += 1
+        if first is None:
+            first = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return {"first_chunk_s": round(first or total, 3), "total_s": round(total, 3), "pages": pages, "chunks": chunks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated process counts")
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--pdf", default=None, help="benchmark this PDF instead of a synthetic one")
+    parser.add_argument("--output", default=None, help="write results as JSON here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="paklex_pdf_") as workdir:
+        path = args.pdf or os.path.join(workdir, "gazette.pdf")
+        if not args.pdf:
+            print(f"🧪 Writing a {args.pages}-page synthetic PDF...", flush=True)
+            write_pdf(path, args.pages)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+
+        serial = run_serial(path, args.chunk_size, args.chunk_overlap)
+        print(f"   serial      first chunk {serial['first_chunk_s']}s  total {serial['total_s']}s", flush=True)
+        results = {"serial": serial, "parallel": []}
+        for workers in [int(w) for w in args.workers.split(",")]:
+            extractor = PdfExtractor(workers, args.pages_per_task, cache_dir=os.path.join(workdir, f"cache_{workers}"))
+            # Start the pool outside the timing, as the API keeps it warm between jobs
+            extractor.pool.submit(int).result()
+            cold = run_streamed(extractor, path, args.chunk_size, args.chunk_overlap)
+            cached = run_streamed(extractor, path, args.chunk_size, args.chunk_overlap)
+            extractor.shutdown()
+            results["parallel"].append({"workers": workers, "cold": cold, "cached": cached})
+            print(f"   workers={workers:<3} first chunk {cold['first_chunk_s']}s  total {cold['total_s']}s  "
+                  f"cached total {cached['total_s']}s", flush=True)
+
+    params = {**{k: v for k, v in vars(args).items() if k != "output"}, "size_mb": round(size_mb, 2)}
+    write_report({"benchmark": "pdf_extraction", "env": environment(), "params": params, "result": results},
+                 args.output)
+
+
+if __name__ == "__main__":
+    main()
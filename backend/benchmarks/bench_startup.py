@@ -0,0 +1,123 @@
+"""
+Startup benchmark: how soon a fresh API process answers /health and /ready.
+
+For each boot mode (FAST_BOOT=true: serve at once and pull/warm models in
+the background; FAST_BOOT=false: finish all of it before serving) a real
+`uvicorn main:app` process is launched against benchmarks/fake_ollama.py
+with its models missing, so startup includes a simulated pull and model
+load. The process is polled from spawn until /health and then /ready
+answer 200. The import time of `main` is measured in a separate process.
+The vector store is a temporary flat index, so no Chroma server is needed.
+
+    python benchmarks/bench_startup.py --runs 3
+    python benchmarks/bench_startup.py --pull-latency 5 --load-latency 2 --output startup.json
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks import fake_ollama
+from benchmarks.common import environment, free_port, serve, write_report
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def backend_env(workdir: str, ollama_url: str, fast_boot: bool) -> dict:
+    return {
+        **os.environ,
+        "OLLAMA_BASE_URL": ollama_url,
+        "FAST_BOOT": str(fast_boot).lower(),
+        "STARTUP_RETRY_SECONDS": "0.5",
+        "VECTOR_BACKEND": "flat",
+        "FLAT_INDEX_DIR": os.path.join(workdir, "flat"),
+        "KEYWORD_INDEX_PATH": os.path.join(workdir, "keyword.sqlite3"),
+        "EMBED_CACHE_PATH": "",
+        "INGEST_UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "INGEST_STATE_PATH": os.path.join(workdir, "ingest.sqlite3"),
+        "COLLECTION_VERSION_PATH": os.path.join(workdir, "collection.version"),
+        "INGEST_TEXT_CACHE_DIR": os.path.join(workdir, "pdf_text"),
+    }
+
+
+def import_seconds(env: dict) -> float:
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def wait_for(client: httpx.Client, path: str, start: float, timeout: float) -> float:
+    while time.perf_counter() - start < timeout:
+        try:
+            if client.get(path).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{path} not ready after {timeout}s")
+
+
+def boot_once(args, fast_boot: bool) -> dict:
+    fake = fake_ollama.create_app(ttft=0.05, pull_latency=args.pull_latency, load_latency=args.load_latency)
+    with tempfile.TemporaryDirectory(prefix="paklex_startup_") as workdir, \
+            serve(fake, free_port()) as ollama_url:
+        env = backend_env(workdir, ollama_url, fast_boot)
+        imported = import_seconds(env)
+        port = free_port()
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+                health = wait_for(client, "/health", start, args.timeout)
+                ready = wait_for(client, "/ready", start, args.timeout)
+                steps = client.get("/ready").json()["steps"]
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+    return {
+        "import_s": round(imported, 3),
+        "health_s": round(health, 3),
+        "ready_s": round(ready, 3),
+        "steps_s": {name: state.get("seconds") for name, state in steps.items()},
+    }
+
+
+def summarize(runs: list) -> dict:
+    return {key: round(statistics.median(r[key] for r in runs), 3) for key in ("import_s", "health_s", "ready_s")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--modes", default="fast,blocking", help="comma-separated: fast, blocking")
+    parser.add_argument("--pull-latency", type=float, default=2.0, help="simulated seconds per model pull")
+    parser.add_argument("--load-latency", type=float, default=1.0, help="simulated model load on first use")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", default=None, help="write results as JSON here")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes.split(","):
+        runs = [boot_once(args, fast_boot=(mode == "fast")) for _ in range(args.runs)]
+        results[mode] = {"median": summarize(runs), "runs": runs}
+        median = results[mode]["median"]
+        print(f"   {mode:<9} import {median['import_s']}s  /health {median['health_s']}s  "
+              f"/ready {median['ready_s']}s", flush=True)
+
+    params = {k: v for k, v in vars(args).items() if k != "output"}
+    write_report({"benchmark": "startup", "env": environment(), "params": params, "result": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Memory-mapped quantized vector index: build, open, search and per-worker memory.
+
+Generates clustered synthetic embeddings (deterministic per seed), builds
+the index as float16 and int8, exact and IVF, and reports for each:
+size on disk, time to open, query p50/p95, recall@k against exact float32
+search, and the private vs shared memory of several worker processes
+querying the same index at once. Private memory is what each extra worker
+costs; shared pages live once in the page cache.
+
+    python benchmarks/bench_vector_index.py
+    python benchmarks/bench_vector_index.py --count 500000 --dim 768 --workers 4 --output index.json
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.services.vector_index import DTYPES, MmapIndex, auto_nlist, build_index
+from benchmarks.common import environment, percentiles, write_report
+
+PAGE = 5000
+
+
+def synthetic_pages(count: int, dim: int, clusters: int = 256, seed: int = 0):
+    """(ids, embeddings, documents, metadatas) pages of vectors scattered around `clusters` centres."""
+    centres = np.random.default_rng(seed).standard_normal((clusters, dim)).astype(np.float32)
+    for start in range(0, count, PAGE):
+        rng = np.random.default_rng(seed + 1 + start)
+        n = min(PAGE, count - start)
+        vectors = centres[rng.integers(clusters, size=n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+        ids = [f"doc_{start + i:08d}" for i in range(n)]
+        yield (ids, vectors, [f"chunk {start + i}" for i in range(n)],
+               [{"source_file": f"law_{(start + i) // 50}"} for i in range(n)])
+
+
+def make_queries(n: int, dim: int, count: int) -> np.ndarray:
+    # Perturbed stored vectors, like questions phrased close to a section's text
+    picks = set(np.random.default_rng(99).choice(count, n, replace=False).tolist())
+    found = [v for ids, vectors, _, _ in synthetic_pages(count, dim)
+             for i, v in zip(ids, vectors) if int(i[4:]) in picks]
+    noise = np.random.default_rng(7).standard_normal((n, dim)).astype(np.float32)
+    return np.stack(found) + 0.5 * noise
+
+
+def exact_top_k(queries: np.ndarray, count: int, dim: int, k: int) -> list:
+    """Ground truth: float32 cosine top-k, streamed so the full matrix is never held."""
+    unit_q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), k), dtype=np.int64)
+    for ids, vectors, _, _ in synthetic_pages(count, dim):
+        unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        scores = unit_q @ unit.T
+        offset = int(ids[0][4:])
+        all_scores = np.concatenate([best_scores, scores], axis=1)
+        all_ids = np.concatenate([best_ids, np.arange(offset, offset + len(ids))[None, :].repeat(len(queries), 0)], axis=1)
+        top = np.argsort(-all_scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(all_scores, top, axis=1)
+        best_ids = np.take_along_axis(all_ids, top, axis=1)
+    return [set(f"doc_{i:08d}" for i in row) for row in best_ids]
+
+
+def memory_mb() -> dict:
+    """Private vs shared resident memory of this process (Linux smaps_rollup)."""
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].isdigit():
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        return {}
+    return {
+        "rss_mb": round(fields.get("Rss", 0), 1),
+        "private_mb": round(fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0), 1),
+        "shared_mb": round(fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0), 1),
+    }
+
+
+def worker(path: str, nprobe: int, queries: np.ndarray, k: int, start_event, results):
+    before = memory_mb()
+    index = MmapIndex(path, nprobe)
+    index.open()
+    start_event.wait()
+    for q in queries:
+        index.query(q, k)
+    results.put({"before": before, "after": memory_mb()})
+
+
+def bench_workers(path: str, nprobe: int, queries: np.ndarray, k: int, workers: int) -> list:
+    ctx = multiprocessing.get_context("spawn")
+    start_event, results = ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(path, nprobe, queries, k, start_event, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    start_event.set()
+    out = [results.get(timeout=600) for _ in procs]
+    for p in procs:
+        p.join()
+    return [
+        {"private_mb_delta": round(r["after"].get("private_mb", 0) - r["before"].get("private_mb", 0), 1),
+         "shared_mb": r["after"].get("shared_mb")}
+        for r in out
+    ]
+
+
+def bench_variant(args, workdir: str, dtype: str, nlist: int, queries: np.ndarray, truth: list) -> dict:
+    path = os.path.join(workdir, f"{dtype}_{nlist}")
+    manifest = build_index(path, synthetic_pages(args.count, args.dim), args.count, dtype=dtype, nlist=nlist)
+    size_mb = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / (1024 * 1024)
+
+    start = time.perf_counter()
+    index = MmapIndex(path, args.nprobe)
+    index.open()
+    open_ms = (time.perf_counter() - start) * 1000
+
+    samples, hits = [], 0
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        ids = index.query(q, args.k)[0]
+        samples.append(time.perf_counter() - start)
+        hits += len(expected.intersection(ids))
+    index.close()
+
+    result = {
+        "dtype": dtype,
+        "search": "exact" if nlist == 0 else f"ivf nlist={nlist} nprobe={args.nprobe}",
+        "build_s": manifest["build_s"],
+        "size_mb": round(size_mb, 1),
+        "open_ms": round(open_ms, 2),
+        "query": percentiles(samples, (50, 95)),
+        f"recall@{args.k}": round(hits / (len(truth) * args.k), 4),
+    }
+    if args.workers:
+        result["workers"] = bench_workers(path, args.nprobe, queries[:args.worker_queries], args.k, args.workers)
+    print(f"   {dtype:<7} {result['search']:<26} {result['size_mb']:>8} MB  open {result['open_ms']}ms  "
+          f"p50 {result['query']['p50_ms']}ms  recall {result[f'recall@{args.k}']}", flush=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100000, help="vectors in the index")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nlist", type=int, default=-1, help="IVF lists for the IVF variants (default: auto)")
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2, help="concurrent worker processes for the memory check")
+    parser.add_argument("--worker-queries", type=int, default=50)
+    parser.add_argument("--workdir", default=None, help="build indexes here (default: a temp dir)")
+    parser.add_argument("--output", default=None, help="write results as JSON here")
+    args = parser.parse_args()
+
+    nlist = args.nlist if args.nlist >= 0 else auto_nlist(args.count) or int(4 * np.sqrt(args.count))
+    print(f"🧪 {args.count} x {args.dim} synthetic vectors, {args.queries} queries; "
+          f"float32 in-process matrix would be {args.count * args.dim * 4 / (1024 * 1024):.0f} MB per worker", flush=True)
+    queries = make_queries(args.queries, args.dim, args.count)
+    truth = exact_top_k(queries, args.count, args.dim, args.k)
+
+    with tempfile.TemporaryDirectory(prefix="paklex_index_", dir=args.workdir) as workdir:
+        results = [bench_variant(args, workdir, dtype, n, queries, truth) for dtype in DTYPES for n in (0, nlist)]
+
+    params = {k: v for k, v in vars(args).items() if k not in ("output", "workdir")}
+    write_report({"benchmark": "vector_index", "env": environment(), "params": params, "result": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Deterministic stand-in for the Ollama HTTP API.
+
+Serves /api/tags, /api/pull, /api/embed and streaming /api/generate with
+configurable latency, so the backend's real HTTP clients can be
+benchmarked without a model. Embeddings are hashed bags of words, so
+texts sharing words are close and retrieval still behaves like retrieval.
+Generation sleeps `ttft` seconds (prefill), then streams `answer_tokens`
+tokens at `tokens_per_s`, and ends with Ollama's timing fields.
+With `pull_latency` the models start missing from /api/tags and each pull
+takes that long; `load_latency` is added to the first call per model, as
+Ollama loads a model into memory on first use. With `parallel`, at most
+that many generations run at once and the rest queue, like a real server's
+OLLAMA_NUM_PARALLEL.
+
+    python benchmarks/fake_ollama.py --port 11435 --tokens-per-s 30 --ttft 0.5
+    OLLAMA_BASE_URL=http://localhost:11435 uvicorn main:app
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+WORDS = ("the section law court shall punishment offence person property act order "
+         "provided appeal government sentence imprisonment fine evidence").split()
+
+
+def embed_text(text: str, dim: int) -> list:
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in text.lower().split():
+        h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+        vector[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+def create_app(dim: int = 768, embed_latency: float = 0.005, embed_latency_per_item: float = 0.001,
+               ttft: float = 0.2, tokens_per_s: float = 50.0, answer_tokens: int = 200,
+               pull_latency: float = 0.0, load_latency: float = 0.0, parallel: int = 0) -> FastAPI:
+    app = FastAPI(title="fake-ollama")
+    app.state.calls = {"embed": 0, "embedded": 0, "generate": 0, "pull": 0}
+    names = [os.getenv("OLLAMA_MODEL", "llama3.2:1b"), os.getenv("EMBEDDING_MODEL", "nomic-embed-text")]
+    pulled = set() if pull_latency > 0 else set(names)
+    loaded = set()
+    slots = asyncio.Semaphore(parallel) if parallel > 0 else None
+
+    async def load(model: str):
+        if model not in loaded:
+            loaded.add(model)
+            await asyncio.sleep(load_latency)
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": n} for n in names if n in pulled]}
+
+    @app.post("/api/pull")
+    async def pull(request: Request):
+        body = await request.json()
+        app.state.calls["pull"] += 1
+        await asyncio.sleep(pull_latency)
+        pulled.add(body.get("name"))
+        return {"status": "success"}
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = await request.json()
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        app.state.calls["embed"] += 1
+        app.state.calls["embedded"] += len(texts)
+        await load(body.get("model"))
+        await asyncio.sleep(embed_latency + embed_latency_per_item * len(texts))
+        return {"model": body.get("model"), "embeddings": [embed_text(t, dim) for t in texts]}
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        options = body.get("options") or {}
+        n = min(answer_tokens, int(options.get("num_predict") or answer_tokens))
+        prompt_tokens = len(body.get("prompt", "")) // 4
+        app.state.calls["generate"] += 1
+        await load(body.get("model"))
+        if body.get("stream") is False:
+            await asyncio.sleep(ttft)
+            return {"response": WORDS[0], "done": True, "eval_count": 1}
+
+        async def lines():
+            if slots is not None:
+                await slots.acquire()
+            try:
+                start = time.perf_counter()
+                await asyncio.sleep(ttft)
+                prefill = time.perf_counter() - start
+                for i in range(n):
+                    await asyncio.sleep(1.0 / tokens_per_s)
+                    yield json.dumps({"response": f"{WORDS[i % len(WORDS)]} ", "done": False}) + "\n"
+                decode = time.perf_counter() - start - prefill
+            finally:
+                if slots is not None:
+                    slots.release()
+            yield json.dumps({
+                "response": "", "done": True,
+                "prompt_eval_count": prompt_tokens, "prompt_eval_duration": int(prefill * 1e9),
+                "eval_count": n, "eval_duration": int(decode * 1e9),
+            }) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--dim", type=int, default=768, help="embedding size")
+    parser.add_argument("--embed-latency", type=float, default=0.005, help="seconds per /api/embed call")
+    parser.add_argument("--embed-latency-per-item", type=float, default=0.001, help="extra seconds per text")
+    parser.add_argument("--ttft", type=float, default=0.2, help="simulated prefill seconds")
+    parser.add_argument("--tokens-per-s", type=float, default=50.0, help="simulated decode speed")
+    parser.add_argument("--answer-tokens", type=int, default=200, help="tokens per generated answer")
+    parser.add_argument("--pull-latency", type=float, default=0.0,
+                        help="seconds per /api/pull; > 0 starts with no models pulled")
+    parser.add_argument("--load-latency", type=float, default=0.0, help="extra seconds on a model's first call")
+    parser.add_argument("--parallel", type=int, default=0, help="generations served at once (0 = unlimited)")
+
+
+def app_from_args(args) -> FastAPI:
+    return create_app(args.dim, args.embed_latency, args.embed_latency_per_item,
+                      args.ttft, args.tokens_per_s, args.answer_tokens, args.pull_latency, args.load_latency, args.parallel)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=11435)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(app_from_args(args), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,215 @@
+"""
+Load test for /api/query, fully offline.
+
+Boots the real FastAPI app in-process (uvicorn on a background thread).
+Ollama is replaced by benchmarks/fake_ollama.py and Chroma by an ephemeral
+in-process client. The collection is seeded with a synthetic corpus, then
+`--requests` queries are fired at each `--concurrency` level. Reports
+latency p50/p95/p99, time-to-first-token (streaming), throughput, error
+counts, mean per-stage timings, the load stages answers were given at
+and memory as JSON, so runs on different commits can be diffed.
+
+    python benchmarks/loadtest.py --concurrency 1,8,32 --requests 200
+    python benchmarks/loadtest.py --stream --distinct 200 --no-answer-cache --output load.json
+    python benchmarks/loadtest.py --concurrency 32 --distinct 500 --no-answer-cache --no-degrade
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks import fake_ollama
+from benchmarks.bench_ingest_memory import TITLES, generate_corpus
+from benchmarks.common import (current_rss_mb, environment, free_port, peak_rss_mb, percentiles, serve,
+                               write_report)
+
+
+def configure(args, workdir: str, ollama_url: str):
+    """Settings are read at import time, so the environment must be set before `main` is imported."""
+    os.environ.update({
+        "OLLAMA_BASE_URL": ollama_url,
+        "COLLECTION_NAME": "bench_queries",
+        "KEYWORD_INDEX_PATH": os.path.join(workdir, "keyword.sqlite3"),
+        "EMBED_CACHE_PATH": "",
+        "INGEST_UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "INGEST_STATE_PATH": os.path.join(workdir, "ingest.sqlite3"),
+        "COLLECTION_VERSION_PATH": os.path.join(workdir, "collection.version"),
+        "ANSWER_CACHE_ENABLED": str(not args.no_answer_cache).lower(),
+        "COALESCE_ENABLED": str(not args.no_coalesce).lower(),
+        "DEGRADE_ENABLED": str(not args.no_degrade).lower(),
+        "LLM_MAX_CONCURRENCY": str(args.llm_concurrency),
+        "LLM_MAX_QUEUE": str(args.llm_queue),
+    })
+
+
+def build_app():
+    import chromadb
+    import main
+    from app.rag.pipeline import RAGPipeline
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Same pipeline as production, with an in-process Chroma instead of the HTTP server
+        pipeline = RAGPipeline(chroma_client=chromadb.EphemeralClient())
+        await pipeline.startup()
+        app.state.pipeline = pipeline
+        yield
+        await pipeline.aclose()
+
+    main.app.router.lifespan_context = lifespan
+    return main.app
+
+
+def seed(pipeline, corpus: str, workdir: str) -> int:
+    from app.ingest.manifest import IngestManifest
+    from app.ingest.pipeline import IngestPipeline
+    from scripts.ingest_json import CHUNK_OVERLAP, CHUNK_SIZE, prepare_laws
+
+    ingest = IngestPipeline(pipeline.embeddings, pipeline.chroma.upsert,
+                            chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, split_workers=0)
+    report = ingest.run(prepare_laws(corpus, IngestManifest(os.path.join(workdir, "manifest.jsonl")), {"skipped": 0}))
+    return report["chunks_stored"]
+
+
+def make_questions(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    templates = [
+        "What is the punishment for {t} under section {s}?",
+        "My neighbour committed {t} against me last week. Which laws apply and what can I do?",
+        "Is {t} a bailable offence, and what does section {s} say about it?",
+        "A shopkeeper was accused of {t}. What defences exist under Pakistani law?",
+    ]
+    return [rng.choice(templates).format(t=rng.choice(TITLES), s=rng.randint(1, 400)) for _ in range(n)]
+
+
+async def one_request(client: httpx.AsyncClient, question: str, stream: bool) -> dict:
+    start = time.perf_counter()
+    ttft = None
+    timings = None
+    load_stage = None
+    try:
+        if stream:
+            async with client.stream("POST", "/api/query", json={"question": question, "stream": True}) as r:
+                status = r.status_code
+                event = None
+                async for line in r.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[7:]
+                        if event == "token" and ttft is None:
+                            ttft = time.perf_counter() - start
+                        if event == "error":
+                            status = "sse_error"
+                    elif line.startswith("data: ") and event == "done":
+                        done = json.loads(line[6:])
+                        timings, load_stage = done.get("timings"), done.get("load_stage")
+        else:
+            r = await client.post("/api/query", json={"question": question})
+            status = r.status_code
+            if status == 200:
+                timings, load_stage = r.json().get("timings"), r.json().get("load_stage")
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    return {"latency": time.perf_counter() - start, "ttft": ttft, "status": status, "timings": timings,
+            "load_stage": load_stage}
+
+
+async def run_level(base_url: str, questions: list, concurrency: int, requests: int, stream: bool,
+                    rng: random.Random) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    picks = [rng.choice(questions) for _ in range(requests)]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=600, limits=limits) as client:
+        async def bounded(question):
+            async with semaphore:
+                return await one_request(client, question, stream)
+
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded(q) for q in picks))
+        wall = time.perf_counter() - start
+        cache_stats = (await client.get("/api/cache/stats")).json()
+
+    ok = [r for r in results if r["status"] == 200]
+    stage_totals, stage_counts = defaultdict(float), Counter()
+    for r in ok:
+        for name, value in (r["timings"] or {}).items():
+            stage_totals[name] += value
+            stage_counts[name] += 1
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": len(ok),
+        "errors": dict(Counter(str(r["status"]) for r in results if r["status"] != 200)),
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(len(ok) / wall, 2) if wall else 0.0,
+        "latency": percentiles([r["latency"] for r in ok]),
+        "ttft": percentiles([r["ttft"] for r in ok if r["ttft"] is not None]) if stream else None,
+        "mean_stage_ms": {k: round(stage_totals[k] / stage_counts[k], 2) for k in stage_totals},
+        "load_stages": dict(Counter(r["load_stage"] for r in ok if r["load_stage"])),
+        "rss_mb": {"before": rss_before, "after": current_rss_mb(), "peak": peak_rss_mb()},
+        "cache": {k: cache_stats.get(k) for k in ("answers", "coalescing")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="requests per concurrency level")
+    parser.add_argument("--distinct", type=int, default=50, help="distinct questions to sample from")
+    parser.add_argument("--stream", action="store_true", help="use SSE streaming and measure time-to-first-token")
+    parser.add_argument("--no-answer-cache", action="store_true")
+    parser.add_argument("--no-coalesce", action="store_true")
+    parser.add_argument("--no-degrade", action="store_true", help="always answer at the normal load stage")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="LLM_MAX_CONCURRENCY")
+    parser.add_argument("--llm-queue", type=int, default=1000, help="LLM_MAX_QUEUE")
+    parser.add_argument("--corpus-mb", type=int, default=5, help="synthetic corpus seeded into the collection")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="write results as JSON here")
+    fake_ollama.add_arguments(parser)
+    args = parser.parse_args()
+
+    corpus = os.path.join(tempfile.gettempdir(), f"paklex_bench_{args.corpus_mb}mb_32kb.jsonl")
+    if not os.path.exists(corpus):
+        print(f"🧪 Generating {args.corpus_mb} MB synthetic corpus at {corpus}...", flush=True)
+        generate_corpus(corpus, args.corpus_mb, "jsonl", law_kb=32)
+
+    with tempfile.TemporaryDirectory(prefix="paklex_load_") as workdir, \
+            serve(fake_ollama.app_from_args(args), free_port()) as ollama_url:
+        configure(args, workdir, ollama_url)
+        app = build_app()
+        with serve(app, free_port()) as base_url:
+            pipeline = app.state.pipeline
+            print(f"🌱 Seeding collection from {corpus}...", flush=True)
+            chunks = seed(pipeline, corpus, workdir)
+            print(f"✅ {chunks} chunks stored", flush=True)
+
+            rng = random.Random(args.seed)
+            questions = make_questions(args.distinct, args.seed)
+            levels = []
+            for concurrency in (int(c) for c in args.concurrency.split(",")):
+                if pipeline.cache:
+                    pipeline.cache.clear()
+                print(f"⏱️  concurrency={concurrency} requests={args.requests}...", flush=True)
+                level = asyncio.run(run_level(base_url, questions, concurrency, args.requests, args.stream, rng))
+                print(f"   p50={level['latency']['p50_ms']}ms p95={level['latency']['p95_ms']}ms "
+                      f"p99={level['latency']['p99_ms']}ms {level['throughput_rps']} req/s "
+                      f"errors={level['errors']} stages={level['load_stages']}", flush=True)
+                levels.append(level)
+
+    params = {k: v for k, v in vars(args).items() if k != "output"}
+    write_report({"benchmark": "query_load", "env": environment(), "params": params,
+                  "seeded_chunks": chunks, "levels": levels}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,30 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from loguru import logger
+import time
 
-from app.api.routes import query, ingest
+from app.api.routes import query, ingest, laws, metrics
 from app.core.config import settings
-from app.services.chroma_service import ChromaService
-from app.services.ollama_service import OllamaService
+from app.core.metrics import REQUEST_SECONDS
+from app.rag.pipeline import RAGPipeline
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("🚀 PakLex AI Backend starting up...")
-    # Initialize ChromaDB collection
-    chroma = ChromaService()
-    await chroma.initialize()
-    logger.info("✅ ChromaDB collection ready")
-    # Ping Ollama
-    ollama = OllamaService()
-    await ollama.health_check()
-    logger.info("✅ Ollama model ready")
+    # Build the shared pipeline once: pooled Ollama/Chroma clients, LLM, chain
+    pipeline = RAGPipeline()
+    app.state.pipeline = pipeline
+    if settings.FAST_BOOT:
+        # Serve /health now; GET /ready turns 200 once models are pulled and warm
+        pipeline.start_background()
+    else:
+        await pipeline.startup()
     yield
     logger.info("🛑 Shutting down PakLex AI Backend")
+    await pipeline.aclose()
 
 
 app = FastAPI(
@@ -39,10 +42,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def observe_request_latency(request: Request, call_next):
+    # For SSE this measures time to response headers; stream timings are in the `done` event
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        route=getattr(route, "path", "unmatched"),
+        method=request.method,
+        status=response.status_code,
+    )
+    return response
+
+
 app.include_router(query.router, prefix="/api", tags=["Query"])
 app.include_router(ingest.router, prefix="/api", tags=["Ingest"])
+app.include_router(laws.router, prefix="/api", tags=["Laws"])
+app.include_router(metrics.router, tags=["Metrics"])
 
 
 @app.get("/health")
 async def health():
     return {"status": "healthy", "service": "PakLex AI Backend"}
+
+
+@app.get("/ready")
+async def ready(request: Request):
+    """Readiness probe: 503 until the vector store is open and the models are pulled and warmed up."""
+    pipeline = request.app.state.pipeline
+    report = {**pipeline.readiness.report(), "ollama": pipeline.ollama_stats()}
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+from app.rag.keyword_index import KeywordIndex
+from app.services.vector_store import BACKENDS, create_backend
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHROMA_HOST   = os.getenv("CHROMA_HOST", "localhost")
+CHROMA_PORT   = int(os.getenv("CHROMA_PORT", "8001"))
+COLLECTION    = os.getenv("COLLECTION_NAME", "pakistan_laws")
+BACKEND       = os.getenv("VECTOR_BACKEND", "http")
+PERSIST_DIR   = os.getenv("CHROMA_PERSIST_DIR", os.path.join(BASE_DIR, "data", "chroma"))
+FLAT_DIR      = os.getenv("FLAT_INDEX_DIR", os.path.join(BASE_DIR, "data", "index", "flat"))
+PARTITIONED   = os.getenv("PARTITION_BY_FAMILY", "false").lower() in ("1", "true", "yes")
+MMAP_DIR      = os.getenv("MMAP_INDEX_DIR", os.path.join(BASE_DIR, "data", "index", "mmap"))
+KEYWORD_INDEX = os.getenv("KEYWORD_INDEX_PATH", os.path.join(BASE_DIR, "data", "index", "keyword.sqlite3"))
+
+
+def build_keyword_index(args):
+    """Backfill the BM25 keyword index from chunks already in the vector store."""
+    backend = create_backend(args.backend, args.collection, args.chroma_host, args.chroma_port,
+                             args.persist_dir, args.flat_dir, args.mmap_dir, args.partitioned)
+    index = KeywordIndex(args.output)
+
+    total = backend.count()
+    print(f"📋 Indexing {total} chunks from '{args.collection}' ({backend.name}) into {args.output}")
+    start = time.time()
+    done = 0
+    for ids, documents, metadatas in backend.iter_documents(args.page_size):
+        index.upsert(ids, documents, metadatas)
+        done += len(ids)
+        print(f"  {done}/{total}", end="\r", flush=True)
+    backend.close()
+    print(f"\n✅ Keyword index has {index.count()} chunks ({time.time() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the BM25 keyword index from the vector store collection.")
+    parser.add_argument("--collection", default=COLLECTION)
+    parser.add_argument("--backend", choices=BACKENDS, default=BACKEND)
+    parser.add_argument("--chroma-host", default=CHROMA_HOST)
+    parser.add_argument("--chroma-port", type=int, default=CHROMA_PORT)
+    parser.add_argument("--persist-dir", default=PERSIST_DIR)
+    parser.add_argument("--flat-dir", default=FLAT_DIR)
+    parser.add_argument("--mmap-dir", default=MMAP_DIR)
+    parser.add_argument("--partitioned", action="store_true", default=PARTITIONED)
+    parser.add_argument("--output", default=KEYWORD_INDEX)
+    parser.add_argument("--page-size", type=int, default=1000)
+    build_keyword_index(parser.parse_args())
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+from app.rag.router import partition_collection
+from app.services.vector_index import DTYPES, auto_nlist, build_index
+from app.services.vector_store import WRITABLE_BACKENDS, PartitionedBackend, create_backend
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHROMA_HOST   = os.getenv("CHROMA_HOST", "localhost")
+CHROMA_PORT   = int(os.getenv("CHROMA_PORT", "8001"))
+COLLECTION    = os.getenv("COLLECTION_NAME", "pakistan_laws")
+PERSIST_DIR   = os.getenv("CHROMA_PERSIST_DIR", os.path.join(BASE_DIR, "data", "chroma"))
+FLAT_DIR      = os.getenv("FLAT_INDEX_DIR", os.path.join(BASE_DIR, "data", "index", "flat"))
+PARTITIONED   = os.getenv("PARTITION_BY_FAMILY", "false").lower() in ("1", "true", "yes")
+MMAP_DIR      = os.getenv("MMAP_INDEX_DIR", os.path.join(BASE_DIR, "data", "index", "mmap"))
+
+
+def export(source, output: str, args):
+    total = source.count()
+    if total == 0:
+        print(f"⏩ {os.path.basename(output)} is empty — skipped")
+        return
+    nlist = auto_nlist(total) if args.nlist < 0 else args.nlist
+    print(f"📋 Exporting {total} chunks into {output} "
+          f"({args.dtype}, {'exact' if nlist == 0 else f'IVF nlist={nlist}'})")
+    start = time.time()
+
+    def pages():
+        done = 0
+        for page in source.iter_records(args.page_size):
+            yield page
+            done += len(page[0])
+            print(f"  {done}/{total}", end="\r", flush=True)
+
+    manifest = build_index(output, pages(), total, dtype=args.dtype, nlist=nlist)
+    size_mb = sum(os.path.getsize(os.path.join(output, f)) for f in os.listdir(output)) / (1024 * 1024)
+    print(f"\n✅ {manifest['count']} x {manifest['dim']} vectors, {size_mb:.1f} MB on disk ({time.time() - start:.1f}s)")
+
+
+def build_vector_index(args):
+    """Export every chunk of the source collection into a memory-mapped quantized index."""
+    source = create_backend(args.source, args.collection, args.chroma_host, args.chroma_port,
+                            args.persist_dir, args.flat_dir, partitioned=args.partitioned)
+    os.makedirs(args.mmap_dir, exist_ok=True)
+    print(f"🔌 Source: '{args.collection}' ({source.name})")
+    if isinstance(source, PartitionedBackend):
+        # One index per statute family, named like the source collections
+        for family, partition in source.partitions.items():
+            export(partition, os.path.join(args.mmap_dir, partition_collection(args.collection, family)), args)
+    else:
+        export(source, os.path.join(args.mmap_dir, args.collection), args)
+    source.close()
+    print(f"   Serve it with VECTOR_BACKEND=mmap MMAP_INDEX_DIR={args.mmap_dir}"
+          + (" PARTITION_BY_FAMILY=true" if args.partitioned else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the read-only memory-mapped vector index (VECTOR_BACKEND=mmap) from a collection.")
+    parser.add_argument("--collection", default=COLLECTION)
+    parser.add_argument("--source", choices=WRITABLE_BACKENDS,
+                        default=os.getenv("VECTOR_SOURCE_BACKEND", "http"),
+                        help="backend holding the ingested collection")
+    parser.add_argument("--chroma-host", default=CHROMA_HOST)
+    parser.add_argument("--chroma-port", type=int, default=CHROMA_PORT)
+    parser.add_argument("--persist-dir", default=PERSIST_DIR)
+    parser.add_argument("--flat-dir", default=FLAT_DIR)
+    parser.add_argument("--mmap-dir", default=MMAP_DIR)
+    parser.add_argument("--partitioned", action="store_true", default=PARTITIONED,
+                        help="export each statute-family partition to its own index")
+    parser.add_argument("--dtype", choices=DTYPES, default="float16",
+                        help="float16: half the size of float32; int8: a quarter, per-row scaled")
+    parser.add_argument("--nlist", type=int, default=-1,
+                        help="IVF lists (0 = exact search; default: exact below 10k chunks)")
+    parser.add_argument("--page-size", type=int, default=1000)
+    build_vector_index(parser.parse_args())
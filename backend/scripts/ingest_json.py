@@ -1,211 +1,205 @@
 import os
 import sys
-import json
-import re
 import time
+import argparse
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import chromadb
-from chromadb.config import Settings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.schema import Document
 from langchain_ollama import OllamaEmbeddings
-from langchain_chroma import Chroma
 from dotenv import load_dotenv
 
+from app.ingest.documents import law_from_corpus_entry
+from app.ingest.ids import law_digest
+from app.ingest.manifest import IngestManifest
+from app.ingest.pipeline import IngestPipeline
+from app.ingest.reader import iter_corpus
+from app.rag.cache import CollectionVersion
+from app.rag.embeddings import CachedEmbeddings, EmbeddingStore
+from app.rag.keyword_index import KeywordIndex
+from app.services.vector_store import WRITABLE_BACKENDS, create_backend
+
 load_dotenv()
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 # ── Config ────────────────────────────────────────────────────────
 CHROMA_HOST   = os.getenv("CHROMA_HOST", "localhost")
 CHROMA_PORT   = int(os.getenv("CHROMA_PORT", "8001"))
 COLLECTION    = os.getenv("COLLECTION_NAME", "pakistan_laws")
+BACKEND       = os.getenv("VECTOR_BACKEND", "http")
+PERSIST_DIR   = os.getenv("CHROMA_PERSIST_DIR", os.path.join(BASE_DIR, "data", "chroma"))
+FLAT_DIR      = os.getenv("FLAT_INDEX_DIR", os.path.join(BASE_DIR, "data", "index", "flat"))
+PARTITIONED   = os.getenv("PARTITION_BY_FAMILY", "false").lower() in ("1", "true", "yes")
 EMBED_MODEL   = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+EMBED_CACHE   = os.getenv("EMBED_CACHE_PATH", os.path.join(BASE_DIR, "data", "cache", "embeddings.sqlite3"))
+EMBED_CACHE_MAX_ROWS = int(os.getenv("EMBED_CACHE_MAX_ROWS", "100000"))
+MANIFEST_DIR  = os.path.join(BASE_DIR, "data", "cache")
+KEYWORD_INDEX = os.getenv("KEYWORD_INDEX_PATH", os.path.join(BASE_DIR, "data", "index", "keyword.sqlite3"))
+COLLECTION_VERSION = os.getenv("COLLECTION_VERSION_PATH", os.path.join(BASE_DIR, "data", "collection.version"))
 
-# ── PERFORMANCE SETTINGS ──────────────────────────────────────────
+# ── PERFORMANCE SETTINGS (defaults, overridable from the CLI) ─────
 CHUNK_SIZE        = 1500   # bigger chunks = fewer HTTP calls to Ollama
 CHUNK_OVERLAP     = 150    # reduced overlap
 EMBED_BATCH_SIZE  = 50     # embed 50 chunks per Ollama call (huge speedup)
 STORE_BATCH_SIZE  = 200    # store 200 docs to ChromaDB at once
-LAWS_PER_COMMIT   = 10     # commit every 10 laws
-
-# ── Helpers ───────────────────────────────────────────────────────
-def clean_law_name(filename: str) -> str:
-    name = re.sub(r'^[a-z0-9]{10,}', '', filename)
-    name = name.replace(".pdf.txt", "").replace(".pdf", "").replace(".txt", "")
-    name = name.replace("_", " ").replace("-", " ").strip()
-    return name.title() if name else filename
-
-def extract_year(text: str) -> str:
-    match = re.search(r'(18|19|20)\d{2}', text[:500])
-    return match.group(0) if match else "N/A"
-
-def extract_section(text: str) -> str:
-    match = re.search(r'(Section|SECTION|Article|ARTICLE|Clause)\s+(\d+[A-Z]?)', text)
-    return match.group(2) if match else "General"
-
-def extract_title(text: str) -> str:
-    lines = [l.strip() for l in text[:1000].split('\n') if len(l.strip()) > 10]
-    for line in lines:
-        if any(word in line.upper() for word in ['ACT', 'ORDINANCE', 'CODE', 'ORDER', 'RULES']):
-            return line.strip()[:80]
-    return lines[0][:80] if lines else "Unknown Law"
-
-def batch_embed_and_store(vectorstore, documents: list, embeddings_model):
-    """
-    Core speedup: embed ALL chunks in one batch call instead of one-by-one.
-    nomic-embed-text supports batch embedding natively.
-    """
-    if not documents:
-        return
+EMBED_WORKERS     = 2      # embedding requests in flight at once
+SPLIT_WORKERS     = max(1, min(4, (os.cpu_count() or 2) - 1))  # splitter processes
+QUEUE_SIZE        = 8      # laws / batches buffered between stages
 
-    texts = [doc.page_content for doc in documents]
-    metadatas = [doc.metadata for doc in documents]
+# ── Corpus → law records ──────────────────────────────────────────
+def prepare_laws(json_path: str, manifest, stats: dict):
+    """
+    Stream laws from the corpus, dropping empty and unchanged ones.
 
-    # Single batch call to Ollama — this is the key optimization
-    vectors = embeddings_model.embed_documents(texts)
+    Only the cheap checks (digest, title/year) run here; splitting and
+    per-chunk metadata extraction happen in the pipeline's process pool.
+    """
+    for i, entry in enumerate(iter_corpus(json_path), 1):
+        law = law_from_corpus_entry(i, entry)
+        if law is None:
+            print(f"[{i}] ⚠️  Empty, skipping")
+            continue
 
-    # Store directly into ChromaDB with pre-computed vectors
-    collection = vectorstore._collection
-    ids = [f"doc_{hash(t) % 10**12}_{i}" for i, t in enumerate(texts)]
+        law["digest"] = law_digest(law["text"])
+        if manifest.is_current(law["source_file"], law["digest"]):
+            stats["skipped"] += 1
+            continue
+        yield law
 
-    # Store in chunks to avoid memory issues
-    for start in range(0, len(texts), STORE_BATCH_SIZE):
-        end = min(start + STORE_BATCH_SIZE, len(texts))
-        collection.add(
-            ids=ids[start:end],
-            embeddings=vectors[start:end],
-            documents=texts[start:end],
-            metadatas=metadatas[start:end],
-        )
+def print_report(report: dict):
+    print(f"\n  {'stage':<7} {'items':>9} {'busy s':>9} {'rate/worker':>12} {'util':>6} {'stalled s':>10}")
+    for stage in report["stages"]:
+        print(f"  {stage['stage']:<7} {stage['items']:>9} {stage['busy_s']:>9} "
+              f"{stage['per_worker_rate']:>8} {stage['unit'][:3]}/s {stage['utilization']:>6.0%} {stage['stalled_s']:>10}")
+    bottleneck = max(report["stages"], key=lambda s: s["utilization"])
+    print(f"  ➜ bottleneck: {bottleneck['stage']} ({bottleneck['utilization']:.0%} busy)")
 
 # ── Main ──────────────────────────────────────────────────────────
-def ingest_json(json_path: str, start_from: int = 0):
-    print(f"📂 Loading JSON: {json_path}")
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    total = len(data)
-    print(f"📋 Total laws: {total}")
-    if start_from > 0:
-        print(f"⏩ Resuming from law #{start_from + 1}")
+def ingest_json(json_path: str, args):
+    print(f"📂 Streaming corpus: {json_path}")
+    manifest = IngestManifest(args.manifest)
+    if args.reset:
+        manifest.reset()
+    if len(manifest):
+        print(f"⏩ Manifest has {len(manifest)} laws already stored — unchanged ones are skipped")
     print()
 
     # Setup — create once, reuse always
-    print("🔌 Connecting to ChromaDB and Ollama...")
-    embeddings = OllamaEmbeddings(model=EMBED_MODEL)
-    client = chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
-    vectorstore = Chroma(
-        client=client,
-        collection_name=COLLECTION,
-        embedding_function=embeddings,
-    )
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        separators=["\n\n", "\n", "Section", "Article", ". ", " "],
+    print(f"🔌 Connecting to the vector store ({args.backend}) and Ollama...")
+    # Previously embedded chunks (re-runs, re-ingested laws) skip Ollama entirely
+    embeddings = CachedEmbeddings(
+        OllamaEmbeddings(model=EMBED_MODEL),
+        EMBED_MODEL,
+        store=EmbeddingStore(EMBED_CACHE, max_rows=EMBED_CACHE_MAX_ROWS) if EMBED_CACHE else None,
     )
+    backend = create_backend(args.backend, args.collection, args.chroma_host, args.chroma_port,
+                             args.persist_dir, args.flat_dir, partitioned=args.partitioned)
+    backend.initialize()
+    # BM25 index used by hybrid retrieval, kept in step with every write
+    keyword_index = KeywordIndex(KEYWORD_INDEX) if KEYWORD_INDEX else None
     print("✅ Connected!\n")
 
-    total_chunks = 0
-    total_docs   = 0
-    errors       = []
-    start_time   = time.time()
-
-    # Accumulate documents across laws before embedding (mega-batch)
-    pending_documents = []
-
-    for i, entry in enumerate(data[start_from:], start_from + 1):
-        filename = entry.get("file_name", f"unknown_{i}")
-        text     = entry.get("text", "").strip()
-
-        if not text:
-            print(f"[{i}/{total}] ⚠️  Empty, skipping")
-            continue
-
-        law_name     = extract_title(text)
-        year         = extract_year(text)
-        clean_name   = clean_law_name(filename)
-        display_name = law_name if len(clean_name) < 5 else clean_name
-
-        print(f"[{i}/{total}] {display_name[:55]}...", end=" ", flush=True)
-
-        try:
-            chunks = splitter.split_text(text)
-
-            for j, chunk in enumerate(chunks):
-                pending_documents.append(Document(
-                    page_content=chunk,
-                    metadata={
-                        "law_name"   : display_name,
-                        "law_number" : f"Source: {filename[:30]}",
-                        "section"    : extract_section(chunk),
-                        "year"       : year,
-                        "chunk_index": j,
-                        "source_file": filename,
-                    }
-                ))
-
-            total_docs += 1
-            print(f"({len(chunks)} chunks)", flush=True)
-
-            # Flush to ChromaDB every LAWS_PER_COMMIT laws
-            if total_docs % LAWS_PER_COMMIT == 0 or i == total:
-                chunk_count = len(pending_documents)
-                print(f"\n  💾 Embedding & storing {chunk_count} chunks...", end=" ", flush=True)
-                t = time.time()
-                batch_embed_and_store(vectorstore, pending_documents, embeddings)
-                elapsed = time.time() - t
-                total_chunks += chunk_count
-                pending_documents = []
-
-                # Speed stats
-                laws_done = total_docs
-                elapsed_total = time.time() - start_time
-                rate = laws_done / elapsed_total * 60
-                remaining = (total - start_from - laws_done) / (rate / 60) / 60 if rate > 0 else 0
-                print(f"done in {elapsed:.1f}s | {rate:.1f} laws/min | ~{remaining:.1f}h left\n")
-
-        except Exception as e:
-            errors.append(filename)
-            print(f"\n  ❌ {str(e)[:100]}")
-            # Still flush pending to not lose progress
-            if len(pending_documents) >= EMBED_BATCH_SIZE * 5:
-                try:
-                    batch_embed_and_store(vectorstore, pending_documents, embeddings)
-                    total_chunks += len(pending_documents)
-                    pending_documents = []
-                except:
-                    pass
-            continue
-
-    # Final flush
-    if pending_documents:
-        print(f"\n  💾 Final flush: {len(pending_documents)} chunks...")
-        batch_embed_and_store(vectorstore, pending_documents, embeddings)
-        total_chunks += len(pending_documents)
+    def store(ids, vectors, texts, metadatas):
+        backend.upsert(ids, vectors, texts, metadatas)
+        if keyword_index:
+            keyword_index.upsert(ids, texts, metadatas)
+
+    def on_law_started(law):
+        # Law text changed since the last run: drop its old chunks first
+        if manifest.digest_of(law["source_file"]) not in (None, law["digest"]):
+            backend.delete_source(law["source_file"])
+            if keyword_index:
+                keyword_index.delete_source(law["source_file"])
+
+    def on_law_stored(law):
+        manifest.record(law["source_file"], law["digest"], law["chunks"])
+
+    start_time = time.time()
+
+    def on_progress(totals):
+        law = totals["law"]
+        elapsed = time.time() - start_time
+        print(f"[{totals['laws_stored']}] {law['law_name'][:55]} ({law['chunks']} chunks) | "
+              f"{totals['laws_stored'] / elapsed * 60:.1f} laws/min | "
+              f"{totals['chunks_stored'] / elapsed:.1f} chunks/s", flush=True)
+
+    pipeline = IngestPipeline(
+        embeddings,
+        store,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        embed_batch_size=args.embed_batch_size,
+        embed_workers=args.workers,
+        split_workers=args.split_workers,
+        store_batch_size=args.store_batch_size,
+        queue_size=args.queue_size,
+        on_law_started=on_law_started,
+        on_law_stored=on_law_stored,
+        on_progress=on_progress,
+    )
+    stats = {"skipped": 0}
+    report = pipeline.run(prepare_laws(json_path, manifest, stats))
+    if report["chunks_stored"]:
+        # Running API workers stop serving answers cached before these laws
+        CollectionVersion(COLLECTION_VERSION).bump()
 
     elapsed_total = time.time() - start_time
     print(f"\n{'='*55}")
     print(f"🎉 Ingestion Complete!")
-    print(f"   Laws ingested  : {total_docs}/{total - start_from}")
-    print(f"   Total chunks   : {total_chunks}")
-    print(f"   Total time     : {elapsed_total/60:.1f} minutes")
-    print(f"   Errors         : {len(errors)}")
+    print(f"   Laws ingested  : {report['laws_stored']}/{report['laws']}")
+    print(f"   Laws unchanged : {stats['skipped']}")
+    print(f"   Total chunks   : {report['chunks_stored']}")
+    print(f"   Total time     : {elapsed_total/60:.1f} minutes ({report['chunks_per_s']} chunks/s)")
+    print(f"   Errors         : {len(report['errors'])}")
+    print(f"   Embed cache    : {embeddings.hits} hits / {embeddings.misses} misses")
+    print(f"   Vector store   : {backend.count()} chunks ({backend.name})")
+    print_report(report)
     print(f"{'='*55}")
+    backend.close()
     print(f"\n✅ Test at: http://localhost:8000/api/collection/stats")
 
 
-if __name__ == "__main__":
-    json_path  = "D:/projects/paklex-ai/backend/data/raw/pdf_data.json"
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Bulk-ingest a JSON corpus of Pakistan laws into ChromaDB, streaming one law at a time.")
+    parser.add_argument("json_path",
+                        help="JSON array or JSON Lines (.jsonl) of {file_name, text} entries")
+    parser.add_argument("--collection", default=COLLECTION)
+    parser.add_argument("--backend", choices=WRITABLE_BACKENDS, default=BACKEND,
+                        help="http: Chroma server, persistent: embedded Chroma, flat: NumPy index")
+    parser.add_argument("--chroma-host", default=CHROMA_HOST)
+    parser.add_argument("--chroma-port", type=int, default=CHROMA_PORT)
+    parser.add_argument("--persist-dir", default=PERSIST_DIR, help="embedded Chroma directory (--backend persistent)")
+    parser.add_argument("--flat-dir", default=FLAT_DIR, help="flat index directory (--backend flat)")
+    parser.add_argument("--partitioned", action="store_true", default=PARTITIONED,
+                        help="one collection per statute family (PARTITION_BY_FAMILY)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--store-batch-size", type=int, default=STORE_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS,
+                        help="concurrent embedding requests to Ollama")
+    parser.add_argument("--split-workers", type=int, default=SPLIT_WORKERS,
+                        help="processes splitting laws and extracting metadata")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE,
+                        help="bound on laws/batches buffered between stages")
+    parser.add_argument("--manifest", default=None,
+                        help="checkpoint file (default: data/cache/ingest_manifest_<collection>[_partitioned].jsonl)")
+    parser.add_argument("--reset", action="store_true",
+                        help="ignore the checkpoint and re-ingest every law")
+    args = parser.parse_args(argv)
+    if args.manifest is None:
+        # Each layout has its own checkpoint, so switching layouts re-ingests everything
+        suffix = "_partitioned" if args.partitioned else ""
+        args.manifest = os.path.join(MANIFEST_DIR, f"ingest_manifest_{args.collection}{suffix}.jsonl")
+    return args
 
-    # ── RESUME SUPPORT ─────────────────────────────────────────────
-    # If previous run processed 23 laws, set this to 23 to skip them
-    # Set to 0 to start fresh
-    START_FROM = 23   # ← change this if you want to resume
 
-    if not os.path.exists(json_path):
-        print(f"❌ File not found: {json_path}")
+if __name__ == "__main__":
+    args = parse_args()
+
+    if not os.path.exists(args.json_path):
+        print(f"❌ File not found: {args.json_path}")
         sys.exit(1)
 
-    ingest_json(json_path, start_from=START_FROM)
\ No newline at end of file
+    ingest_json(args.json_path, args)
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import query
+from app.core.admission import AdmissionController, AdmissionRejected
+from app.core.degradation import DegradationController
+from app.core.singleflight import SingleFlight
+
+
+async def _fill(admission: AdmissionController, holders: int, release: asyncio.Event) -> list:
+    async def hold():
+        async with admission.slot():
+            await release.wait()
+
+    tasks = [asyncio.create_task(hold()) for _ in range(holders)]
+    # Settled once every free slot is taken and the rest are queued behind them
+    while admission.active < min(holders, admission.max_concurrent) or admission.active + admission.waiting < holders:
+        await asyncio.sleep(0)
+    return tasks
+
+
+def test_full_queue_rejects_check_and_slot_with_retry_after():
+    async def run():
+        admission = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5)
+        release = asyncio.Event()
+        tasks = await _fill(admission, 2, release)
+        assert (admission.active, admission.waiting) == (1, 1)
+
+        with pytest.raises(AdmissionRejected) as checked:
+            admission.check()
+        with pytest.raises(AdmissionRejected) as slotted:
+            async with admission.slot():
+                pass
+
+        release.set()
+        await asyncio.gather(*tasks)
+        admission.check()
+        return checked.value, slotted.value, admission
+
+    checked, slotted, admission = asyncio.run(run())
+    # No slot released yet: the default 10s hold, for the one waiter plus this request on one slot
+    assert checked.retry_after == slotted.retry_after == 20
+    assert checked.reason == "Generation queue is full"
+    assert (admission.active, admission.waiting) == (0, 0)
+
+
+def test_waiting_too_long_for_a_slot_is_rejected():
+    async def run():
+        admission = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=0.05)
+        release = asyncio.Event()
+        tasks = await _fill(admission, 1, release)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission.slot():
+                pass
+        waiting = admission.waiting
+        release.set()
+        await asyncio.gather(*tasks)
+        return rejected.value, waiting
+
+    rejected, waiting = asyncio.run(run())
+    assert rejected.reason.startswith("Timed out") and rejected.retry_after >= 1
+    assert waiting == 0
+
+
+def test_recent_queue_wait_counts_the_wait_not_the_generation():
+    async def run():
+        admission = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=5)
+
+        async def generate(seconds):
+            async with admission.slot():
+                await asyncio.sleep(seconds)
+
+        await generate(0.2)
+        alone = admission.recent_queue_wait(60)
+        await asyncio.gather(generate(0.2), generate(0.2))
+        return alone, admission.recent_queue_wait(60)
+
+    alone, queued = asyncio.run(run())
+    assert alone < 0.1
+    assert queued >= 0.15
+
+
+class StubEmbeddings:
+    async def aembed_query(self, text):
+        return [0.1, 0.2, 0.3]
+
+
+class StubPipeline:
+    """The parts of `RAGPipeline` /api/query touches before it needs a generation slot."""
+
+    def __init__(self, admission: AdmissionController):
+        self.admission = admission
+        self.degradation = DegradationController(admission, enabled=False)
+        self.flights = SingleFlight()
+        self.embeddings = StubEmbeddings()
+        self.keyword_index = None
+        self.cache = None
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_query_route_answers_503_with_retry_after_when_full(stream):
+    admission = AdmissionController(max_concurrent=1, max_queue=0)
+    app = FastAPI()
+    app.include_router(query.router, prefix="/api")
+    app.state.pipeline = StubPipeline(admission)
+
+    with TestClient(app) as client:
+        # Hold the only slot on the app's own loop; the waiting room takes no one
+        release = client.portal.call(asyncio.Event)
+        holders = client.portal.call(_fill, admission, 1, release)
+        r = client.post("/api/query", json={"question": "What is the punishment for theft?", "stream": stream})
+        retry_after = admission.retry_after()
+        client.portal.call(release.set)
+        client.portal.call(asyncio.gather, *holders)
+
+    assert r.status_code == 503
+    assert r.json()["detail"] == "Generation queue is full"
+    assert r.headers["Retry-After"] == str(retry_after) == "10"
@@ -0,0 +1,30 @@
+from app.rag.cache import AnswerCache, CollectionVersion
+
+ANSWER = {"answer": "Theft is punishable.", "sources": [], "total_sources": 0}
+
+
+def test_ingest_on_one_worker_retires_answers_cached_on_others(tmp_path):
+    path = str(tmp_path / "collection.version")
+    workers = [AnswerCache(collection=CollectionVersion(path)) for _ in range(2)]
+    for cache in workers:
+        cache.put("what is theft", [1.0, 0.0], ANSWER, cache.version())
+        assert cache.get_exact("what is theft")["cached"]
+
+    CollectionVersion(path).bump()
+
+    for cache in workers:
+        assert cache.get_exact("what is theft") is None
+        assert cache.get_semantic([1.0, 0.0]) is None
+
+
+def test_answer_retrieved_before_an_ingest_is_not_served_after_it(tmp_path):
+    collection = CollectionVersion(str(tmp_path / "collection.version"))
+    cache = AnswerCache(collection=collection)
+    version = cache.version()
+
+    collection.bump()
+    cache.put("what is theft", [1.0, 0.0], ANSWER, version)
+    assert cache.get_exact("what is theft") is None
+
+    cache.put("what is theft", [1.0, 0.0], ANSWER, cache.version())
+    assert cache.get_semantic([0.99, 0.01])["answer"] == ANSWER["answer"]
@@ -0,0 +1,26 @@
+from app.rag.citations import chunk_sections, parse_citation
+
+
+def test_statute_headings_are_indexed():
+    text = (
+        "302. Punishment of qatl-i-amd.— Whoever commits qatl-i-amd shall be punished\n"
+        "Section 69. Extortion.— (1) Whoever\n"
+        "Article 25A. Right to education\n"
+    )
+    assert chunk_sections(text, {}) == [("302", "heading"), ("69", "heading"), ("25A", "heading")]
+
+
+def test_numbered_clauses_are_not_headings():
+    text = (
+        "300. Qatl-i-amd.— Whoever, with the intention of causing death\n"
+        "1. the offender is a minor;\n"
+        "2. the offence was committed in the exercise of the right of self-defence.\n"
+    )
+    assert chunk_sections(text, {"section": "300"}) == [("300", "heading")]
+
+
+def test_bare_s_is_not_a_citation():
+    assert parse_citation("Section 302 PPC") == ("pakistan penal code", "302", "section")
+    assert parse_citation("sec 5 crpc") == ("code of criminal procedure", "5", "section")
+    assert parse_citation("s 2 of the contract") is None
+    assert parse_citation("what does s. 10 say") is None
@@ -0,0 +1,31 @@
+from langchain_core.documents import Document
+
+from app.rag.context import ContextPacker
+
+QUESTION = "What is the punishment for theft?"
+
+
+def _docs(n=5):
+    return [Document(page_content=f"Section {s}. " + "Whoever commits theft shall be punished. " * 60,
+                     metadata={"law_name": "Pakistan Penal Code", "source_file": "ppc.pdf", "section": str(s)})
+            for s in range(1, n + 1)]
+
+
+def test_answer_reserve_follows_num_predict_within_bounds():
+    packer = ContextPacker(num_ctx=2048, reserve=256, max_reserve_share=0.5)
+
+    assert packer.answer_reserve(384) == 384
+    assert packer.answer_reserve(100) == 256
+    # LLM_NUM_PREDICT may be as large as the window itself
+    assert packer.answer_reserve(2048) == 1024
+
+
+def test_prompt_leaves_room_for_the_stage_answer():
+    packer = ContextPacker(num_ctx=2048, max_tokens=1500, reserve=256, max_reserve_share=0.5)
+    overhead = packer.prompt_overhead(QUESTION)
+
+    full = packer.pack(_docs(), QUESTION, num_predict=2048)
+    short = packer.pack(_docs(), QUESTION, num_predict=384)
+
+    assert full.budget == 2048 - overhead - 1024
+    assert short.budget == 2048 - overhead - 384
@@ -0,0 +1,78 @@
+import pytest
+
+from app.core import degradation
+from app.core.degradation import DegradationController
+
+
+class FakeAdmission:
+    def __init__(self):
+        self.waiting = 0
+        self.queue_wait = 0.0
+
+    def recent_queue_wait(self, window):
+        return self.queue_wait
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(degradation, "time", clock)
+    return clock
+
+
+def _controller(admission):
+    return DegradationController(admission, enabled=True, queue_depths=[4, 8, 12],
+                                 queue_wait_seconds=[10.0, 20.0, 40.0], window=60.0, cooldown=10.0)
+
+
+def test_load_moves_the_stage_up_at_once_and_down_one_per_cooldown(clock):
+    admission = FakeAdmission()
+    controller = _controller(admission)
+    assert controller.select().name == "normal"
+
+    admission.waiting = 12
+    assert controller.select().name == "sources_only"
+
+    admission.waiting = 0
+    clock.now += 5
+    assert controller.select().name == "sources_only"
+    clock.now += 5
+    assert controller.select().name == "minimal"
+    assert controller.select().name == "minimal"
+    clock.now += 10
+    assert controller.select().name == "reduced"
+
+    # Rising again skips the cooldown
+    admission.queue_wait = 25.0
+    assert controller.select().name == "minimal"
+
+
+def test_peek_reports_without_moving_the_stage(clock):
+    admission = FakeAdmission()
+    controller = _controller(admission)
+
+    admission.waiting = 8
+    assert controller.peek().name == "normal"
+    assert controller.stats()["stage"] == "normal"
+    assert controller.select().name == "minimal"
+
+    admission.waiting = 0
+    clock.now += 60
+    assert controller.peek().name == controller.stats()["stage"] == "minimal"
+    assert controller.select().name == "reduced"
+
+
+def test_disabled_controller_always_answers_in_full(clock):
+    admission = FakeAdmission()
+    admission.waiting = 12
+    controller = DegradationController(admission, enabled=False)
+
+    assert controller.select().name == controller.peek().name == "normal"
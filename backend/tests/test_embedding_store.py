@@ -0,0 +1,42 @@
+import sqlite3
+
+import numpy as np
+
+from app.rag.embeddings import EmbeddingStore
+
+
+def _vectors(keys):
+    return {key: np.full(4, n, dtype=np.float32) for n, key in enumerate(keys)}
+
+
+def test_inserts_past_the_cap_drop_the_oldest_vectors(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "embeddings.sqlite3"), max_rows=10)
+    for batch in range(4):
+        store.put_many(_vectors([f"m:{batch}:{n}" for n in range(3)]))
+
+    # 12 rows went past the cap of 10: pruned to 9, the first batch gone
+    assert store.count() == 9
+    assert store.get_many(["m:0:0", "m:0:1", "m:0:2"]) == {}
+    assert set(store.get_many(["m:3:0", "m:3:1", "m:3:2"])) == {"m:3:0", "m:3:1", "m:3:2"}
+
+
+def test_oversized_file_from_before_the_cap_is_pruned_on_open(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        conn.executemany("INSERT INTO embeddings VALUES (?, ?)",
+                         [(f"m:{n}", np.zeros(4, dtype=np.float32).tobytes()) for n in range(50)])
+    conn.close()
+
+    store = EmbeddingStore(path, max_rows=20)
+    assert store.count() == 18
+
+    store.put_many(_vectors(["m:new"]))
+    assert "m:new" in store.get_many(["m:new"])
+
+
+def test_no_cap_keeps_everything(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "embeddings.sqlite3"))
+    store.put_many(_vectors([f"m:{n}" for n in range(30)]))
+
+    assert store.count() == 30
@@ -0,0 +1,42 @@
+import time
+
+from app.ingest.jobs import IngestJob, JobStore
+
+
+def _snapshot(status="running", **fields):
+    job = IngestJob([{"filename": "act.pdf", "law_name": "Test Act", "law_number": "1", "year": "2000"}])
+    job.status = status
+    return {**job.to_dict(), **fields}
+
+
+def test_any_worker_reads_a_job_saved_by_another(tmp_path):
+    path = str(tmp_path / "ingest.sqlite3")
+    running, other = JobStore(path), JobStore(path)
+    snapshot = _snapshot(pages_parsed=12)
+
+    running.save([snapshot])
+    assert other.get(snapshot["job_id"]) == snapshot
+
+    running.save([{**snapshot, "status": "completed"}])
+    assert other.get(snapshot["job_id"])["status"] == "completed"
+    assert other.get("unknown") is None
+
+
+def test_unfinished_job_of_a_stopped_worker_is_reported_failed(tmp_path):
+    store = JobStore(str(tmp_path / "ingest.sqlite3"), sync_seconds=0.01)
+    snapshot = _snapshot()
+    store.save([snapshot])
+    assert store.get(snapshot["job_id"])["status"] == "running"
+
+    time.sleep(JobStore.STALE_SYNCS * 0.01 + 0.05)
+    job = store.get(snapshot["job_id"])
+    assert job["status"] == "failed" and "Interrupted" in job["error"]
+
+
+def test_only_the_newest_jobs_are_kept(tmp_path):
+    store = JobStore(str(tmp_path / "ingest.sqlite3"), history=2)
+    snapshots = [_snapshot("completed", created_at=float(n)) for n in range(3)]
+    store.save(snapshots)
+
+    assert store.get(snapshots[0]["job_id"]) is None
+    assert all(store.get(s["job_id"]) for s in snapshots[1:])
@@ -0,0 +1,34 @@
+import threading
+
+from app.ingest.pipeline import IngestPipeline
+
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+def _law(n: int) -> dict:
+    text = "\n\n".join(f"{s}. Whoever commits theft in case {n} shall be punished." for s in range(1, 30))
+    return {"text": text, "source_file": f"act_{n}.txt", "law_name": f"Act {n}", "law_number": str(n),
+            "year": "2000"}
+
+
+def test_failing_progress_callback_does_not_stop_the_writer():
+    stored = []
+
+    def on_progress(progress):
+        raise RuntimeError("progress sink is down")
+
+    ingest = IngestPipeline(FakeEmbeddings(), lambda ids, *_: stored.extend(ids), chunk_size=200,
+                            chunk_overlap=0, embed_batch_size=4, split_workers=0, queue_size=1,
+                            on_progress=on_progress)
+    # The queue holds one item: a writer that died here would leave run() blocked on it
+    done = {}
+    runner = threading.Thread(target=lambda: done.update(ingest.run(_law(n) for n in range(3))), daemon=True)
+    runner.start()
+    runner.join(timeout=30)
+
+    assert not runner.is_alive()
+    assert done["laws_stored"] == 3 and done["errors"] == []
+    assert len(stored) == done["chunks_stored"] == done["chunks"]
@@ -0,0 +1,55 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes.ingest import UPLOAD_CHUNK_SIZE, save_upload
+from app.core.config import settings
+
+
+class FakeUpload:
+    """Serves `chunks` one per read, then raises `fail` (e.g. a client disconnect) if given."""
+
+    def __init__(self, chunks, fail=None, filename="act.pdf"):
+        self.filename = filename
+        self.chunks = list(chunks)
+        self.fail = fail
+
+    async def read(self, size):
+        assert size == UPLOAD_CHUNK_SIZE
+        if self.chunks:
+            return self.chunks.pop(0)
+        if self.fail:
+            raise self.fail
+        return b""
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "INGEST_MAX_UPLOAD_MB", 1)
+    return tmp_path
+
+
+def test_complete_upload_is_renamed_from_part(upload_dir):
+    path, digest = asyncio.run(save_upload(FakeUpload([b"Section 1. ", b"Theft."])))
+
+    assert os.listdir(upload_dir) == [os.path.basename(path)] and path.endswith(".pdf")
+    assert digest == hashlib.sha256(b"Section 1. Theft.").hexdigest()
+
+
+def test_disconnect_mid_upload_leaves_nothing(upload_dir):
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(save_upload(FakeUpload([b"Section 1. "], fail=asyncio.CancelledError())))
+
+    assert os.listdir(upload_dir) == []
+
+
+def test_oversized_upload_is_rejected_and_removed(upload_dir):
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(save_upload(FakeUpload([b"x" * 700_000, b"x" * 700_000])))
+
+    assert e.value.status_code == 413
+    assert os.listdir(upload_dir) == []
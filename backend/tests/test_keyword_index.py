@@ -0,0 +1,47 @@
+import sqlite3
+import threading
+
+import pytest
+
+from app.rag.keyword_index import KeywordIndex
+
+META = {"law_name": "Pakistan Penal Code", "source_file": "ppc.pdf", "section": "378"}
+
+
+def _index_theft(index: KeywordIndex):
+    index.upsert(["ppc-378"], ["Section 378. Whoever intends to take dishonestly commits theft."], [META])
+
+
+def test_writes_from_another_worker_are_seen_without_reopening(tmp_path):
+    path = str(tmp_path / "keyword.sqlite3")
+    api, ingest = KeywordIndex(path), KeywordIndex(path)
+    assert api.count() == 0
+
+    _index_theft(ingest)
+
+    assert [d.metadata["chunk_id"] for d in api.search("theft")] == ["ppc-378"]
+
+
+def test_close_closes_every_thread_connection(tmp_path):
+    index = KeywordIndex(str(tmp_path / "keyword.sqlite3"))
+    opened = [index.conn]
+    worker = threading.Thread(target=lambda: opened.append(index.conn))
+    worker.start()
+    worker.join()
+    assert opened[0] is not opened[1]
+
+    index.close()
+
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+    assert index.count() == 0
+
+
+@pytest.mark.parametrize("law", ["%", "_", "%%", "  "])
+def test_wildcard_law_names_match_nothing(tmp_path, law):
+    index = KeywordIndex(str(tmp_path / "keyword.sqlite3"))
+    _index_theft(index)
+
+    assert index.lookup_citation("penal code", "378")
+    assert index.lookup_citation(law, "378") == []
@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+
+import pytest
+
+from app.services.ollama_service import OllamaService
+from benchmarks import fake_ollama
+from benchmarks.bench_ollama_pool import EMBED_MODEL, MODEL, Replica
+
+
+@pytest.fixture
+def replicas():
+    parser = argparse.ArgumentParser()
+    fake_ollama.add_arguments(parser)
+    # Slow enough that a stream stays open while the test makes other calls
+    args = parser.parse_args(["--ttft", "0", "--tokens-per-s", "20", "--answer-tokens", "40"])
+    started = [Replica(args), Replica(args)]
+    for replica in started:
+        replica.start()
+    yield started
+    for replica in started:
+        if replica._stack is not None:
+            replica.stop()
+
+
+def _pool(replicas) -> OllamaService:
+    return OllamaService([r.url for r in replicas], name="test", retries=1, eject_seconds=60)
+
+
+def test_calls_go_to_the_replica_with_fewest_in_flight(replicas):
+    async def run():
+        service = _pool(replicas)
+        stream = service.agenerate_stream(MODEL, "What is theft?", {"num_predict": 40})
+        await stream.__anext__()
+        busy = next(i for i, r in enumerate(service.replicas) if r.in_flight == 1)
+
+        for _ in range(4):
+            await service.aembed(EMBED_MODEL, ["theft"])
+        await stream.aclose()
+        await service.aclose()
+        return busy
+
+    busy = asyncio.run(run())
+    assert replicas[busy].totals()["embed"] == 0
+    assert replicas[1 - busy].totals()["embed"] == 4
+
+
+def test_failed_health_check_ejects_and_recovery_readmits(replicas):
+    async def run():
+        service = _pool(replicas)
+        assert await service.check_health() == 2
+
+        await asyncio.to_thread(replicas[1].stop)
+        assert await service.check_health() == 1
+        assert not service.replicas[1].healthy
+        for _ in range(4):
+            await service.aembed(EMBED_MODEL, ["theft"])
+        served_while_down = replicas[0].totals()["embed"]
+
+        await asyncio.to_thread(replicas[1].start)
+        assert await service.check_health() == 2
+        readmitted = service.replicas[1].healthy and service.replicas[1].failures == 0
+        for _ in range(4):
+            await service.aembed(EMBED_MODEL, ["theft"])
+        await service.aclose()
+        return served_while_down, readmitted
+
+    served_while_down, readmitted = asyncio.run(run())
+    assert served_while_down == 4
+    assert readmitted
+    assert replicas[1].totals()["embed"] > 0
+
+
+def test_failed_call_is_retried_on_the_other_replica(replicas):
+    async def run():
+        service = _pool(replicas)
+        # Down, but not yet known to be: the first call routed to it must fail over
+        await asyncio.to_thread(replicas[1].stop)
+        results = [await service.aembed(EMBED_MODEL, ["theft"]) for _ in range(2)]
+        tokens = [t async for t in service.agenerate_stream(MODEL, "What is theft?", {"num_predict": 3})]
+        down = service.replicas[1]
+        await service.aclose()
+        return results, tokens, down
+
+    results, tokens, down = asyncio.run(run())
+    assert all(len(r) == 1 for r in results) and len(tokens) == 3
+    assert down.failures == 1 and not down.healthy
+    assert replicas[0].totals() == {"embed": 2, "generate": 1}
@@ -0,0 +1,170 @@
+import asyncio
+
+from langchain_core.documents import Document
+
+from app.core.admission import AdmissionController
+from app.core.degradation import DegradationController
+from app.core.singleflight import SingleFlight
+from app.rag.chain import flight_key, query_laws, stream_laws
+from app.rag.context import ContextPacker
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    async def aembed_query(self, text):
+        self.calls += 1
+        return [0.1, 0.2, 0.3]
+
+
+class CountingRetriever:
+    def __init__(self):
+        self.calls = 0
+
+    async def asearch(self, embedding, question=None, k=None):
+        self.calls += 1
+        return [
+            Document(page_content=f"Section {n}. Whoever commits theft shall be punished.",
+                     metadata={"law_name": "Pakistan Penal Code", "section": str(n)})
+            for n in range(1, (k or 5) + 1)
+        ]
+
+
+class FakeChain:
+    def __init__(self):
+        self.inputs = []
+
+    async def astream(self, inputs):
+        self.inputs.append(inputs)
+        for token in ("Theft ", "is ", "punishable."):
+            yield token
+
+
+class HangingChain:
+    """Sends one token, then waits on Ollama for good; records how the stream ended."""
+
+    def __init__(self):
+        self.ended = None
+
+    async def astream(self, inputs):
+        try:
+            yield "Theft "
+            await asyncio.sleep(3600)
+            yield "never"
+        except BaseException as e:
+            self.ended = type(e).__name__
+            raise
+
+
+class FakePipeline:
+    """Just what `query_laws`/`stream_laws` touch, with no Ollama or Chroma behind it."""
+
+    def __init__(self):
+        self.embeddings = CountingEmbeddings()
+        self.retriever = CountingRetriever()
+        self.chain = FakeChain()
+        self.packer = ContextPacker(num_ctx=2048)
+        self.admission = AdmissionController()
+        self.degradation = DegradationController(self.admission)
+        self.keyword_index = None
+        self.cache = None
+
+    def chain_for(self, num_predict):
+        return self.chain
+
+
+async def _collect(events):
+    return [event async for event in events]
+
+
+def test_query_laws_embeds_and_searches_once():
+    pipeline = FakePipeline()
+
+    result = asyncio.run(query_laws("What is the punishment for theft?", pipeline))
+
+    assert pipeline.embeddings.calls == 1
+    assert pipeline.retriever.calls == 1
+    assert result["answer"] == "Theft is punishable."
+    assert result["total_sources"] == len(result["sources"]) > 0
+    # The prompt is built from the same documents as the sources
+    assert all(f"Section {s['section']}." in pipeline.chain.inputs[0]["context"] for s in result["sources"])
+
+
+def test_stream_laws_embeds_and_searches_once():
+    pipeline = FakePipeline()
+
+    events = asyncio.run(_collect(stream_laws("What is the punishment for theft?", pipeline)))
+
+    assert pipeline.embeddings.calls == 1
+    assert pipeline.retriever.calls == 1
+    assert [e["event"] for e in events] == ["sources", "token", "token", "token", "done"]
+
+
+def test_each_query_embeds_and_searches_once():
+    pipeline = FakePipeline()
+
+    for question in ("Is theft bailable?", "What is the punishment for theft?"):
+        asyncio.run(query_laws(question, pipeline))
+        asyncio.run(_collect(stream_laws(question, pipeline)))
+
+    assert pipeline.embeddings.calls == 4
+    assert pipeline.retriever.calls == 4
+
+
+def test_flight_key_separates_load_stages():
+    stages = DegradationController(AdmissionController()).stages
+
+    assert flight_key("What is theft?", stages[0]) == flight_key("  what is THEFT? ", stages[0])
+    assert len({flight_key("What is theft?", stage) for stage in stages}) == len(stages)
+
+
+def test_closing_the_stream_stops_generation_and_frees_the_slot():
+    pipeline = FakePipeline()
+    chain = HangingChain()
+    pipeline.chain_for = lambda num_predict: chain
+
+    async def run():
+        events = stream_laws("What is the punishment for theft?", pipeline)
+        async for event in events:
+            if event["event"] == "token":
+                break
+        holding = pipeline.admission.active
+        await events.aclose()
+        return holding, chain.ended, pipeline.admission.active
+
+    holding, ended, active = asyncio.run(run())
+    assert holding == 1
+    assert ended == "GeneratorExit"
+    assert active == 0
+
+
+def test_client_disconnect_cancels_the_shared_generation():
+    pipeline = FakePipeline()
+    chain = HangingChain()
+    pipeline.chain_for = lambda num_predict: chain
+    flights = SingleFlight()
+    question = "What is the punishment for theft?"
+
+    async def run():
+        first_token = asyncio.Event()
+
+        async def client():
+            # As the SSE route consumes it; a disconnect cancels this task
+            async for event in flights.stream(question, lambda: stream_laws(question, pipeline)):
+                if event["event"] == "token":
+                    first_token.set()
+
+        task = asyncio.create_task(client())
+        await first_token.wait()
+        holding = pipeline.admission.active
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        for _ in range(3):
+            await asyncio.sleep(0)
+        return holding, chain.ended, pipeline.admission.active, flights.streaming(question)
+
+    holding, ended, active, streaming = asyncio.run(run())
+    assert holding == 1
+    assert ended == "CancelledError"
+    assert active == 0 and not streaming
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+EVENTS = ["sources", "Theft ", "is ", "punishable.", "done"]
+
+
+class Factory:
+    """Counts calls; its work waits on `release` so callers can pile up first."""
+
+    def __init__(self, fail: Exception = None):
+        self.calls = 0
+        self.fail = fail
+        self.release = asyncio.Event()
+        self.produced = 0
+
+    async def answer(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.fail:
+            raise self.fail
+        return {"answer": "Theft is punishable."}
+
+    async def events(self):
+        self.calls += 1
+        for n, event in enumerate(EVENTS):
+            if n == 2:
+                await self.release.wait()
+                if self.fail:
+                    raise self.fail
+            self.produced += 1
+            yield event
+
+
+async def _collect(events):
+    return [event async for event in events]
+
+
+async def _until(condition):
+    while not condition():
+        await asyncio.sleep(0)
+
+
+def test_concurrent_runs_share_one_call():
+    async def run():
+        flights, factory = SingleFlight(), Factory()
+        callers = [asyncio.create_task(flights.run("theft", factory.answer)) for _ in range(5)]
+        await _until(lambda: flights.coalesced == 4)
+        factory.release.set()
+        return flights, factory, await asyncio.gather(*callers)
+
+    flights, factory, results = asyncio.run(run())
+    assert factory.calls == 1
+    assert all(result is results[0] for result in results)
+    assert (flights.leaders, flights.coalesced) == (1, 4)
+
+
+def test_concurrent_streams_share_one_call():
+    async def run():
+        flights, factory = SingleFlight(), Factory()
+        callers = [asyncio.create_task(_collect(flights.stream("theft", factory.events))) for _ in range(5)]
+        await _until(lambda: flights.stream_coalesced == 4)
+        factory.release.set()
+        return flights, factory, await asyncio.gather(*callers)
+
+    flights, factory, results = asyncio.run(run())
+    assert factory.calls == 1
+    assert results == [EVENTS] * 5
+    assert (flights.stream_leaders, flights.stream_coalesced) == (1, 4)
+
+
+def test_follower_joining_mid_stream_gets_a_replay():
+    async def run():
+        flights, factory = SingleFlight(), Factory()
+        leader = asyncio.create_task(_collect(flights.stream("theft", factory.events)))
+        await _until(lambda: factory.produced == 2)
+        follower = asyncio.create_task(_collect(flights.stream("theft", factory.events)))
+        await _until(lambda: flights.stream_coalesced == 1)
+        factory.release.set()
+        return factory, await leader, await follower
+
+    factory, leader, follower = asyncio.run(run())
+    assert factory.calls == 1
+    assert leader == follower == EVENTS
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+def test_leader_error_reaches_every_caller(streamed):
+    async def run():
+        flights, factory = SingleFlight(), Factory(fail=RuntimeError("Ollama is down"))
+        if streamed:
+            callers = [asyncio.create_task(_collect(flights.stream("theft", factory.events))) for _ in range(3)]
+            await _until(lambda: flights.stream_coalesced == 2)
+        else:
+            callers = [asyncio.create_task(flights.run("theft", factory.answer)) for _ in range(3)]
+            await _until(lambda: flights.coalesced == 2)
+        factory.release.set()
+        return flights, factory, await asyncio.gather(*callers, return_exceptions=True)
+
+    flights, factory, results = asyncio.run(run())
+    assert factory.calls == 1
+    assert all(isinstance(r, RuntimeError) and str(r) == "Ollama is down" for r in results)
+    assert flights.stats()["in_flight"] == 0
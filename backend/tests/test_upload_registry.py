@@ -0,0 +1,31 @@
+from app.ingest.manifest import UploadRegistry
+
+
+def _law(name="Test Act", digest="d1"):
+    return {"source_file": "act.pdf", "law_name": name, "law_number": "1", "year": "2000", "digest": digest}
+
+
+def test_new_version_replaces_only_the_chunks_it_dropped(tmp_path):
+    registry = UploadRegistry(str(tmp_path / "ingest.sqlite3"))
+    registry.record(_law(), ["a", "b", "c"])
+
+    assert sorted(registry.stale(_law(digest="d2"), ["a", "d"])) == ["b", "c"]
+    registry.record(_law(digest="d2"), ["a", "d"])
+    assert sorted(registry.stale(_law(digest="d3"), [])) == ["a", "d"]
+
+
+def test_other_laws_under_the_same_filename_are_kept(tmp_path):
+    registry = UploadRegistry(str(tmp_path / "ingest.sqlite3"))
+    registry.record(_law("Test Act"), ["a", "shared"])
+    registry.record(_law("Other Act", digest="d9"), ["x", "shared"])
+
+    assert registry.stale(_law("Test Act", digest="d2"), []) == ["a"]
+
+
+def test_corrected_metadata_for_the_same_file_replaces_the_earlier_entry(tmp_path):
+    registry = UploadRegistry(str(tmp_path / "ingest.sqlite3"))
+    registry.record(_law("Tset Act"), ["a", "b"])
+
+    assert registry.stale(_law("Test Act"), ["a", "b"]) == []
+    registry.record(_law("Test Act"), ["a", "b"])
+    assert sorted(registry.stale(_law("Test Act", digest="d2"), ["a"])) == ["b"]
@@ -0,0 +1,27 @@
+import os
+
+import numpy as np
+
+from app.services.vector_index import MmapIndex, build_index
+
+
+def _pages(vectors, tag):
+    ids = [f"{tag}-{i}" for i in range(len(vectors))]
+    return [(ids, vectors.tolist(), [f"{tag} chunk {i}" for i in ids], [{"n": i} for i in range(len(ids))])]
+
+
+def test_queries_keep_working_while_a_rebuild_is_swapped_in(tmp_path):
+    rng = np.random.default_rng(0)
+    old, new = rng.standard_normal((20, 8)), rng.standard_normal((30, 8))
+    path = str(tmp_path / "index")
+    build_index(path, _pages(old, "old"), len(old))
+    index = MmapIndex(path)
+    assert index.query(old[3].tolist(), 1)[0] == ["old-3"]
+
+    # The window inside build_index between moving the old directory away and the new one in
+    os.rename(path, f"{path}.old")
+    assert index.query(old[3].tolist(), 1)[0] == ["old-3"]
+
+    build_index(path, _pages(new, "new"), len(new))
+    assert index.query(new[5].tolist(), 1)[0] == ["new-5"]
+    assert index.count() == 30